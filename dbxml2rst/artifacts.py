@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.artifacts
+    ~~~~~~~~~~~~~~~~~~~
+
+    Stores of the artifacts (intermediate files) of a conversion
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import io
+import os
+import re
+
+from fspath import FSPath
+
+# ==============================================================================
+class ArtifactStore(object):
+# ==============================================================================
+
+    u"""Base class of the artifact stores.
+
+    The stages of a conversion (XML filter, chunking, pandoc, ..) read and write
+    their artifacts (``index.xml``, ``index.json``, ``index.rst``, ..) by name,
+    the names are relative to the ``folder`` of the book.  The content of an
+    artifact is UTF-8 text, :py:meth:`write` takes ``str`` or ``bytes``::
+
+        store = MemoryStore(CACHE / "kernel-hacking")
+        store.write("index.json", xml2jsonText(store.read("index.xml")))
+        rstFile = store.spill("index.rst")
+    """
+
+    def __init__(self, folder):
+        self.folder = FSPath(folder)
+
+    def path(self, name):
+        u"""Returns the path name of the artifact ``name`` on the disk."""
+        return self.folder / name
+
+    def exists(self, name):
+        raise NotImplementedError
+
+    def size(self, name):
+        u"""Returns the size (bytes) of the artifact ``name``."""
+        raise NotImplementedError
+
+    def readBytes(self, name):
+        raise NotImplementedError
+
+    def write(self, name, data):
+        raise NotImplementedError
+
+    def names(self, pattern):
+        u"""Returns the names of the artifacts whose basename matches the regular
+        expression ``pattern``."""
+        raise NotImplementedError
+
+    def openText(self, name):
+        u"""Returns the artifact ``name`` as (read only) text stream."""
+        return io.TextIOWrapper(io.BytesIO(self.readBytes(name)), encoding="utf-8")
+
+    def read(self, name):
+        u"""Returns the content (str) of the artifact ``name``."""
+        with self.openText(name) as f:
+            return f.read()
+
+    def openWrite(self, name):
+        u"""Returns a binary stream to write the artifact ``name`` piece by piece,
+        the artifact is written when the stream is closed."""
+        return _WriteStream(self, name)
+
+    def append(self, name, data):
+        prev = self.readBytes(name) if self.exists(name) else b""
+        self.write(name, prev + _encode(data))
+
+    def discard(self, name):
+        u"""The artifact ``name`` is no longer needed (by the next stages)."""
+        pass
+
+    def spill(self, name):
+        u"""Writes artifact ``name`` to the disk, returns its path name (see
+        :py:meth:`path`)."""
+        raise NotImplementedError
+
+def _encode(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return data
+
+class _WriteStream(io.BytesIO):
+    u"""Binary stream of :py:meth:`ArtifactStore.openWrite`"""
+
+    def __init__(self, store, name):
+        super().__init__()
+        self.store = store
+        self.name  = name
+
+    def close(self):
+        if not self.closed:
+            self.store.write(self.name, self.getvalue())
+        super().close()
+
+# ==============================================================================
+class DiskStore(ArtifactStore):
+# ==============================================================================
+
+    u"""The artifacts are files in the folder of the book."""
+
+    def exists(self, name):
+        return self.path(name).EXISTS
+
+    def size(self, name):
+        return self.path(name).SIZE
+
+    def readBytes(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def openText(self, name):
+        return self.path(name).openTextFile()
+
+    def read(self, name):
+        return self.path(name).readFile()
+
+    def write(self, name, data):
+        if isinstance(data, str):
+            with self.path(name).openTextFile("w") as f:
+                f.write(data)
+        else:
+            with open(self.path(name), "wb") as f:
+                f.write(data)
+
+    def openWrite(self, name):
+        return open(self.path(name), "wb")
+
+    def append(self, name, data):
+        with self.path(name).openTextFile("a") as f:
+            f.write(data)
+
+    def names(self, pattern):
+        return list(self.folder.reMatchFind(pattern, use_dirs=False, relpath=True))
+
+    def spill(self, name):
+        return self.path(name)
+
+# ==============================================================================
+class MemoryStore(ArtifactStore):
+# ==============================================================================
+
+    u"""The artifacts are hold in memory.
+
+    Only artifacts which are spilled (:py:meth:`ArtifactStore.spill`) are written
+    to the disk.  With ``spill=True`` (debug) every artifact is written to the
+    disk, like the :py:class:`DiskStore` does.  Artifacts which are not in the
+    memory are read from the disk."""
+
+    def __init__(self, folder, spill=False):
+        super().__init__(folder)
+        self.spillAll = spill
+        self.data     = dict()
+
+    @classmethod
+    def key(cls, name):
+        return os.path.normpath(name)
+
+    def exists(self, name):
+        return self.key(name) in self.data or self.path(name).EXISTS
+
+    def size(self, name):
+        data = self.data.get(self.key(name))
+        if data is None:
+            return self.path(name).SIZE
+        return len(data)
+
+    def readBytes(self, name):
+        data = self.data.get(self.key(name))
+        if data is None:
+            with open(self.path(name), "rb") as f:
+                data = f.read()
+        return data
+
+    def write(self, name, data):
+        self.data[self.key(name)] = _encode(data)
+        if self.spillAll:
+            self.spill(name)
+
+    def names(self, pattern):
+        name_re = re.compile(pattern)
+        return [FSPath(name) for name in self.data
+                if name_re.match(os.path.basename(name))]
+
+    def discard(self, name):
+        self.data.pop(self.key(name), None)
+
+    def spill(self, name):
+        fname = self.path(name)
+        data  = self.data.get(self.key(name))
+        if data is not None:
+            with open(fname, "wb") as f:
+                f.write(data)
+        return fname
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.astcache
+    ~~~~~~~~~~~~~~~~~~
+
+    Cache of the (filtered) pandoc JSON AST of the XML chunks
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import sys
+import gzip
+import hashlib
+
+from fspath import FSPath
+
+from .helper import LOG
+
+# format of the cached AST, increment it, if the format (or the way the AST is
+# build) is changed
+AST_VERSION = 1
+
+# ==============================================================================
+class ASTCache(object):
+# ==============================================================================
+
+    u"""The pandoc JSON AST (after the pandoc filters) of XML chunks.
+
+    The AST is stored gzip compressed in ``folder``, the key is the SHA-256 of
+    the XML, the pandoc executable which converts (the pandoc server or
+    subprocess) and the modules of the pandoc filters (see :py:meth:`key`).
+    The cache is not pruned, drop the folder to clean it.  A hit saves the
+    pandoc DocBook reader (``xml2json``) and the filters, the AST goes straight
+    to the reST writer::
+
+        cache = ASTCache(CACHE / "json-ast")
+        key   = cache.key(xmlText, getConverterExe(), XMLTag.pandocFilter)
+        ast   = cache.load(key)
+        if ast is None:
+            ast = jsonFilterText(xml2jsonText(xmlText), XMLTag.pandocFilter)
+            cache.store(key, ast)
+    """
+
+    def __init__(self, folder):
+        self.folder    = FSPath(folder)
+        self._fileKeys = dict()
+
+    def fileKey(self, fname):
+        u"""Returns the key of the file ``fname`` (path, size and mtime)."""
+        if not fname:
+            return "-"
+        if fname not in self._fileKeys:
+            try:
+                stat = os.stat(fname)
+                self._fileKeys[fname] = "%s %s %s" % (fname, stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                self._fileKeys[fname] = "%s -" % fname
+        return self._fileKeys[fname]
+
+    def key(self, xmlText, pandocExe, *filters):
+        u"""Returns the key (SHA-256 hex) of the AST of ``xmlText``"""
+        h = hashlib.sha256(("%s\n" % AST_VERSION).encode("utf-8"))
+        h.update(("%s\n" % self.fileKey(pandocExe)).encode("utf-8"))
+        for func in filters:
+            module = sys.modules.get(func.__module__)
+            h.update(("%s %s\n" % (
+                func.__qualname__, self.fileKey(getattr(module, "__file__", "-")))
+                     ).encode("utf-8"))
+        h.update(xmlText.encode("utf-8"))
+        return h.hexdigest()
+
+    def fname(self, key):
+        return self.folder / key[:2] / (key + ".json.gz")
+
+    def load(self, key):
+        u"""Returns the AST (JSON str) stored with ``key`` or ``None``."""
+        fname = self.fname(key)
+        if not fname.EXISTS:
+            return None
+        try:
+            with open(fname, "rb") as f:
+                return gzip.decompress(f.read()).decode("utf-8")
+        except (OSError, EOFError, UnicodeDecodeError):
+            LOG.warn("drop broken AST %s" % fname)
+            return None
+
+    def store(self, key, ast):
+        u"""Store the AST (JSON str) with ``key``."""
+        fname = self.fname(key)
+        fname.DIRNAME.makedirs()
+        tmpFile = FSPath(fname + ".tmp")
+        with open(tmpFile, "wb") as f:
+            f.write(gzip.compress(ast.encode("utf-8"), compresslevel=6))
+        os.replace(tmpFile, fname)
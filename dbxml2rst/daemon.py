@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.daemon
+    ~~~~~~~~~~~~~~~~
+
+    Conversion daemon behind a Unix socket and its (thin) client
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import sys
+import json
+import errno
+import signal
+import socket
+import traceback
+import socketserver
+
+from .helper import LOG, currentContext, useContext
+
+# ==============================================================================
+class SocketStream(object):
+# ==============================================================================
+
+    u"""Text stream which sends what is written as JSON lines
+    ``{<name>: <text>}`` to the client."""
+
+    def __init__(self, wfile, name):
+        self.wfile = wfile
+        self.name  = name
+
+    def write(self, text):
+        if text:
+            send(self.wfile, {self.name : text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def send(wfile, obj):
+    wfile.write((json.dumps(obj) + "\n").encode("utf-8"))
+
+# ==============================================================================
+class RequestHandler(socketserver.StreamRequestHandler):
+# ==============================================================================
+
+    u"""Runs one request: ``{"argv": [..], "cwd": ".."}``.
+
+    The output of the command is send to the client (``{"out": ..}``,
+    ``{"err": ..}``), the last line is the exit code ``{"exit": <int>}``."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError:
+            return
+        argv = [str(arg) for arg in request.get("argv", [])]
+        out  = SocketStream(self.wfile, "out")
+        err  = SocketStream(self.wfile, "err")
+
+        # the output of the command is written to the streams of its context,
+        # sys.stdout and sys.stderr are the streams of the daemon
+        prevDir  = os.getcwd()
+        exitCode = 0
+        try:
+            os.chdir(request.get("cwd") or prevDir)
+            with useContext(currentContext().derive(appl_out=out, log_out=err)):
+                self.server.runCommand(argv)
+        except SystemExit as exc:
+            exitCode = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+        except Exception: # pylint: disable=W0703
+            err.write(traceback.format_exc())
+            exitCode = 42
+        finally:
+            os.chdir(prevDir)
+        try:
+            send(self.wfile, {"exit" : exitCode})
+        except OSError:
+            pass
+
+# ==============================================================================
+class DaemonServer(socketserver.UnixStreamServer):
+# ==============================================================================
+
+    u"""The daemon, requests are run one after the other by ``runCommand(argv)``
+    (e.g. the ``main`` function of the command line).
+
+    The modules, caches and tables which are loaded by a request stay warm for
+    the following requests.  The commands run in the working directory of the
+    client, but with the environment of the daemon."""
+
+    def __init__(self, socketPath, runCommand):
+        self.socketPath = str(socketPath)
+        self.runCommand = runCommand
+        removeStaleSocket(self.socketPath)
+        super().__init__(self.socketPath, RequestHandler)
+        os.chmod(self.socketPath, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socketPath)
+        except OSError:
+            pass
+
+def removeStaleSocket(socketPath):
+    u"""Removes the socket file of a daemon which is no longer running."""
+    if not os.path.exists(socketPath):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socketPath)
+        except OSError as exc:
+            if exc.errno not in (errno.ECONNREFUSED, errno.ENOENT):
+                raise
+            os.unlink(socketPath)
+            return
+    raise OSError(errno.EADDRINUSE, "daemon is already running", socketPath)
+
+# ==============================================================================
+def serve(socketPath, runCommand):
+# ==============================================================================
+
+    u"""Serve the requests on the Unix socket ``socketPath`` (until CTRL-C or
+    SIGTERM)."""
+
+    def terminate(_signum, _frame):
+        raise KeyboardInterrupt()
+
+    server = DaemonServer(socketPath, runCommand)
+    prevHandler = signal.signal(signal.SIGTERM, terminate)
+    LOG.msg("daemon listen on %s, stop with CTRL-C" % socketPath)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, prevHandler)
+        server.server_close()
+
+# ==============================================================================
+def request(socketPath, argv, cwd=None):
+# ==============================================================================
+
+    u"""Send the command line ``argv`` to the daemon at ``socketPath``.
+
+    The output of the command is written to stdout and stderr, returns the exit
+    code of the command."""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socketPath))
+        sock.sendall((json.dumps(dict(
+            argv  = list(argv)
+            , cwd = cwd or os.getcwd())) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as rfile:
+            for line in rfile:
+                msg = json.loads(line)
+                if "out" in msg:
+                    sys.stdout.write(msg["out"])
+                    sys.stdout.flush()
+                elif "err" in msg:
+                    sys.stderr.write(msg["err"])
+                    sys.stderr.flush()
+                elif "exit" in msg:
+                    return msg["exit"]
+    raise OSError(errno.ECONNRESET, "daemon closed the connection", str(socketPath))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.entities
+    ~~~~~~~~~~~~~~~~~~
+
+    Compiled entity tables used by the dbxml2rst library
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import json
+import hashlib
+
+from fspath import FSPath
+
+from .helper import LOG
+from .install import fileHash
+
+# format of the persisted tables, increment it, if the format (or the way the
+# tables are build) is changed
+TABLE_VERSION = 1
+
+# ==============================================================================
+def sourceKey(sources=(), folders=()):
+# ==============================================================================
+
+    u"""Returns the key (SHA-256 hex) of the sources of entity tables.
+
+    The key changes, if the content of one of the files ``sources`` changes or a
+    file name in one of the ``folders`` (the folders where the external
+    entities are resolved) is added, removed or renamed."""
+
+    h = hashlib.sha256(("%s\n" % TABLE_VERSION).encode("utf-8"))
+    for src in sources:
+        src = FSPath(src)
+        h.update(("%s %s\n" % (src, fileHash(src) if src.EXISTS else "-")).encode("utf-8"))
+    for folder in folders:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames.sort()
+            h.update(("%s/\n" % os.path.relpath(dirpath, folder)).encode("utf-8"))
+            for name in sorted(filenames):
+                h.update(("%s\n" % name).encode("utf-8"))
+    return h.hexdigest()
+
+# ==============================================================================
+class EntityTables(object):
+# ==============================================================================
+
+    u"""Tables of the external and internal entities, persisted in a json file.
+
+    The tables are stored with the key of their sources (see
+    :py:func:`sourceKey`), if the key is unchanged, the tables are loaded from
+    the file, otherwise they are build (and stored) again::
+
+        tables = EntityTables(CACHE / "entities" / "media.json")
+        ext, int = tables.get(sourceKey(tmplFiles, [mediaFolder]), readEntities)
+    """
+
+    def __init__(self, fname):
+        self.pFile = FSPath(fname)
+
+    def load(self, key):
+        u"""Returns the tables ``(ext, int)`` stored with ``key`` or ``None``."""
+        if not self.pFile.EXISTS:
+            return None
+        try:
+            with self.pFile.openTextFile(mode='r', encoding='utf-8') as jsonFile:
+                data = json.load(jsonFile)
+        except ValueError:
+            LOG.warn("drop broken entity tables %s" % self.pFile)
+            return None
+        if data.get("key") != key:
+            return None
+        return data["ext"], data["int"]
+
+    def store(self, key, ext_entities, int_entities):
+        self.pFile.DIRNAME.makedirs()
+        tmpFile = FSPath(self.pFile + ".tmp")
+        with tmpFile.openTextFile(mode='w', encoding='utf-8') as jsonFile:
+            json.dump(dict(key=key, ext=ext_entities, int=int_entities)
+                      , jsonFile, ensure_ascii=False)
+        os.replace(tmpFile, self.pFile)
+
+    def get(self, key, build, store=True):
+        u"""Returns the tables ``(ext, int)`` of the sources with ``key``.
+
+        If the tables are not stored with this key, they are build by the
+        function ``build()`` (which returns the tables ``(ext, int)``) and
+        stored (if ``store`` is ``True``)."""
+        tables = self.load(key)
+        if tables is not None:
+            LOG.info("entity tables: %s (unchanged)" % self.pFile)
+            return tables
+        LOG.info("entity tables: %s (build)" % self.pFile)
+        ext_entities, int_entities = build()
+        if store:
+            self.store(key, ext_entities, int_entities)
+        return ext_entities, int_entities
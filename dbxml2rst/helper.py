@@ -20,18 +20,11 @@ import os
 import sys
 import json
 import argparse
+import contextlib
+import contextvars
 
 from fspath import FSPath, OS_ENV
 
-# ==============================================================================
-# constants
-# ==============================================================================
-
-mainFOOTER=""
-rstHEADER=""".. -*- coding: utf-8; mode: rst -*-
-"""
-rstFOOTER=""
-
 # ==============================================================================
 class Container(dict):
 # ==============================================================================
@@ -49,57 +42,237 @@ class Container(dict):
         self[attr] = val
 
 # ==============================================================================
-# Logging stuff
+class ConversionContext(Container):
 # ==============================================================================
 
-STREAM = Container(
+    u"""The state of a conversion (settings, output streams, ..).
+
+    The state of a conversion is not hold in module globals, a context is passed
+    through the pipeline and it is the *current* context (see
+    :py:func:`currentContext`) of the thread (or asyncio task) which runs the
+    conversion.  Each conversion has its own context, so conversions can run in
+    threads of one process (or be embedded by a library API)::
+
+        ctx = currentContext().derive(quiet=True, rstFooter=".. converted\n")
+        with useContext(ctx):
+            ...
+
+    The fields of the library are:
+
+    * ``verbose``, ``debug``, ``quiet``: log level (see :py:class:`SimpleLog`)
+    * ``appl_out``, ``log_out``: streams of the application and of the logger
+    * ``rstHeader``, ``rstFooter``: prolog and epilog of the reST files
+    * ``mainFooter``: epilog of the main reST file of a book
+    * ``pandocExe``: the pandoc executable (``None``: pandoc from the ``PATH``)
+    * ``pandocServer``: the running pandoc server (see
+      :py:func:`.pandoc.startServer`) or ``None``
+    * ``walkStats``: counters of the XML filter (see :py:class:`.timing.WalkStats`)
+      or ``None``
+    * ``tableModels``: the table models of the document filtered by the XML
+      filter (see :py:class:`.nodes.TableModel`)
+    * ``profileOut``, ``traceMemory``: profiling (see :py:class:`ProfileCapture`)
+
+    Applications (e.g. ``linux-db2rst``) add the fields of their conversions."""
+
+    def derive(self, **kwargs):
+        u"""Returns a new context with the fields of this context, updated by
+        ``kwargs``."""
+        ctx = self.__class__(self)
+        ctx.update(kwargs)
+        return ctx
+
+DEFAULT_CONTEXT = ConversionContext(
+    verbose      = False
+    , debug      = False
+    , quiet      = False
     # pipes used by the application & logger
-    appl_out   = sys.__stdout__
-    , log_out  = sys.__stderr__
+    , appl_out   = sys.__stdout__
+    , log_out    = sys.__stderr__
+    , rstHeader  = ".. -*- coding: utf-8; mode: rst -*-\n"
+    , rstFooter  = ""
+    , mainFooter = ""
+    , pandocExe    = None
+    , pandocServer = None
+    , walkStats    = None
+    , tableModels  = None
+    , profileOut   = None
+    , traceMemory  = False
     , )
 
-VERBOSE = False
-DEBUG   = False
-QUIET   = False
+_CONTEXT = contextvars.ContextVar("dbxml2rst_context")
+
+def currentContext():
+    u"""Returns the current context of the thread (or asyncio task), the
+    :py:data:`DEFAULT_CONTEXT` if there is none (see :py:func:`useContext`)."""
+    return _CONTEXT.get(DEFAULT_CONTEXT)
+
+@contextlib.contextmanager
+def useContext(ctx):
+    u"""Make ``ctx`` the current context of the ``with`` block (the contexts can
+    be nested)."""
+    token = _CONTEXT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _CONTEXT.reset(token)
+
+# ==============================================================================
+# Logging stuff
+# ==============================================================================
 
 class SimpleLog(object):
 
+    u"""The log level and the streams are taken from the current context (see
+    :py:func:`currentContext`)."""
+
     LOG_FORMAT = "%(logclass)s: %(message)s\n"
 
     def error(self, message, **replace):
         message = message % replace
         replace.update(dict(message = message, logclass = "ERROR"))
-        STREAM.log_out.write(self.LOG_FORMAT % replace)
+        currentContext().log_out.write(self.LOG_FORMAT % replace)
 
     def warn(self, message, **replace):
-        if QUIET:
+        ctx = currentContext()
+        if ctx.quiet:
             return
         message = message % replace
         replace.update(dict(message = message, logclass = "WARN"))
-        STREAM.log_out.write(self.LOG_FORMAT % replace)
+        ctx.log_out.write(self.LOG_FORMAT % replace)
 
     def info(self, message, **replace):
-        if QUIET or not VERBOSE:
+        ctx = currentContext()
+        if ctx.quiet or not ctx.verbose:
             return
         message = message % replace
         replace.update(dict(message = message, logclass = "INFO"))
-        STREAM.log_out.write(self.LOG_FORMAT % replace)
+        ctx.log_out.write(self.LOG_FORMAT % replace)
 
     def debug(self, message, **replace):
-        if not DEBUG:
+        ctx = currentContext()
+        if not ctx.debug:
             return
         message = message % replace
         replace.update(dict(message = message, logclass = "DEBUG"))
-        STREAM.log_out.write(self.LOG_FORMAT % replace)
+        ctx.log_out.write(self.LOG_FORMAT % replace)
 
     def msg(self, message, **replace):
-        if QUIET:
+        ctx = currentContext()
+        if ctx.quiet:
             return
         message = message % replace
-        STREAM.appl_out.write(message + "\n")
+        ctx.appl_out.write(message + "\n")
 
 LOG = SimpleLog()
 
+# ==============================================================================
+# Profiling stuff
+# ==============================================================================
+
+# the profiling modules are imported on demand (see ProfileCapture)
+cProfile = pstats = tracemalloc = None
+
+# the innermost ProfileCapture section of the thread (or asyncio task)
+_PROFILE_SECTION = contextvars.ContextVar("dbxml2rst_profile_section")
+
+def _importProfilers():
+    global cProfile, pstats, tracemalloc # pylint: disable=W0603
+    import cProfile, pstats, tracemalloc # pylint: disable=W0621, C0410
+
+class ProfileCapture(object):
+
+    u"""Capture cProfile and tracemalloc data of a (named) section.
+
+    Sections can be nested (e.g. a CLI command and the books converted by the
+    command), each section writes its own files into the ``profileOut`` folder
+    of the current context (see :py:func:`currentContext`):
+
+    * ``<name>.pstats``: the cProfile data, load it with :py:mod:`pstats`
+    * ``<name>.tracemalloc``: tracemalloc snapshot (``traceMemory``)
+    * ``<name>.tracemalloc.txt``: top allocations of the section (``traceMemory``)
+
+    The cProfile data of the outer section includes the data of the inner
+    sections.  Without ``profileOut`` and ``traceMemory`` nothing is
+    captured."""
+
+    TOP_ALLOCATIONS = 30
+
+    def __init__(self, name):
+        self.name      = name
+        self.profiler  = None
+        self.snapshot  = None
+        self.inner     = []
+        self.active    = False
+        self.outer     = None
+        self.folder    = None
+        self._token    = None
+
+    def __enter__(self):
+        ctx = currentContext()
+        self.active = bool(ctx.profileOut or ctx.traceMemory)
+        if not self.active:
+            return self
+        _importProfilers()
+        self.folder = FSPath(ctx.profileOut or "profile")
+        self.outer  = _PROFILE_SECTION.get(None)
+        if self.outer is not None and self.outer.profiler is not None:
+            # only one profiler can be active
+            self.outer.profiler.disable()
+        self._token = _PROFILE_SECTION.set(self)
+        if ctx.traceMemory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            self.snapshot = self.takeSnapshot()
+        if ctx.profileOut:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.active:
+            return
+        _PROFILE_SECTION.reset(self._token)
+        folder = self.folder
+        folder.makedirs()
+        if self.profiler is not None:
+            self.profiler.disable()
+            stats = pstats.Stats(self.profiler)
+            for inner in self.inner:
+                stats.add(inner)
+            stats.dump_stats(folder / (self.name + ".pstats"))
+            LOG.info("profile data: %s" % (folder / (self.name + ".pstats")))
+        if self.snapshot is not None:
+            self.writeMemoryReport(folder)
+        outer = self.outer
+        if outer is not None:
+            if self.profiler is not None:
+                outer.inner.append(self.profiler)
+                outer.inner.extend(self.inner)
+            if outer.profiler is not None:
+                outer.profiler.enable()
+        elif tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @classmethod
+    def takeSnapshot(cls):
+        # drop allocations of the profiling tools
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, cProfile.__file__)
+            , tracemalloc.Filter(False, pstats.__file__)
+            , tracemalloc.Filter(False, tracemalloc.__file__) ))
+
+    def writeMemoryReport(self, folder):
+        snapshot = self.takeSnapshot()
+        snapshot.dump(folder / (self.name + ".tracemalloc"))
+        current, peak = tracemalloc.get_traced_memory()
+        fname = folder / (self.name + ".tracemalloc.txt")
+        with fname.openTextFile(mode='w', encoding='utf-8') as out:
+            out.write("traced memory: current %s bytes / peak %s bytes\n\n" % (current, peak))
+            out.write("top %s allocations of %s:\n\n" % (self.TOP_ALLOCATIONS, self.name))
+            for stat in snapshot.compare_to(self.snapshot, "lineno")[:self.TOP_ALLOCATIONS]:
+                out.write("%s\n" % stat)
+        LOG.info("memory snapshot: %s" % fname)
+
 # ==============================================================================
 class PContainer(Container):
 # ==============================================================================
@@ -108,7 +281,7 @@ class PContainer(Container):
 
     The persistence is a json dump in the file given by constructor's argument
     ``fname``. It serialize only properties (objects) which are covered by the
-    :py:mod:`json.dump`.
+    :py:mod:`json.dump`.  With ``fname=None`` the container is not persistent.
     """
     @property
     def __dict__(self):
@@ -121,17 +294,19 @@ class PContainer(Container):
         self[attr] = val
 
     def __init__(self, fname, *args, **kwargs):
-        dict.__setattr__(self, "pFile", FSPath(fname))
+        dict.__setattr__(self, "pFile", None if fname is None else FSPath(fname))
         self.updFromFile()
         super(PContainer, self).__init__(self, *args, **kwargs)
 
     def updFromFile(self):
-        if not self.pFile.EXISTS:
+        if self.pFile is None or not self.pFile.EXISTS:
             return
         with self.pFile.openTextFile(mode='r', encoding='utf-8') as jsonFile:
             self.update(json.load(jsonFile, encoding='utf-8'))
 
     def writeToFile(self):
+        if self.pFile is None:
+            return
         tmpFile = FSPath(self.pFile + "tmp")
         with tmpFile.openTextFile(mode='w', encoding='utf-8') as jsonFile:
             jsonFile.write(str(json.dumps(self, ensure_ascii=False)))
@@ -165,6 +340,19 @@ class EntityContainer(PContainer):
         else:
             self[attr] = val
 
+# ==============================================================================
+class CLIParser(argparse.ArgumentParser):
+# ==============================================================================
+
+    u"""Writes the help and the error messages to the streams of the current
+    context (``appl_out``, ``log_out``), not to ``sys.stdout`` / ``sys.stderr``
+    (e.g. the daemon sends them to the client)."""
+
+    def _print_message(self, message, file=None):
+        if message:
+            ctx = currentContext()
+            (ctx.log_out if file is sys.stderr else ctx.appl_out).write(message)
+
 # ==============================================================================
 class CLI(object):
 # ==============================================================================
@@ -187,7 +375,7 @@ class CLI(object):
                 "description"
                 , kwargs["epilog"].strip().split("\n")[0] if kwargs["epilog"] else None)
 
-        self.parser        = argparse.ArgumentParser(*args, **kwargs)
+        self.parser        = CLIParser(*args, **kwargs)
 
         if self.cmdFunc is None:
             self.cliSubParsers = self.parser.add_subparsers(title='commands', dest='command')
@@ -209,6 +397,21 @@ class CLI(object):
             , action  = 'store_true'
             , help    = 'run in quiet mode' )
 
+        self.add_argument(
+            '--profile-out'
+            , type    = FSPath
+            , default = None
+            , metavar = 'FOLDER'
+            , help    = 'profile the command (cProfile) and write *.pstats files'
+            ' (per command and book) into FOLDER' )
+
+        self.add_argument(
+            '--trace-memory'
+            , action  = 'store_true'
+            , help    = 'trace memory allocations (tracemalloc) and write top'
+            ' allocation snapshots (per command and book) into the --profile-out'
+            ' folder (default: ./profile)' )
+
     def addCMDParser(self, func, cmdName=None):
 
         if self.cliSubParsers is None:
@@ -223,7 +426,7 @@ class CLI(object):
         subCmd.set_defaults(func=func)
         return subCmd
 
-    def __call__(self):
+    def __call__(self, argv=None):
 
         _exitCode  = 0
         _exception = None
@@ -231,24 +434,25 @@ class CLI(object):
 
         self.autocomplete()
 
-        cmd_args = self.parser.parse_args()
+        cmd_args = self.parser.parse_args(argv)
         cmd_args.CLI = self
 
         if OS_ENV.get("DEBUG", None):
             cmd_args.debug = True
 
-        # pylint: disable=W0603
-        global DEBUG, VERBOSE, QUIET
-        DEBUG   = cmd_args.debug
-        VERBOSE = cmd_args.verbose
-        QUIET   = cmd_args.quiet
+        # the command runs in its own context
+        ctx = currentContext().derive(
+            debug         = cmd_args.debug
+            , verbose     = cmd_args.verbose
+            , quiet       = cmd_args.quiet
+            , profileOut  = cmd_args.profile_out
+            , traceMemory = cmd_args.trace_memory )
 
-        LOG.debug(u"argparse --> %s\n" % cmd_args)
         try:
-            if self.cmdFunc is None:
-                _retVal = cmd_args.func(cmd_args)
-            else:
-                _retVal = self.cmdFunc(cmd_args)
+            func = self.cmdFunc or cmd_args.func
+            with useContext(ctx), ProfileCapture(func.__name__):
+                LOG.debug(u"argparse --> %s\n" % cmd_args)
+                _retVal = func(cmd_args)
             try:
                 _exitCode = int(_retVal)
             except Exception as exc: # pylint: disable=W0703
@@ -259,7 +463,7 @@ class CLI(object):
                 raise
             _exitCode  = 42
             _exception = str(exc)
-            sys.stderr.write(u"FATAL ERROR: %s\n" % _exception)
+            ctx.log_out.write(u"FATAL ERROR: %s\n" % _exception)
         sys.exit(_exitCode)
 
     def autocomplete(self):
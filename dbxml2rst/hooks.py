@@ -16,8 +16,13 @@ u"""
 # imports
 # ==============================================================================
 
+import functools
+import time
+
+from lxml import etree
 from fspath import FSPath
-from .nodes import XMLTag, Table
+from .helper import currentContext
+from .nodes import XMLTag, Table, TableModel, RSTEmitter
 
 # ==============================================================================
 # constants
@@ -25,22 +30,183 @@ from .nodes import XMLTag, Table
 
 RESOUCE_FORMAT = "%s_files"
 
+# render context of the flat-table markup (see hook_flatten_tables)
+FlatTableContext = Table.contextType.extend("header_rows", "stub_columns", "widths")
+
 # ==============================================================================
-def hook_copy_file_resource(srcFolder):
+class ElementIndex(object):
 # ==============================================================================
 
-    srcFolder = FSPath(srcFolder)
+    u"""The elements of a document selected by tags and attributes.
 
-    def hookFunc(node, rstPrefix, parseData):  # pylint: disable=W0613
+    The index is build by one traversal of the document (on the first
+    :py:meth:`select`).  Selected elements which are no longer in the document
+    are skipped, elements replaced by a :py:meth:`.nodes.XMLTag.copyNode` are
+    followed to their copy::
+
+        index = ElementIndex(root, tags=("tr", "td"), attrs=("fileref",))
+        for elem in index.select("tr"):
+            ...
+        for elem in index.selectAttr("fileref"):
+            ...
+    """
+
+    def __init__(self, root, tags=(), attrs=()):
+        self.root   = root
+        self.tags   = tuple(tags)
+        self.attrs  = tuple(attrs)
+        self.byTag  = None
+        self.byAttr = None
+
+    def build(self):
+        byTag  = dict([(tag, []) for tag in self.tags])
+        byAttr = dict([(attr, []) for attr in self.attrs])
+        attrs  = self.attrs
+        for elem in self.root.iterdescendants(etree.Element): # pylint: disable=E1101
+            elemList = byTag.get(elem.tag)
+            if elemList is not None:
+                elemList.append(elem)
+            for attr in attrs:
+                if elem.get(attr) is not None:
+                    byAttr[attr].append(elem)
+        self.byTag, self.byAttr = byTag, byAttr
+
+    def isAttached(self, elem):
+        u"""``True`` if ``elem`` is (still) in the document."""
+        for ancestor in elem.iterancestors():
+            if ancestor is self.root:
+                return True
+        return False
+
+    def _live(self, elemList, match):
+        copies = XMLTag.state.nodeCopies or {}
+        seen   = set()
+        for elem in elemList:
+            while elem is not None and not self.isAttached(elem):
+                elem = copies.get(elem)
+            if elem is None or elem in seen or not match(elem):
+                continue
+            seen.add(elem)
+            yield elem
+
+    def select(self, *tags):
+        u"""Returns the elements with one of the ``tags`` (in the order of the
+        tags and in document order)."""
+        if self.byTag is None:
+            self.build()
+        elemList = []
+        for tag in tags:
+            elemList += self.byTag[tag]
+        return list(self._live(elemList, lambda elem: elem.tag in tags))
+
+    def selectAttr(self, attr):
+        u"""Returns the elements with attribute ``attr`` (in document order)."""
+        if self.byAttr is None:
+            self.build()
+        return list(self._live(self.byAttr[attr], lambda elem: elem.get(attr) is not None))
 
+# ==============================================================================
+class RootHook(object):
+# ==============================================================================
+
+    u"""A hook which runs only on the root node.
+
+    The hook function is called with the root node, the
+    :py:class:`ElementIndex` of the ``tags`` and ``attrs`` it selects and the
+    ``parseData``.  A root hook can be used as any other hook, consecutive root
+    hooks can be fused into one traversal of the document (see
+    :py:func:`fuseHooks`)."""
+
+    def __init__(self, func, tags=(), attrs=()):
+        functools.update_wrapper(self, func)
+        self.func  = func
+        self.tags  = tuple(tags)
+        self.attrs = tuple(attrs)
+
+    def __call__(self, node, rstPrefix, parseData):  # pylint: disable=W0613
         # run this hook only on the root node
         if node.getparent() is not None:
             return node
+        self.func(node, ElementIndex(node, self.tags, self.attrs), parseData)
+        return node
+
+def rootHook(tags=(), attrs=()):
+    u"""Decorator of a :py:class:`RootHook` function ``func(root, index, parseData)``"""
+    def decorator(func):
+        return RootHook(func, tags, attrs)
+    return decorator
+
+# ==============================================================================
+class FusedRootHooks(object):
+# ==============================================================================
+
+    u"""Root hooks which share one :py:class:`ElementIndex` of the document.
+
+    The hooks are called in the given order, each selects from the index
+    (instead of scanning the whole document).  If the current context has
+    ``walkStats``, each hook is counted by its own name, the fused hook counts
+    the index and all hooks together (see :py:class:`.timing.WalkStats`)."""
+
+    def __init__(self, hooks):
+        self.hooks = list(hooks)
+        tags, attrs = [], []
+        for hook in self.hooks:
+            tags  += [tag for tag in hook.tags if tag not in tags]
+            attrs += [attr for attr in hook.attrs if attr not in attrs]
+        self.tags  = tuple(tags)
+        self.attrs = tuple(attrs)
+        self.__qualname__ = "fused(%s)" % ", ".join([h.__qualname__ for h in self.hooks])
+
+    def __call__(self, node, rstPrefix, parseData):  # pylint: disable=W0613
+        # run this hook only on the root node
+        if node.getparent() is not None:
+            return node
+        stats = currentContext().walkStats
+        index = ElementIndex(node, self.tags, self.attrs)
+        XMLTag.state.nodeCopies = dict()
+        try:
+            for hook in self.hooks:
+                if stats is None:
+                    hook.func(node, index, parseData)
+                    continue
+                t = time.perf_counter()
+                hook.func(node, index, parseData)
+                stats.countHook(hook, time.perf_counter() - t)
+        finally:
+            XMLTag.state.nodeCopies = None
+        return node
+
+def fuseHooks(hooks):
+    u"""Returns the list of ``hooks`` with consecutive :py:class:`RootHook`
+    items fused into one :py:class:`FusedRootHooks`."""
+    retVal = []
+    group  = []
+    for hook in list(hooks) + [None]:
+        if isinstance(hook, RootHook):
+            group.append(hook)
+            continue
+        if len(group) > 1:
+            retVal.append(FusedRootHooks(group))
+        else:
+            retVal += group
+        group = []
+        if hook is not None:
+            retVal.append(hook)
+    return retVal
+
+# ==============================================================================
+def hook_copy_file_resource(srcFolder):
+# ==============================================================================
+
+    srcFolder = FSPath(srcFolder)
+
+    @rootHook(attrs=("fileref",))
+    def hookFunc(node, index, parseData):
 
         # are there any filerefs in?
-        filerefList = node.findall(".//*[@fileref]")
+        filerefList = index.selectAttr("fileref")
         if not filerefList:
-            return node
+            return
 
         thisFile   = FSPath(parseData.fname)
         bookBase   = FSPath(parseData.folder)
@@ -59,7 +225,6 @@ def hook_copy_file_resource(srcFolder):
             src.copyfile(dstFolder)
             tag.set("fileref", resFolder / fileref )
             #SDK.CONSOLE()
-        return node
     return hookFunc
 
 
@@ -74,69 +239,69 @@ def hook_chunk_by_tag(*chunkPathes):
     """
     chunkPathes = chunkPathes
 
-    def hookFunc(node, rstPrefix, parseData): # pylint: disable=W0613
+    @rootHook()
+    def hookFunc(node, _index, parseData):
+        for elem in getChunkNodes(node, chunkPathes):
+            ID = getChunkID(elem, parseData.fname)
+            ext_entity = parseData.fname.DIRNAME / ("%s.xml" % ID)
+            XMLTag.chunkNode(
+                elem
+                , parseData.folder
+                , ext_entity.suffix(parseData.fname.SUFFIX)
+                , store = parseData.store)
+    return hookFunc
 
-        # run this hook only on the root node
-        if node.getparent() is not None:
-            return node
-        realNode = node
-
-        if (node.tag == "dummy"
-            and len(node) == 1
-            and node[0].get("chunkNode") is not None):
-            realNode = node[0]
-
-        for tag in chunkPathes:
-            # pylint: disable=R0204
-            chunkNodes = realNode.findall("%s" % tag)
-            for elem in chunkNodes:
-                if elem.get("chunkNode") is not None:
-                    continue
-                ID = elem.get("id")
-                if ID is None:
-                    # generate unique ID by counting preceding siblings on any
-                    # hierarchy level.
-                    _p = elem
-                    ID = []
-                    while _p is not None:
-                        if _p.tag == "dummy":
-                            break
-                        ID.insert(0, len(list(_p.itersiblings(preceding=True))))
-                        _p = _p.getparent()
-                    ID = "-".join(["%03d" % x for x in ID])
-                    ID = "%s-%s" % (parseData.fname.BASENAME.SKIPSUFFIX, ID)
-                ext_entity = parseData.fname.DIRNAME / ("%s.xml" % ID)
-                XMLTag.chunkNode(
-                    elem
-                    , parseData.folder
-                    , ext_entity.suffix(parseData.fname.SUFFIX))
-            if len(chunkNodes):
+def getChunkNodes(node, chunkPathes):
+    u"""Returns the nodes chunked by :py:func:`hook_chunk_by_tag` from the root
+    ``node``"""
+
+    realNode = node
+    if (node.tag == "dummy"
+        and len(node) == 1
+        and node[0].get("chunkNode") is not None):
+        realNode = node[0]
+
+    for tag in chunkPathes:
+        chunkNodes = realNode.findall("%s" % tag)
+        if len(chunkNodes):
+            return [elem for elem in chunkNodes if elem.get("chunkNode") is None]
+    return []
+
+def getChunkID(elem, fname):
+    u"""Returns the ID of a chunk, which is also the name of the chunk file."""
+
+    ID = elem.get("id")
+    if ID is None:
+        # generate unique ID by counting preceding siblings on any
+        # hierarchy level.
+        _p = elem
+        ID = []
+        while _p is not None:
+            if _p.tag == "dummy":
                 break
-        return node
-    return hookFunc
+            ID.insert(0, len(list(_p.itersiblings(preceding=True))))
+            _p = _p.getparent()
+        ID = "-".join(["%03d" % x for x in ID])
+        ID = "%s-%s" % (fname.BASENAME.SKIPSUFFIX, ID)
+    return ID
 
 # ==============================================================================
-def hook_html2db_table(node, rstPrefix, parseData): # pylint: disable=W0613
+@rootHook(tags=("tr", "th", "td"))
+def hook_html2db_table(node, index, parseData): # pylint: disable=W0613
 # ==============================================================================
     u"""This hook converts a HTML table to a DocBook table
 
     This is done by simply change ``<tr>`` and ``<td>`` (``<th>``) tags to
     ``<row>`` and ``<entry>`` tags
     """
-    # run this hook only on the root node
-    if node.getparent() is not None:
-        return node
-
-    for elem in node.findall(".//tr"):
+    for elem in index.select("tr"):
         newNode = XMLTag.copyNode(elem, "row", moveID=True)
         XMLTag.replaceNode(elem, newNode)
 
-    for elem in node.findall(".//th") + node.findall(".//td"):
+    for elem in index.select("th", "td"):
         newNode = XMLTag.copyNode(elem, "entry", moveID=True)
         XMLTag.replaceNode(elem, newNode)
 
-    return node
-
 # ==============================================================================
 def hook_fix_broken_tables(fname_list=None, id_list=None):
 # ==============================================================================
@@ -160,41 +325,23 @@ def hook_fix_broken_tables(fname_list=None, id_list=None):
             return node
 
         table  = node
-        tgroup = table.find("tgroup")
+        model  = TableModel.get(table)
+        tgroup = model.tgroup
         cols   = int(tgroup.get("cols"))
-        thead  = tgroup.find("thead")
-        tbody  = tgroup.find("tbody")
-
-        if thead is not None:
-            # is there any row in the header with more entries as defined cols?
-            for row in thead.findall("row"):
-                entries = row.findall("entry")
-                if len(entries) > cols:
-                    cols = len(entries)
-                    tgroup.set("cols", str(cols))
-
-        for row in tbody.findall("row"):
-            # is there any row in the body with more entries as defined cols?
-            entries = row.findall("entry")
-            if len(entries) > cols:
-                cols = len(entries)
+
+        # is there any row in the header or body with more entries as defined
+        # cols?
+        for row in model.headRows + model.bodyRows:
+            if len(row.entries) > cols:
+                cols = len(row.entries)
                 tgroup.set("cols", str(cols))
 
-        if thead is not None:
-            # add missing entries to header rows
-            for row in thead.findall("row"):
-                entries = row.findall("entry")
-                if len(entries) < cols:
-                    for _x in range(cols - len(entries)):
-                        row.append(node.makeelement("entry"))
-
-        # add missing entries to body rows
-        for row in tbody.findall("row"):
-            entries = row.findall("entry")
-
-            if len(entries) < cols:
-                for _x in range(cols - len(entries)):
-                    row.append(node.makeelement("entry"))
+        # add missing entries to header and body rows
+        for row in model.headRows + model.bodyRows:
+            if len(row.entries) < cols:
+                for _x in range(cols - len(row.entries)):
+                    row.node.append(node.makeelement("entry"))
+        TableModel.invalidate(table)
         return node
     return hookFunc
 
@@ -218,28 +365,31 @@ def hook_replaceTag(id2TagMap):
 
 
 # ==============================================================================
-def hook_drop_usless_informaltables(node, _rstPrefix, _parseData):
+@rootHook(tags=("informaltable",))
+def hook_drop_usless_informaltables(node, index, _parseData):
 # ==============================================================================
 
     u"""Hook to convert useless informatables to (e.g) paragraphs"""
-    # run this hook only on the root node
-    if node.getparent() is not None:
-        return node
-
-    for table in node.findall(".//informaltable"):
-        tbody = table.find(".//tbody")
+    for table in index.select("informaltable"):
+        model = TableModel.get(table)
+        if not model.tbodies:
+            # e.g. a table from HTML or a broken table
+            continue
+        tbody = model.tbodies[0]
+        rows  = [row for row in model.rows if tbody in row.groups]
         max_cols = 0
-        for row in tbody.findall(".//row"):
-            c = len(row.findall(".//entry"))
+        for row in rows:
+            c = len(row.allEntries)
             if c > max_cols:
                 max_cols = c
         section = node.makeelement("section")
-        if max_cols < 2:
-            for entry in tbody.find(".//entry"):
-                para = XMLTag.copyNode(entry, "para", moveID=True)
+        entries = [row.allEntries[0] for row in rows if row.allEntries]
+        if max_cols < 2 and entries:
+            for child in entries[0]:
+                para = XMLTag.copyNode(child, "para", moveID=True)
                 section.append(para)
+            TableModel.invalidate(table)
             XMLTag.replaceNode(table, section)
-    return node
 
 # ==============================================================================
 def hook_flatten_tables(table_id_list="all"):
@@ -252,12 +402,9 @@ def hook_flatten_tables(table_id_list="all"):
 
     table_id_list = table_id_list
 
-    def hookFunc(node, rstPrefix, parseData):   # pylint: disable=W0613
-        # run this hook only on the root node
-        if node.getparent() is not None:
-            return node
-
-        for table in node.findall(".//table") + node.findall(".//informaltable"):
+    @rootHook(tags=("table", "informaltable"))
+    def hookFunc(node, index, parseData):   # pylint: disable=W0613
+        for table in index.select("table", "informaltable"):
             if (table_id_list == "all"
                 or table.get("id") in table_id_list):
 
@@ -267,47 +414,7 @@ def hook_flatten_tables(table_id_list="all"):
                 # rejected by the docbook toolchains. These colspecs must be
                 # *repaired* in any matter.
 
-                colspec = {}
-                colspecByNumber = {}
-
-                for colspec_count, c in enumerate(table.findall(".//colspec")):
-                    colnum = c.get("colnum")
-                    if colnum is not None:
-                        try:
-                            colnum = int(colnum)
-                        except Exception: # pylint: disable=W0703
-                            pass
-                    if colnum is None:
-                        colnum = colspec_count
-                    colname = c.get("colname")
-                    if colname is None:
-                        colname = ""
-                    align = c.get("align")
-                    colwidth = c.get("colwidth")
-                    if colwidth is not None:
-                        colwidth = colwidth.replace("*","")
-                        # some colspec definition use the "&#x22C6;" entity
-                        colwidth = colwidth.replace(u"⋆", "")
-                        try:
-                            colwidth = int(colwidth)
-                        except Exception:  # pylint: disable=W0703
-                            colwidth = None
-                    colspec[colname] = (colnum, align, colwidth )
-                    colspecByNumber[colnum] = (colname, align, colwidth)
-
-                spanspec = {}
-                for item in table.findall(".//spanspec"):
-                    spanname = item.get("spanname")
-                    namest   = item.get("namest")
-                    nameend  = item.get("nameend")
-                    if spanname is None or namest is None or nameend is None:
-                        continue
-                    start = colspec.get(namest, [None, None,None])[0]
-                    end   = colspec.get(nameend, [None, None,None])[0]
-                    if start is None or end is None:
-                        continue
-                    spanspec[spanname] = end - start
-
+                model = TableModel.get(table)
 
                 # convert table to double-stage list
 
@@ -317,10 +424,10 @@ def hook_flatten_tables(table_id_list="all"):
 
                 # eat all rows, include the rows from entrytbl
 
-                for row in table.findall(".//row"):
+                for row in model.rows:
                     row_count += 1
                     flatRow = node.makeelement("listitem")
-                    row_id = row.get("id")
+                    row_id = row.ID
                     if row_id:
                         flatRow.text = ".. _`%s`:" % row_id
                     else:
@@ -330,9 +437,9 @@ def hook_flatten_tables(table_id_list="all"):
                     colList = node.makeelement("itemizedlist")
                     flatRow.append(colList)
                     col_count = 0
-                    for entry in row.findall(".//entry"):
+                    for entry in row.allEntries:
                         col_count += 1
-                        cspan = spanspec.get(entry.get("spanname"), 0)
+                        cspan = model.getSpan(entry.get("spanname"))
                         if cspan == 0:
                             # the colspan attribut comes from tables which has
                             # been converted from html (see hook_html2db_table)
@@ -369,7 +476,8 @@ def hook_flatten_tables(table_id_list="all"):
 
                 widths = []
                 for i in range(max_cols):
-                    colname, align, colwidth = colspecByNumber.get(i, (None, None, None))
+                    colspec  = model.colspecByNumber.get(i, None)
+                    colwidth = None if colspec is None else colspec.colwidth
                     if colwidth is None:
                         colwidth = 1
                     widths.append(str(colwidth))
@@ -380,7 +488,7 @@ def hook_flatten_tables(table_id_list="all"):
                     if w != widths[0]:
                         useWidth = True
                         break
-                if len(colspec) > max_cols:
+                if len(model.colspecByName) > max_cols:
                     # The colspec definition has more entries than columns
                     # existing in the table definition. This indicates, that the
                     # colspec definition is buggy. I don't use width definitions
@@ -389,34 +497,30 @@ def hook_flatten_tables(table_id_list="all"):
 
                 # insert prefix
 
-                ctx = Table().getContext(table)
-                ctx.header_rows  = len(table.findall(".//thead/row") or [])
+                ctx = FlatTableContext()
+                ctx.update(Table().getContext(table))
+                ctx.header_rows  = len([r for r in model.rows if r.section == "thead"])
                 ctx.stub_columns = 1 if table.get("rowheader") == "firstcol" else 0
                 ctx.widths = " ".join(widths)
 
-                preText = "\n" if not ctx.ID else Table.rstAnchor
-                preText +=  "\n.. flat-table::%(title)s"
-                preText += "\n    :header-rows:  %(header_rows)s"
-                preText += "\n    :stub-columns: %(stub_columns)s"
+                preText = RSTEmitter("\n" if not ctx.ID else Table.rstAnchor)
+                preText.write("\n.. flat-table::%(title)s"
+                              , "\n    :header-rows:  %(header_rows)s"
+                              , "\n    :stub-columns: %(stub_columns)s")
                 if useWidth:
-                    preText += "\n    :widths:       %(widths)s"
-                preText += "\n    "
-                preText += "\n%(tableStartMark)s"
-                new = XMLTag.getInjBlockTag()
-                new.text += preText % ctx
-                table.addprevious(new)
+                    preText.write("\n    :widths:       %(widths)s")
+                preText.write("\n    ", "\n%(tableStartMark)s")
+                table.addprevious(XMLTag.getInjBlockTag(preText.getValue(ctx)))
 
                 # insert postfix
 
                 rstPostText = "\n%(tableEndMark)s\n"
-                new = XMLTag.getInjBlockTag()
-                new.text += rstPostText % ctx
-                table.addnext(new)
+                table.addnext(XMLTag.getInjBlockTag(rstPostText % ctx))
 
                 # replace table
 
+                TableModel.invalidate(table)
                 XMLTag.replaceNode(table, flatTable)
-        return node
     return hookFunc
 
 
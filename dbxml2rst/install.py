@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.install
+    ~~~~~~~~~~~~~~~~~
+
+    Diff-based install of the converted books used by the dbxml2rst library
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import shutil
+import hashlib
+import ctypes
+import ctypes.util
+
+from fspath import FSPath
+
+from .helper import Container, LOG
+
+# ==============================================================================
+def fileHash(fname, blockSize=64 * 1024):
+# ==============================================================================
+
+    u"""SHA-256 (hex) of the content of file ``fname``"""
+
+    h = hashlib.sha256()
+    with open(fname, "rb") as f:
+        for block in iter(lambda: f.read(blockSize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# ==============================================================================
+def sameContent(a, b):
+# ==============================================================================
+
+    u"""``True`` if the files ``a`` and ``b`` have the same content."""
+
+    try:
+        if os.path.getsize(a) != os.path.getsize(b):
+            return False
+    except OSError:
+        return False
+    return fileHash(a) == fileHash(b)
+
+_libc = None
+if ctypes.util.find_library("c"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        pass
+
+# ==============================================================================
+def exchangeFolders(a, b):
+# ==============================================================================
+
+    u"""Swap the folders ``a`` and ``b``.
+
+    On Linux the folders are exchanged atomically (``renameat2`` with
+    ``RENAME_EXCHANGE``), on other systems (or filesystems without support) the
+    folders are swapped by three renames."""
+
+    renameat2 = getattr(_libc, "renameat2", None) if _libc else None
+    if renameat2 is not None:
+        AT_FDCWD, RENAME_EXCHANGE = -100, 2
+        if renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+            return
+    tmp = FSPath(str(a) + ".swap")
+    os.rename(a, tmp)
+    os.rename(b, a)
+    os.rename(tmp, b)
+
+# ==============================================================================
+class SyncInstall(object):
+# ==============================================================================
+
+    u"""Diff-based install of files into a folder.
+
+    Only files with a new content are written, files with unchanged content keep
+    their mtime (Sphinx will not re-read them) and files which are no longer
+    installed are removed.  The new content of the folder is build in a
+    staging folder (next to the install folder) and swapped in atomically::
+
+        installer = SyncInstall(FSPath("out/kernel-hacking"))
+        installer.addFile(FSPath("cache/kernel-hacking/index.rst"), "index.rst")
+        installer.addTree(FSPath("cache/kernel-hacking/index_files"), "index_files")
+        installer.commit()
+
+    The files named in ``keep`` (e.g. ``conf.py``) are taken over from the
+    current install folder.
+    """
+
+    def __init__(self, dstFolder, keep=("conf.py",)):
+        self.dstFolder = FSPath(dstFolder)
+        self.keep      = keep
+        self.files     = dict()
+        self.stats     = Container(new=0, changed=0, unchanged=0, removed=0)
+
+    def addFile(self, src, relDst):
+        u"""Install file ``src`` as ``relDst`` (relative to the install folder)."""
+        self.files[os.path.normpath(relDst)] = FSPath(src)
+
+    def addTree(self, srcFolder, relDst):
+        u"""Install all files of ``srcFolder`` into folder ``relDst``."""
+        srcFolder = FSPath(srcFolder)
+        for folder, _dirs, files in os.walk(srcFolder):
+            for name in files:
+                src = FSPath(folder) / name
+                self.addFile(src, FSPath(relDst) / src.relpath(srcFolder))
+
+    def _place(self, src, old, new):
+        new.DIRNAME.makedirs()
+        if old is not None and old.ISFILE and sameContent(src, old):
+            # take over the unchanged file from the current install
+            try:
+                os.link(old, new)
+            except OSError:
+                shutil.copy2(old, new)
+            return True
+        shutil.copyfile(src, new)
+        return False
+
+    def commit(self):
+        u"""Swap the new content into the install folder."""
+
+        staging = FSPath(str(self.dstFolder) + ".install-new")
+        if staging.EXISTS:
+            staging.rmtree()
+        staging.makedirs()
+
+        exists = self.dstFolder.EXISTS
+        for name in self.keep:
+            if exists and (self.dstFolder / name).EXISTS:
+                shutil.copy2(self.dstFolder / name, staging / name)
+
+        for relDst, src in sorted(self.files.items()):
+            old = self.dstFolder / relDst if exists else None
+            if self._place(src, old, staging / relDst):
+                self.stats.unchanged += 1
+            elif old is not None and old.EXISTS:
+                self.stats.changed += 1
+                LOG.msg("install file %s (changed)" % (self.dstFolder / relDst))
+            else:
+                self.stats.new += 1
+                LOG.msg("install file %s (new)" % (self.dstFolder / relDst))
+
+        if exists:
+            for folder, _dirs, files in os.walk(self.dstFolder):
+                for name in files:
+                    relDst = os.path.relpath(os.path.join(folder, name), self.dstFolder)
+                    if relDst not in self.files and relDst not in self.keep:
+                        self.stats.removed += 1
+                        LOG.msg("remove file %s" % (self.dstFolder / relDst))
+            exchangeFolders(self.dstFolder, staging)
+            staging.rmtree()
+        else:
+            if self.dstFolder.DIRNAME:
+                self.dstFolder.DIRNAME.makedirs()
+            os.rename(staging, self.dstFolder)
+
+        LOG.msg("installed %s: %s new, %s changed, %s unchanged, %s removed" % (
+            self.dstFolder, self.stats.new, self.stats.changed
+            , self.stats.unchanged, self.stats.removed))
+        return self.stats
@@ -18,20 +18,32 @@ u"""
 # imports
 # ==============================================================================
 
+import io
+import os
 import re
-from html.parser import HTMLParser # pylint: disable=F0401
+import mmap
+import codecs
+import time
+import tempfile
+import html
+import threading
+import contextlib
 from lxml import etree
 
 from fspath import FSPath
 
 from .helper import Container
-from .helper import LOG
+from .helper import LOG, currentContext, useContext
+from .artifacts import DiskStore
+
+# size of the slices, the memory-mapped files are validated (see isUTF8)
+UTF8_CHUNK = 1 << 20
 
 INT_ENTITES = Container()
 INT_ENTITES["nbsp"] = r" "
 for x in ["frac12", "frac13", "frac14", "times", "copy", "hellip", "le", "ge"
           , "sub", "sup", "micro", "plusmn", "mdash", "alpha", "num", "ndash" ]:
-    INT_ENTITES[x] = HTMLParser().unescape("&%s;" % x)
+    INT_ENTITES[x] = html.unescape("&%s;" % x)
 
 # ==============================================================================
 def filterXML(
@@ -41,7 +53,11 @@ def filterXML(
         , fragTag = None, ID = None ):
 # ==============================================================================
 
-    u"""Replace some xml-Markups with reST literals."""
+    u"""Replace some xml-Markups with reST literals.
+
+    The files are read from and written to the artifact store
+    ``xmlFilter.parseData.store`` (see :py:mod:`dbxml2rst.artifacts`), if
+    there is no store, the files in ``folder`` are used."""
 
     folder    = FSPath(folder)
     outFile   = FSPath(outFile)
@@ -49,14 +65,138 @@ def filterXML(
     xmlFilter.parseData.update(
         outFile         = outFile
         , parseIncludes = parseIncludes )
+    if xmlFilter.parseData.store is None:
+        xmlFilter.parseData.store = DiskStore(folder)
+
+    if xmlFilter.parseData.streamTags:
+        streamFilterXML(folder, inFile, outFile, xmlFilter, fragTag=fragTag, ID=ID)
+        return
+
+    # the table models are shared within the document (see TableModel)
+    with useContext(currentContext().derive(tableModels=dict())):
+        rootNode  = xmlFilter.parseFile(folder, inFile, fragTag=fragTag, ID=ID)
+        xmlFilter.walk(rootNode)
+    xmlFilter.parseData.store.write(
+        outFile
+        # pylint: disable=E1101
+        , etree.tostring(rootNode, encoding='unicode'))
 
-    rootNode  = xmlFilter.parseFile(folder, inFile, fragTag=fragTag, ID=ID)
-    xmlFilter.walk(rootNode)
-    with (folder / outFile).openTextFile("w") as out:
-        out.write(
-            # pylint: disable=E1101
-            etree.tostring(rootNode, encoding='unicode')
-        )
+# ==============================================================================
+def streamFilterXML(
+        folder, inFile, outFile
+        , xmlFilter
+        , fragTag = None, ID = None ):
+# ==============================================================================
+
+    u"""Low-memory variant of :py:func:`filterXML` (streaming mode).
+
+    The XML file is read incrementally (:py:class:`lxml.etree.XMLPullParser`).
+    Every subtree with a tag from ``xmlFilter.parseData.streamTags`` (e.g.
+    ``refentry``, ``chapter``, ``sect1``) is filtered as soon as it is
+    complete.  The filtered subtree is serialized to a spool file and freed, so
+    the peak memory depends on the largest subtree, not on the whole book.  At
+    the end, the remaining *skeleton* of the document is filtered and the
+    spooled subtrees are written piece by piece to the output (see
+    :py:meth:`.artifacts.ArtifactStore.openWrite`).
+
+    The subtree is detached from the document and filtered within a copy of
+    its ancestors (tags and attributes only), thus the root hooks (those which
+    run only on the root node) see each subtree and the skeleton as a document
+    of its own.  Chunking (:py:func:`dbxml2rst.hooks.hook_chunk_by_tag`) is not
+    supported in streaming mode.
+    """
+
+    cls        = xmlFilter.__class__
+    streamTags = xmlFilter.parseData.streamTags
+    store      = xmlFilter.parseData.store or DiskStore(folder)
+    xmlFilter.parseData.update(folder = folder, fname = inFile, store = store)
+
+    with store.openText(inFile) as f:
+        xmlFlag = f.readline().startswith("<?xml")
+
+    parser = etree.XMLPullParser(events=("start", "end")) # pylint: disable=E1101
+    spool  = tempfile.TemporaryFile()
+    chunks = []
+    depth  = 0
+
+    def filterChunk(elem):
+        # detach subtree, leave a placeholder in the document
+        placeholder = elem.makeelement(cls.rstStreamChunk_tag)
+        placeholder.set("idx", str(len(chunks)))
+        placeholder.tail = elem.tail
+        elem.tail = None
+        ancestors = list(elem.iterancestors())
+        elem.getparent().replace(elem, placeholder)
+
+        # filter subtree within a copy of its ancestors
+        root = inner = None
+        for node in reversed(ancestors):
+            copy = etree.Element(node.tag, dict(node.attrib))  # pylint: disable=E1101
+            if inner is None:
+                root = copy
+            else:
+                inner.append(copy)
+            inner = copy
+        inner.append(elem)
+        for func in xmlFilter.parseData.hooks:
+            if func(root, "", xmlFilter.parseData) is None:
+                raise Exception("hook %r doesn't return a xml node!'" % func)
+        xmlFilter.walkChilds(inner, xmlFilter.rstBlock)
+
+        TableModel.invalidate()
+        data = ((inner.text or "") + "".join([
+            etree.tostring(child, encoding='unicode') for child in inner ])) # pylint: disable=E1101
+        data = data.encode("utf-8")
+        chunks.append((spool.tell(), len(data)))
+        spool.write(data)
+
+    def readEvents():
+        nonlocal depth
+        for event, elem in parser.read_events():
+            if elem.tag not in streamTags:
+                continue
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 0 and elem.getparent() is not None:
+                filterChunk(elem)
+
+    # the table models are shared within the document (see TableModel)
+    with spool, useContext(currentContext().derive(tableModels=dict())):
+        if not xmlFlag:
+            preTag = ""
+            if fragTag:
+                preTag = u"<%s%s>" % (fragTag, ' id="%s"' % ID if ID is not None else "")
+            parser.feed(u"<dummy>" + preTag)
+        with store.openText(inFile) as f:
+            while True:
+                block = f.read(cls.streamBlockSize)
+                if not block:
+                    break
+                parser.feed(block)
+                readEvents()
+        if not xmlFlag:
+            parser.feed((u"</%s>" % fragTag if fragTag else "") + u"</dummy>")
+        rootNode = parser.close()
+        readEvents()
+
+        # filter the skeleton and merge the spooled subtrees
+        xmlFilter.walk(rootNode)
+        skeleton = etree.tostring(rootNode, encoding='unicode') # pylint: disable=E1101
+        del rootNode
+        with store.openWrite(outFile) as out:
+            for i, part in enumerate(cls.rstStreamChunk_re.split(skeleton)):
+                if i % 2 == 0:
+                    out.write(part.encode("utf-8"))
+                    continue
+                offset, size = chunks[int(part)]
+                spool.seek(offset)
+                while size > 0:
+                    block = spool.read(min(size, cls.streamBlockSize))
+                    out.write(block)
+                    size -= len(block)
+        del skeleton
 
 # ==============================================================================
 def subTemplate(inFile, outFile):
@@ -64,18 +204,25 @@ def subTemplate(inFile, outFile):
 
     u"""Substitude kenerle-doc place holder in docbook.tmpl files."""
 
-    # detailed description see class ReSTTemplate
-    tmpl_re = re.compile(r"^!([EIDFPC])([^\s]*)\s+(.*?)\s*$")
-    tag_format = """<rstTemplate op="%s" fname="%s" args="%s"/>"""
-
+    if subLinesMapped(inFile, outFile, TMPL_LINE_RE, subTemplateLine):
+        return
     with inFile.openTextFile() as src, outFile.openTextFile("w") as dst:
-        for _lineno, orig_line in enumerate(src):
-            line = orig_line
-            if tmpl_re.match(orig_line):
-                match = tmpl_re.match(orig_line)
-                op, fname, args = match.groups()
-                line = tag_format % (op, fname, args)
-            dst.write(line)
+        for orig_line in src:
+            dst.write(subTemplateLine(orig_line))
+
+# detailed description see class ReSTTemplate
+TMPL_RE         = re.compile(r"^!([EIDFPC])([^\s]*)\s+(.*?)\s*$")
+TMPL_TAG_FORMAT = """<rstTemplate op="%s" fname="%s" args="%s"/>"""
+# lines (of the byte buffer) which might be a place holder
+TMPL_LINE_RE    = re.compile(br"^![EIDFPC][^\n]*\n?", re.M)
+
+def subTemplateLine(line):
+    u"""Substitude a kernel-doc place holder in a line (see :py:func:`subTemplate`)"""
+    match = TMPL_RE.match(line)
+    if match:
+        op, fname, args = match.groups()
+        line = TMPL_TAG_FORMAT % (op, fname, args)
+    return line
 
 # ==============================================================================
 def subEntities(inFile, outFile, ext_entities, int_entities):
@@ -95,39 +242,244 @@ def subEntities(inFile, outFile, ext_entities, int_entities):
     External entities will be replaced by a ``<rstInclude fname='%s'/>`` tag.
     XMLTag.rstInclude_tag
     """
-    entity = re.compile(r'''&(?P<name>[a-zA-Z][0-9a-zA-Z_-]+);''')
 
+    subLine = lambda line: subEntitiesLine(line, ext_entities, int_entities)
+    if subLinesMapped(inFile, outFile, ENTITY_LINE_RE, subLine
+                      , lambda chunk: chunk.replace(b"*", b"&#x22C6;")):
+        return
     with inFile.openTextFile() as src, outFile.openTextFile("w") as dst:
         for orig_line in src:
-            line = orig_line
-            # FIXME: pass "*" as &#x22C6;
-            line = line.replace("*", "&#x22C6;")
-            for match in entity.finditer(orig_line):
-                name = match.group('name')
-                if int_entities:
-                    sub = int_entities.get(name, None)
-                    if sub:
-                        line = line.replace("&%s;" % name, sub)
-                if ext_entities:
-                    sub  = ext_entities.get(name, None)
-                    if sub is None:
-                        sub  = ext_entities.get("chunk_" + name, None)
-                    if sub:
-                        line = line.replace(
-                            "&%s;" % name
-                            , "<%s fname='%s'/>" % (XMLTag.rstInclude_tag, sub))
-
-            # internal entities within internal entities .. grrr
-            if int_entities:
-                for match in entity.finditer(line):
-                    name = match.group('name')
-                    sub  = int_entities.get(name, None)
-                    if sub:
-                        line = line.replace("&%s;" % name, sub)
-            # write to file
-            dst.write(line)
+            dst.write(subEntitiesLine(orig_line, ext_entities, int_entities))
+
+WHITESPACE_RE = re.compile(r"\s+")
+ENTITY_RE = re.compile(r'''&(?P<name>[a-zA-Z][0-9a-zA-Z_-]+);''')
+# lines (of the byte buffer) with at least one entity
+ENTITY_LINE_RE = re.compile(br"^[^\n]*&[a-zA-Z][0-9a-zA-Z_-]+;[^\n]*\n?", re.M)
+
+def subEntitiesLine(orig_line, ext_entities, int_entities):
+    u"""Substitude the entities of a line (see :py:func:`subEntities`)"""
+
+    line = orig_line
+    # FIXME: pass "*" as &#x22C6;
+    line = line.replace("*", "&#x22C6;")
+    for match in ENTITY_RE.finditer(orig_line):
+        name = match.group('name')
+        if int_entities:
+            sub = int_entities.get(name, None)
+            if sub:
+                line = line.replace("&%s;" % name, sub)
+        if ext_entities:
+            sub  = ext_entities.get(name, None)
+            if sub is None:
+                sub  = ext_entities.get("chunk_" + name, None)
+            if sub:
+                line = line.replace(
+                    "&%s;" % name
+                    , "<%s fname='%s'/>" % (XMLTag.rstInclude_tag, sub))
+
+    # internal entities within internal entities .. grrr
+    if int_entities:
+        for match in ENTITY_RE.finditer(line):
+            name = match.group('name')
+            sub  = int_entities.get(name, None)
+            if sub:
+                line = line.replace("&%s;" % name, sub)
+    return line
+
+# ==============================================================================
+def subLinesMapped(inFile, outFile, lineRE, subLine, subChunk=None):
+# ==============================================================================
+
+    u"""Substitude lines of a memory-mapped (UTF-8) file.
+
+    Fast path of the line based substitutions (:py:func:`subTemplate`,
+    :py:func:`subEntities`): the compiled byte regexp ``lineRE`` selects the
+    lines of the buffer which are substituted by ``subLine(line)``, the bytes
+    in between are taken as they are (or by ``subChunk(chunk)``).  The result
+    is written in one piece.
+
+    Returns ``False`` and writes nothing, if the file is not strict UTF-8 or
+    has other line endings than ``\\n`` (the text path handles them)."""
+
+    with mappedUTF8(inFile) as buf:
+        if buf is None:
+            return False
+        data = subLines(buf, lineRE, subLine, subChunk)
+    with open(outFile, "wb") as dst:
+        dst.write(data)
+    return True
+
+def subLines(buf, lineRE, subLine, subChunk=None):
+    u"""Returns the byte buffer ``buf`` with substituted lines (see
+    :py:func:`subLinesMapped`)."""
+    subChunk = subChunk or (lambda chunk: chunk)
+    out = []
+    pos = 0
+    for match in lineRE.finditer(buf):
+        out.append(subChunk(buf[pos:match.start()]))
+        out.append(subLine(match.group().decode("utf-8")).encode("utf-8"))
+        pos = match.end()
+    out.append(subChunk(buf[pos:]))
+    return b"".join(out)
+
+def isUTF8(buf, chunkSize=UTF8_CHUNK):
+    u"""Validates the bytes of ``buf`` as strict UTF-8, the buffer is decoded in
+    slices of ``chunkSize`` bytes (not as a whole)."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    size    = len(buf)
+    try:
+        for pos in range(0, size, chunkSize):
+            decoder.decode(buf[pos:pos + chunkSize], final=pos + chunkSize >= size)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+@contextlib.contextmanager
+def mappedUTF8(inFile):
+    u"""Context with the memory-mapped content of the file ``inFile``.
+
+    Yields ``None`` if the file is not strict UTF-8 or has other line endings
+    than ``\\n``."""
+    with open(inFile, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        if not size:
+            yield b""
+            return
+        buf = mmap.mmap(src.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            valid = buf.find(b"\r") == -1 and isUTF8(buf)
+            yield buf if valid else None
+        finally:
+            buf.close()
+
+# ==============================================================================
+def preprocessTemplate(inFile, ext_entities, int_entities):
+# ==============================================================================
+
+    u"""Substitude place holders and entities of a docbook.tmpl file in one pass.
+
+    Same as :py:func:`subTemplate` followed by :py:func:`subEntities`, but the
+    file is read once and no intermediate file is written.  Returns the
+    content (UTF-8 bytes) of the preprocessed XML file."""
+
+    subLine = lambda line: subEntitiesLine(line, ext_entities, int_entities)
+    with mappedUTF8(inFile) as buf:
+        if buf is not None:
+            return subLines(
+                subLines(buf, TMPL_LINE_RE, subTemplateLine)
+                , ENTITY_LINE_RE, subLine
+                , lambda chunk: chunk.replace(b"*", b"&#x22C6;"))
+
+    with inFile.openTextFile() as src:
+        content = "".join([subTemplateLine(line) for line in src])
+    content = "".join([subLine(line) for line in io.StringIO(content, newline="\n")])
+    return content.encode("utf-8")
 
 
+# ==============================================================================
+class Context(object):
+# ==============================================================================
+
+    u"""Render context of a tag (see :py:meth:`XMLTag.getContext`).
+
+    A compact (slot-based) replacement of the :py:class:`.helper.Container`.
+    The values are set as attributes and the context is a mapping for the
+    ``%``-formatting of the ``rstMarkup`` templates::
+
+        ctx = Context(ID="intro")
+        ctx.title = "Introduction"
+        rst = "\n.. _%(ID)s:\n%(title)s" % ctx
+
+    The base context has only the slot ``ID``, a tag which needs other values
+    sets a context with its own slots as :py:attr:`XMLTag.contextType` (see
+    :py:meth:`extend`).  A value which is not a slot of the context raises an
+    :py:exc:`AttributeError`.
+    """
+
+    __slots__ = ("ID",)
+
+    def __init__(self, **kwargs):
+        for key, val in kwargs.items():
+            setattr(self, key, val)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def keys(self):
+        return [key for cls in type(self).__mro__ for key in getattr(cls, "__slots__", ())
+                if hasattr(self, key)]
+
+    def update(self, other):
+        for key in other.keys():
+            setattr(self, key, other[key])
+
+    @classmethod
+    def extend(cls, *slots):
+        u"""Returns a subclass of the context with the additional ``slots``::
+
+            class Copyright(XMLTag):
+                contextType = Context.extend("year", "holder")
+        """
+        return type(cls.__name__, (cls,), dict(__slots__=slots))
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__
+            , ", ".join(["%s=%r" % (key, self[key]) for key in self.keys()]))
+
+# ==============================================================================
+class RSTEmitter(object):
+# ==============================================================================
+
+    u"""Buffer to build reST markup.
+
+    The parts (and lines) of the markup are collected in a list and joined
+    once by :py:meth:`getValue`, which also applies the ``%``-formatting of a
+    context (see :py:class:`Context`)::
+
+        rst = RSTEmitter("\n.. _%(ID)s:\n")
+        rst.write("\n.. code-block:: c\n")
+        rst.writeBlock("    ", literal)
+        new = XMLTag.getInjBlockTag(rst.getValue(ctx))
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, *parts):
+        self.parts = list(parts)
+
+    def write(self, *parts):
+        u"""Append the strings ``parts`` to the markup."""
+        self.parts.extend(parts)
+        return self
+
+    def writeBlock(self, prefix, text):
+        u"""Append the lines of ``text`` prefixed with ``prefix``.
+
+        The block starts with a newline and ends with a blank line, trailing
+        whitespaces of the lines are deleted (see :py:meth:`XMLTag.blockText`).
+        """
+        parts = self.parts
+        parts.append("\n")
+        for line in text.strip("\n").split("\n"):
+            line = line.rstrip()
+            if line:
+                parts.append(prefix)
+                parts.append(line)
+            parts.append("\n")
+        parts.append("\n\n")
+        return self
+
+    def getValue(self, ctx=None):
+        u"""The markup (str), formatted with ``ctx`` if given."""
+        rst = "".join(self.parts)
+        if ctx is not None:
+            rst = rst % ctx
+        return rst
+
 # ==============================================================================
 class XMLTagType(type):
 # ==============================================================================
@@ -167,6 +519,31 @@ class XMLTagType(type):
             xmlTag.parseData.update(parseData)
         return xmlTag
 
+# ==============================================================================
+class TagState(threading.local):
+# ==============================================================================
+
+    u"""State of the XML filter, which is changed while a tree is filtered.
+
+    The state is local to the thread, so conversions can run in threads (see
+    :py:class:`.helper.ConversionContext`):
+
+    * ``textCache``: text of the nodes (see :py:meth:`XMLTag.getText`)
+    * ``stripedTextCache``: striped text of single nodes (see
+      :py:meth:`XMLTag.getStripedText`)
+    * ``nodeCopies``: copies of the nodes (old --> new) made by
+      :py:meth:`XMLTag.copyNode`, recorded while the fused root hooks are
+      running (see :py:class:`.hooks.ElementIndex`)
+
+    The text caches only exist within a :py:meth:`XMLTag.textScope`, a phase
+    which reads the tree but does not change it."""
+
+    def __init__(self):
+        super().__init__()
+        self.textCache        = None
+        self.stripedTextCache = None
+        self.nodeCopies       = None
+
 # ==============================================================================
 class XMLTag(metaclass=XMLTagType):
 # ==============================================================================
@@ -186,10 +563,24 @@ class XMLTag(metaclass=XMLTagType):
             # filesuffix for the ouptut of the include files.
             , parseIncludes = False
             , outFile       = None
+            # streaming mode (see streamFilterXML): tags of the subtrees
+            , streamTags    = None
+            # artifact store of the files (see dbxml2rst.artifacts), None:
+            # filterXML uses the files in the folder
+            , store         = None
             )
 
     def walk(self, node, rstPrefix=""):
-        u"""Walks through the node-tree and applies matching filters on each node."""
+        u"""Walks through the node-tree and applies matching filters on each node.
+
+        If the current context has ``walkStats`` (see
+        :py:class:`dbxml2rst.timing.WalkStats`), the walk is counted (see
+        :py:meth:`walkProfiled`)."""
+
+        stats = currentContext().walkStats
+        if stats is not None:
+            self.walkProfiled(node, rstPrefix, stats)
+            return
 
         # First, call the hooks. Hooks might build a complete new subtree, they
         # have to return the node to walk on and this node might have a differnt
@@ -207,6 +598,30 @@ class XMLTag(metaclass=XMLTagType):
                 return
         self.walkChilds(node, rstPrefix + self.rstBlock)
 
+    def walkProfiled(self, node, rstPrefix, stats):
+        u"""Same as :py:meth:`walk` but counts calls and time in ``stats``."""
+
+        prevFile, stats.fname = stats.fname, self.parseData.fname
+        stats.countNode(node.tag if isinstance(node.tag, str) else "<%s>" % node.__class__.__name__)
+
+        for func in self.parseData.hooks:
+            t = time.perf_counter()
+            node = func(node, rstPrefix, self.parseData)
+            stats.countHook(func, time.perf_counter() - t)
+            if node is None:
+                raise Exception("hook %r doesn't return a xml node!'" % func)
+
+        xmlTag = XMLTagType.getTagInstance(node, self.parseData)
+        if xmlTag is not None:
+            t = time.perf_counter()
+            xmlTag.applyFilter(node, rstPrefix)
+            stats.countHandler(xmlTag, time.perf_counter() - t)
+            if xmlTag.breakFlag:
+                stats.fname = prevFile
+                return
+        self.walkChilds(node, rstPrefix + self.rstBlock)
+        stats.fname = prevFile
+
     def walkChilds(self, node, rstPrefix=""):
         for child in node.iterchildren():
             self.walk(child, rstPrefix)
@@ -215,7 +630,10 @@ class XMLTag(metaclass=XMLTagType):
         u"""Tries to parse the XML file with :py:mod:`lxml.etree`.
 
         A unknown entity within a xml (fragment) will cause an exception. In
-        this case, run :py:func:`subEntities` first!"""
+        this case, run :py:func:`subEntities` first!  The file is read from the
+        artifact store ``parseData.store`` (if there is one)."""
+
+        store = self.parseData.store or DiskStore(folder)
 
         self.parseData.update(
             # folder where the xml-file is located
@@ -230,17 +648,15 @@ class XMLTag(metaclass=XMLTagType):
             preTag  = u"<%s%s>" % (fragTag, ' id="%s"' % ID if ID is not None else "")
             postTag = u"</%s>" % fragTag
 
-        fname    = FSPath(folder / fname)
-        xmlFlag  = False
         rootNode = None
+        content  = store.readBytes(fname)
 
-        with fname.openTextFile() as f:
-            if f.readline().startswith("<?xml"):
-                xmlFlag = True
-        if xmlFlag:
-            rootNode = etree.parse(fname).getroot() # pylint: disable=E1101
+        if content.startswith(b"<?xml"):
+            rootNode = etree.fromstring( # pylint: disable=E1101
+                content, base_url=store.path(fname))
         else:
-            content = fname.readFile()
+            with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8") as f:
+                content = f.read()
             rootNode = etree.fromstring( # pylint: disable=E1101
                 u"<dummy>"
                 + preTag
@@ -255,13 +671,11 @@ class XMLTag(metaclass=XMLTagType):
         literal = etree.tostring(node, encoding="unicode") # pylint: disable=E1101
         literal = literal.replace("\t","")
         literal = literal.strip()
-        raw = "\n.. raw:: html\n%s\n\n" % cls.blockText("    ", literal)
-        new = cls.getInjBlockTag()
-        new.text += raw
-        cls.replaceNode(node, new)
+        raw = RSTEmitter("\n.. raw:: html\n").writeBlock("    ", literal).write("\n\n")
+        cls.replaceNode(node, cls.getInjBlockTag(raw.getValue()))
 
     @classmethod
-    def chunkNode(cls, node, folder, fname):
+    def chunkNode(cls, node, folder, fname, store=None):
         # break recursion, from the caller
         if node.get("chunkNode") is not None:
             return
@@ -271,10 +685,10 @@ class XMLTag(metaclass=XMLTagType):
         inclTag = node.makeelement(cls.rstInclude_tag)
         inclTag.set("fname", fname.suffix(".xml"))
         LOG.info("INFO: create chunk %s" % (etree.tostring(inclTag, encoding="unicode"))) # pylint: disable=E1101
-        with (folder / fname).openTextFile("w") as out:
-            out.write(
-                # pylint: disable=E1101
-                etree.tostring(node, encoding='unicode') )
+        (store or DiskStore(folder)).write(
+            fname
+            # pylint: disable=E1101
+            , etree.tostring(node, encoding='unicode') )
         cls.replaceNode(node, inclTag)
 
     # ---------------
@@ -295,6 +709,8 @@ class XMLTag(metaclass=XMLTagType):
             if ID is not None:
                 del node.attrib["id"]
                 new.set("id", ID)
+        if XMLTag.state.nodeCopies is not None:
+            XMLTag.state.nodeCopies[node] = new
         return new
 
     @classmethod
@@ -341,49 +757,53 @@ class XMLTag(metaclass=XMLTagType):
                 return {'t': 'Str', 'c': new}
 
     @classmethod
-    def getInjInlineTag(cls):
+    def getInjInlineTag(cls, rst=""):
         # pylint: disable=E1101
         new = etree.Element("code")            # pandoc --> "CodeBlock"
-        new.text = cls.rstInjection_sig
+        new.text = cls.rstInjection_sig + rst
         new.set("rstInjection", "1")
+        stats = currentContext().walkStats
+        if stats is not None:
+            stats.countInjection("inline")
         return new
 
     @classmethod
-    def getInjBlockTag(cls):
+    def getInjBlockTag(cls, rst=""):
         # pylint: disable=E1101
         new = etree.Element("programlisting")  # pandoc --> "Code"
-        new.text = cls.rstInjection_sig
+        new.text = cls.rstInjection_sig + rst
         new.set("rstInjection", "1")
+        stats = currentContext().walkStats
+        if stats is not None:
+            stats.countInjection("block")
         return new
 
     def applyFilter(self, node, rstPrefix):
+        try:
+            self._applyFilter(node, rstPrefix)
+        finally:
+            self._ctxMemo = None
+
+    def _applyFilter(self, node, rstPrefix):
 
         if self.dropFlag:
             self.dropNode(node)
             return
 
         # injection is done as pandoc "Code" or "CodeBlock"
-        def getInjTag():
-            if self.injBlock:  new = self.getInjBlockTag()
-            else:              new = self.getInjInlineTag()
-            return new
+        getInjTag = self.getInjBlockTag if self.injBlock else self.getInjInlineTag
 
         preText = self.preText(node, rstPrefix)
         if preText:
-            new = getInjTag()
-            new.text += preText
-            node.addprevious(new)
+            node.addprevious(getInjTag(preText))
 
         postText = self.postText(node, rstPrefix)
         if postText:
-            new = getInjTag()
-            new.text += postText
-            node.addnext(new)
+            node.addnext(getInjTag(postText))
 
         replaceText = self.replaceText(node, rstPrefix)
         if replaceText:
-            new = getInjTag()
-            new.text += replaceText
+            new = getInjTag(replaceText)
             new.tail = node.tail
             self.replaceNode(node, new)
 
@@ -394,6 +814,11 @@ class XMLTag(metaclass=XMLTagType):
     rstInclude_tag  = "rstInclude"
     rstTemplate_tag = "rstTemplate"
 
+    # placeholder of a subtree in streaming mode (see streamFilterXML)
+    rstStreamChunk_tag = "rstStreamChunk"
+    rstStreamChunk_re  = re.compile(r'<%s idx="([0-9]+)"/>' % rstStreamChunk_tag)
+    streamBlockSize    = 64 * 1024
+
     @classmethod
     def normalizeID(cls, ID):
         # not needed, may be later
@@ -401,13 +826,52 @@ class XMLTag(metaclass=XMLTagType):
         #    ID = ID.replace("-","_")
         return ID
 
+    # text caches and node copies of the tree filtered by the thread
+    state = TagState()
+
+    @classmethod
+    @contextlib.contextmanager
+    def textScope(cls):
+        u"""Cache the text of the nodes (see :py:meth:`getText`) within a phase
+        which reads the tree but does not change it::
+
+            with XMLTag.textScope():
+                ctx = self.getContext(node)
+
+        The caches are dropped at the end of the (outermost) scope, outside of a
+        scope the text is not cached."""
+        state = XMLTag.state
+        if state.textCache is not None:
+            yield
+            return
+        state.textCache        = dict()
+        state.stripedTextCache = dict()
+        try:
+            yield
+        finally:
+            state.textCache        = None
+            state.stripedTextCache = None
+
+    @classmethod
+    def flattenText(cls, node):
+        u"""The text of ``node`` and its descendants (not cached)."""
+        return "".join(node.itertext())
+
     @classmethod
     def getText(cls, *nodelist):
-        u"""The text *as is* from ``node.itertext()``"""
+        u"""The text *as is* from ``node.itertext()`` (cached within a
+        :py:meth:`textScope`)"""
+        cache = XMLTag.state.textCache
         text = ""
         for node in nodelist:
             if node is not None:
-                text += "".join([ txt for txt in node.itertext()])
+                if cache is None:
+                    text += cls.flattenText(node)
+                    continue
+                txt = cache.get(node)
+                if txt is None:
+                    txt = cache[node] = cls.flattenText(node)
+                text += txt
         retVal = None
         if text != "":
             retVal = text
@@ -416,9 +880,19 @@ class XMLTag(metaclass=XMLTagType):
     @classmethod
     def getStripedText(cls, *nodelist):
         u"""The text from node.itertext() with reduced whitespaces"""
+        cache = XMLTag.state.stripedTextCache
+        if cache is not None and len(nodelist) == 1 and nodelist[0] is not None:
+            node  = nodelist[0]
+            if node in cache:
+                return cache[node]
+            text = cls.getText(node)
+            if text is not None:
+                text = WHITESPACE_RE.sub(" ", text).strip()
+            cache[node] = text
+            return text
         text = cls.getText(*nodelist)
         if text is not None:
-            return re.sub(r"\s+"," ", text).strip()
+            return WHITESPACE_RE.sub(" ", text).strip()
 
     @classmethod
     def getFormatedTitle(cls, node, from_tag="title"):
@@ -434,14 +908,7 @@ class XMLTag(metaclass=XMLTagType):
         u"""Adds ``prefix`` to lines from ``text``, deletes trailing whitespaces"""
         if text is None:
             return None
-        text = text.strip("\n")
-        retVal = "\n"
-        for line in text.split("\n"):
-            line = line.rstrip()
-            if line:
-                retVal += prefix + line
-            retVal += "\n"
-        return retVal + "\n\n"
+        return RSTEmitter().writeBlock(prefix, text).getValue()
 
     # ---------------
     # Subclassing API
@@ -464,12 +931,32 @@ class XMLTag(metaclass=XMLTagType):
     rstAnchor = "\n.. _%(ID)s:\n"
     rstMarkup = None
 
+    # type of the render context (see getContext)
+    contextType = Context
+
+    # memoized context of the node (see getCachedContext)
+    _ctxMemo = None
+
     # pylint: disable=W0613
 
     def getContext(self, node):
-        return Container(
+        return self.contextType(
             ID = self.normalizeID(node.attrib.get('id')))
 
+    def getCachedContext(self, node):
+        u"""The context of ``node``, build once per :py:meth:`applyFilter`
+
+        The pre-, post- and replace-text of a node share the same context (and
+        the XPath lookups of :py:meth:`getContext` are done only once).  The
+        context is build within a :py:meth:`textScope`."""
+        memo = self._ctxMemo
+        if memo is not None and memo[0] is node:
+            return memo[1]
+        with self.textScope():
+            ctx = self.getContext(node)
+        self._ctxMemo = (node, ctx)
+        return ctx
+
     def replaceText(self, node, rstPrefix): # pylint: disable=R0201
         return None
 
@@ -487,6 +974,8 @@ class LinkTag(XMLTag):
 
     rstMarkup = ":ref:`%(text)s <%(linkend)s>`"
 
+    contextType = Context.extend("text", "linkend")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.text = self.getStripedText(node)
@@ -494,7 +983,7 @@ class LinkTag(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = self.rstMarkup
         if not ctx.text:
             rst = ":ref:`%(linkend)s`"
@@ -517,7 +1006,7 @@ class Ulink(LinkTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = self.rstMarkup
         # FIXME: droped ref-text, because it is (mostly) redundant and long refs
         # are killed by tables
@@ -565,13 +1054,15 @@ class Subtitle(XMLTag):
     injBlock  = True
     rstMarkup = "\n**%(title)s**\n\n"
 
+    contextType = Context.extend("title")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.title = self.getStripedText(node)
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        return self.rstMarkup % self.getContext(node)
+        return self.rstMarkup % self.getCachedContext(node)
 
 # ==============================================================================
 class StructureTag(XMLTag):
@@ -597,6 +1088,8 @@ class StructureTag(XMLTag):
             # Structure tag resets the indentation rstPrefix
             super().applyFilter(node, rstPrefix=self.rstBlock)
 
+    contextType = Context.extend("title")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.title = self.getFormatedTitle(node)
@@ -610,18 +1103,18 @@ class StructureTag(XMLTag):
 
     def preText(self, node, rstPrefix):
         #SDK.CONSOLE()
-        rst = ""
-        ctx = self.getContext(node)
+        rst = RSTEmitter()
+        ctx = self.getCachedContext(node)
         if ctx.ID is not None:
-            rst += self.rstPreMarkup
+            rst.write(self.rstPreMarkup)
         if ctx.title:
-            rst += self.rstTitle(ctx.title)
+            rst.write(self.rstTitle(ctx.title))
         # drop no more needed child nodes!
         n = node.find("title")
         if n is not None:
             self.dropNode(n)
-        #print("%r preText -->|%s|<--" % (node, (rst % ctx)))
-        return rst % ctx
+        #print("%r preText -->|%s|<--" % (node, rst.getValue(ctx)))
+        return rst.getValue(ctx)
 
 # ==============================================================================
 class Section(StructureTag):
@@ -704,6 +1197,8 @@ class Refentry(XMLTag):
 
     injBlock = True
 
+    contextType = Context.extend("refname", "title", "manvol", "refmiscinfo")
+
     def getContext(self, node):
         ctx = super().getContext(node)
 
@@ -722,21 +1217,21 @@ class Refentry(XMLTag):
         return ctx
 
     def preText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n" if not ctx.ID else self.rstAnchor
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n" if not ctx.ID else self.rstAnchor)
         if ctx.title:
-            rst += Chapter.rstTitle(ctx.title)
+            rst.write(Chapter.rstTitle(ctx.title))
         if ctx.refname:
-            rst += "\n*man %(refname)s(%(manvol)s)*\n"
+            rst.write("\n*man %(refname)s(%(manvol)s)*\n")
         if ctx.refmiscinfo:
-            rst += "\n*%(refmiscinfo)s*\n"
+            rst.write("\n*%(refmiscinfo)s*\n")
         # drop no more needed child nodes!
         for p in ["refmeta/refentrytitle" , "refmeta/manvolnum" ,
                    "refmeta/refmiscinfo", "refnamediv/refname" ]:
             n = node.find(p)
             if n is not None:
                 self.dropNode(n)
-        return rst % ctx
+        return rst.getValue(ctx)
 
 
 # ==============================================================================
@@ -779,6 +1274,8 @@ class Copyright(XMLTag):
     breakFlag = True
     injBlock  = True
 
+    contextType = Context.extend("year", "holder")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.year = ", ".join([self.getStripedText(n) for n in node.findall("year")])
@@ -786,7 +1283,7 @@ class Copyright(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = "\n**Copyright** %(year)s : %(holder)s\n"
         return rst % ctx
 
@@ -828,6 +1325,8 @@ class LiteralBlock(XMLTag):
     language   = "guess"
     rstMarkup  = "\n::\n\n%(literal)s\n\n"
 
+    contextType = Context.extend("language", "literal")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.language = node.get("language") or self.language
@@ -838,10 +1337,9 @@ class LiteralBlock(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n" if not ctx.ID else self.rstAnchor
-        rst += self.rstMarkup
-        return rst % ctx
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n" if not ctx.ID else self.rstAnchor, self.rstMarkup)
+        return rst.getValue(ctx)
 
 # ------------------------------------------------------------------------------
 class Literallayout(LiteralBlock):    pass
@@ -877,6 +1375,8 @@ class Funcprototype(XMLTag):
 
     injBlock   = True
 
+    contextType = Context.extend("funcdef", "params")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.funcdef = self.getStripedText(node.find("funcdef"))
@@ -886,16 +1386,17 @@ class Funcprototype(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n.. c:function::"
-        rst += " %s" % ctx.funcdef
-        rst += "( " + ", ".join(ctx.params) + " )"
-        return rst
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n.. c:function::", " ", ctx.funcdef)
+        rst.write("( ", ", ".join(ctx.params), " )")
+        return rst.getValue()
 
 # ==============================================================================
 class Function(XMLTag):
 # ==============================================================================
 
+    contextType = Context.extend("func_call")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.func_call = self.getStripedText(node)
@@ -904,7 +1405,7 @@ class Function(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = ":c:func:`%(func_call)s`"
         return rst % ctx
 
@@ -912,6 +1413,8 @@ class Function(XMLTag):
 class Structname(XMLTag):
 # ==============================================================================
 
+    contextType = Context.extend("struct_name")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.struct_name = self.getStripedText(node)
@@ -920,7 +1423,7 @@ class Structname(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = ":c:type:`%(struct_name)s`"
         return rst % ctx
 
@@ -932,6 +1435,8 @@ class Mediaobject(XMLTag):
 
     align    = "center"
 
+    contextType = Context.extend("img_files", "align", "glob", "text")
+
     def getContext(self, node):
         img_files = []
         align = self.align
@@ -964,9 +1469,11 @@ class Figure(XMLTag):
 %(title)s
 """
 
+    contextType = Mediaobject.contextType.extend("alt", "title")
+
     def getContext(self, node):
-        ctx = Mediaobject().getContext(node)
-        ctx.update(super().getContext(node))
+        ctx = super().getContext(node)
+        ctx.update(Mediaobject().getContext(node))
         ctx.alt = " / ".join([f.BASENAME for f in  ctx.img_files])
         ctx.title = self.getFormatedTitle(node)
         return ctx
@@ -976,19 +1483,258 @@ class Figure(XMLTag):
         if node.findall(".//imagedata") is None:
             self.breakFlag = False
             return
-        ctx = self.getContext(node)
-        rst = "\n" if not ctx.ID else self.rstAnchor
-        rst += self.rstMarkup
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n" if not ctx.ID else self.rstAnchor, self.rstMarkup)
         if ctx.text:
             ctx.text = self.blockText(self.rstBlock, ctx.text)
-            rst += "%(text)s"
-        rst += "\n\n" # pandocs eats some trailing newlines
-        return rst % ctx
+            rst.write("%(text)s")
+        rst.write("\n\n") # pandocs eats some trailing newlines
+        return rst.getValue(ctx)
 
 # ------------------------------------------------------------------------------
 class Informalfigure(Figure): pass
 # ------------------------------------------------------------------------------
 
+# ==============================================================================
+class TableColspec(object):
+# ==============================================================================
+
+    u"""A ``<colspec>`` of a :py:class:`TableModel`"""
+
+    __slots__ = ("node", "index", "colnum", "colname", "align", "width", "colwidth")
+
+    def __init__(self, node, index):
+        self.node    = node
+        self.index   = index
+        self.colname = node.get("colname")
+        self.align   = node.get("align")
+        self.colnum  = node.get("colnum")
+        if self.colnum is not None:
+            try:
+                self.colnum = int(self.colnum)
+            except Exception: # pylint: disable=W0703
+                pass
+        self._parseWidth(node.get("colwidth"))
+
+    def _parseWidth(self, width):
+        self.width    = width
+        self.colwidth = None
+        if width is not None:
+            width = width.replace("*","")
+            # some colspec definition use the "&#x22C6;" entity
+            width = width.replace(u"⋆", "")
+            try:
+                self.colwidth = int(width)
+            except Exception:  # pylint: disable=W0703
+                pass
+
+    def setWidth(self, width):
+        u"""Set the ``colwidth`` attribute (e.g. ``"2*"``)"""
+        self.node.set("colwidth", width)
+        self._parseWidth(width)
+
+    @property
+    def number(self):
+        u"""``colnum`` of the colspec or (if unset) its position in the table"""
+        return self.index if self.colnum is None else self.colnum
+
+# ==============================================================================
+class TableSpanspec(object):
+# ==============================================================================
+
+    u"""A ``<spanspec>`` of a :py:class:`TableModel`
+
+    ``span`` is the number of additional columns or ``None`` if the spanspec
+    can't be resolved."""
+
+    __slots__ = ("node", "spanname", "namest", "nameend", "span")
+
+    def __init__(self, node):
+        self.node     = node
+        self.spanname = node.get("spanname")
+        self.namest   = node.get("namest")
+        self.nameend  = node.get("nameend")
+        self.span     = None
+
+# ==============================================================================
+class TableRow(object):
+# ==============================================================================
+
+    u"""A ``<row>`` of a :py:class:`TableModel`
+
+    * ``entries``:    the ``<entry>`` childs of the row (``row/entry``)
+    * ``allEntries``: all ``<entry>`` in the row, including those from inner
+      tables like ``<entrytbl>`` (``row//entry``)
+    * ``groups``:     the ``<thead>``, ``<tbody>`` and ``<tfoot>`` ancestors of
+      the row (outermost first)
+    """
+
+    __slots__ = ("node", "ID", "section", "groups", "entries", "allEntries", "entrytbl")
+
+    def __init__(self, node, groups):
+        self.node       = node
+        self.ID         = node.get("id")
+        self.section    = node.getparent().tag
+        self.groups     = groups
+        self.entries    = []
+        self.allEntries = []
+        self.entrytbl   = None
+
+# ==============================================================================
+class TableModel(object):
+# ==============================================================================
+
+    u"""Model of a DocBook (CALS) table, build in one pass over the table.
+
+    The table-rewriting code (handlers like :py:class:`Table` and
+    :py:class:`Tgroup` or the table hooks) share one model per table (see
+    :py:meth:`get`), instead of scanning the table with ``findall(".//row")``
+    and colspec lookups again and again.
+
+    * ``tgroup``:          the (first) ``<tgroup>`` of the table or ``None``
+    * ``colspecs``:        all colspecs (``.//colspec``) as :py:class:`TableColspec`
+    * ``colspecByName``:   colspecs by ``colname`` (unnamed colspecs: ``""``)
+    * ``colspecByNumber``: colspecs by :py:attr:`TableColspec.number`
+    * ``tgroupColspecs``:  the colspecs of the tgroup (``tgroup/colspec``)
+    * ``spanspecs``:       spanspecs by ``spanname`` (:py:class:`TableSpanspec`)
+    * ``rows``:            all rows (``.//row``) as :py:class:`TableRow`
+    * ``headRows``:        the rows from ``tgroup/thead``
+    * ``bodyRows``:        the rows from ``tgroup/tbody``
+    * ``tbodies``:         all ``<tbody>`` nodes (``.//tbody``)
+
+    Code which changes the structure of a table has to drop the model with
+    :py:meth:`invalidate`.  The models are hold by the ``tableModels`` of the
+    current context, :py:func:`filterXML` creates them for each document (a
+    context without ``tableModels`` does not share the models).
+    """
+
+    __slots__ = ("node", "tgroup", "colspecs", "colspecByName", "colspecByNumber"
+                 , "tgroupColspecs", "spanspecs", "rows", "headRows", "bodyRows"
+                 , "tbodies")
+
+    _groupTags = ("thead", "tbody", "tfoot")
+
+    @classmethod
+    def get(cls, node):
+        u"""Returns the (shared) model of the table ``node``"""
+        models = currentContext().tableModels
+        if models is None:
+            return cls(node)
+        model = models.get(node, None)
+        if model is None:
+            model = models[node] = cls(node)
+        return model
+
+    @classmethod
+    def ofTgroup(cls, tgroup):
+        u"""Returns the (shared) model of the table the ``tgroup`` belongs to"""
+        models = currentContext().tableModels or {}
+        model  = models.get(tgroup.getparent(), None)
+        if model is not None and model.tgroup is tgroup:
+            return model
+        return cls.get(tgroup)
+
+    @classmethod
+    def invalidate(cls, node=None):
+        u"""Drop the model of table ``node`` (``None``: drop all models)"""
+        models = currentContext().tableModels
+        if models is None:
+            return
+        if node is None:
+            models.clear()
+        else:
+            models.pop(node, None)
+
+    def __init__(self, node):
+        self.node            = node
+        self.tgroup          = None
+        self.colspecs        = []
+        self.colspecByName   = dict()
+        self.colspecByNumber = dict()
+        self.tgroupColspecs  = []
+        self.spanspecs       = dict()
+        self.rows            = []
+        self.headRows        = []
+        self.bodyRows        = []
+        self.tbodies         = []
+
+        rowByNode = dict()
+        group     = node    # the tgroup or (if there is no tgroup) the table
+        tbody     = None
+
+        for elem in node.iterdescendants():
+            tag = elem.tag
+            if tag == "entry":
+                parent = elem.getparent()
+                for ancestor in elem.iterancestors():
+                    if ancestor is node:
+                        break
+                    row = rowByNode.get(ancestor, None)
+                    if row is not None:
+                        row.allEntries.append(elem)
+                        if ancestor is parent:
+                            row.entries.append(elem)
+
+            elif tag == "row":
+                groups = []
+                for ancestor in elem.iterancestors():
+                    if ancestor is node:
+                        break
+                    if ancestor.tag in self._groupTags:
+                        groups.insert(0, ancestor)
+                row = TableRow(elem, tuple(groups))
+                rowByNode[elem] = row
+                self.rows.append(row)
+                parent = elem.getparent()
+                if parent.getparent() is group:
+                    if parent.tag == "thead":
+                        self.headRows.append(row)
+                    elif parent.tag == "tbody":
+                        tbody = parent if tbody is None else tbody
+                        if parent is tbody:
+                            self.bodyRows.append(row)
+
+            elif tag == "colspec":
+                spec = TableColspec(elem, len(self.colspecs))
+                self.colspecs.append(spec)
+                self.colspecByName[spec.colname or ""] = spec
+                self.colspecByNumber[spec.number]      = spec
+                if elem.getparent() is group:
+                    self.tgroupColspecs.append(spec)
+
+            elif tag == "spanspec":
+                spec = TableSpanspec(elem)
+                self.spanspecs[spec.spanname] = spec
+
+            elif tag == "tbody":
+                self.tbodies.append(elem)
+
+            elif tag == "tgroup":
+                if self.tgroup is None and elem.getparent() is node:
+                    self.tgroup = group = elem
+
+            elif tag == "entrytbl":
+                row = rowByNode.get(elem.getparent(), None)
+                if row is not None and row.entrytbl is None:
+                    row.entrytbl = elem
+
+        # resolve spans
+        for spec in self.spanspecs.values():
+            if spec.spanname is None or spec.namest is None or spec.nameend is None:
+                continue
+            start = self.colspecByName.get(spec.namest, None)
+            end   = self.colspecByName.get(spec.nameend, None)
+            if start is None or end is None:
+                continue
+            spec.span = end.number - start.number
+
+    def getSpan(self, spanname):
+        u"""Number of additional columns spanned by ``spanname`` (default: 0)"""
+        spec = self.spanspecs.get(spanname, None)
+        if spec is None or spec.span is None:
+            return 0
+        return spec.span
+
 # ==============================================================================
 class Table(XMLTag):
 # ==============================================================================
@@ -1018,6 +1764,8 @@ class Table(XMLTag):
         self.assert_tgroup(node)
         super().applyFilter(node, rstPrefix)
 
+    contextType = Context.extend("tableStartMark", "tableEndMark", "title")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.tableStartMark = self.tableStartMark
@@ -1029,28 +1777,30 @@ class Table(XMLTag):
         return ctx
 
     def preText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n" if not ctx.ID else self.rstAnchor
-        rst += self.rstPreText
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n" if not ctx.ID else self.rstAnchor, self.rstPreText)
         # drop no more needed child nodes!
         title_node = node.find("title")
         if title_node is not None:
             self.dropNode(title_node)
-        return rst % ctx
+        return rst.getValue(ctx)
 
     def postText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         return self.rstPostText % ctx
 
     @classmethod
     def assert_tgroup(cls, node):
         # To render the rst output well, pandoc requires a tgroup with col
         # definitions.
-        tgroup = node.find("tgroup")
+        model  = TableModel.get(node)
+        tgroup = model.tgroup
         if tgroup is None:
             tgroup = node.makeelement("tgroup")
             node.insert(0, tgroup)
-            cols = len(node.find("tbody/row").findall("./entry"))
+            # a table without body rows (e.g. only a thead)
+            rows = model.bodyRows or model.rows
+            cols = len(rows[0].entries) if rows else len(model.tgroupColspecs)
             tgroup.set("cols", str(cols))
             w = 1
             for c in range(1, cols+1):
@@ -1061,17 +1811,19 @@ class Table(XMLTag):
                 colspec.set("colwidth", "%s*" % w)
                 tgroup.append(colspec)
             tbody = node.find("tbody")
-            tgroup.append(tbody)
+            if tbody is not None:
+                tgroup.append(tbody)
+            TableModel.invalidate(node)
         else:
-            colspec_s = tgroup.findall("colspec")
+            colspec_s = model.tgroupColspecs
             cols = len(colspec_s)
             c = w = 1
             for colspec in colspec_s:
                 c += 1
-                if colspec.get("colwidth") is None:
+                if colspec.width is None:
                     if cols < 3 or (cols + 1) == c:
                         w += 1
-                    colspec.set("colwidth", "%s*" % w)
+                    colspec.setWidth("%s*" % w)
 
 
 
@@ -1086,7 +1838,7 @@ class Informaltable(Table):
     # a paragraph. This breaks the separation of *presentation from content*.
 
     def applyFilter(self, node, rstPrefix):
-        tgroup = node.find("tgroup")
+        tgroup = TableModel.get(node).tgroup
         cols = int(tgroup.attrib.get("cols"))
         if cols == 1:
             self.dropUselessTable(node, rstPrefix)
@@ -1095,6 +1847,7 @@ class Informaltable(Table):
 
     def dropUselessTable(self, node, rstPrefix):
         self.breakFlag = True
+        TableModel.invalidate(node)
         etree.strip_tags(node, "tgroup", "tbody", "row", "entry") # pylint: disable=E1101
         section = self.copyNode(node, "section", moveID=True)
         self.replaceNode(node, section)
@@ -1129,14 +1882,17 @@ class Tgroup(XMLTag):
 
     @classmethod
     def repairTableDef(cls, node, rstPrefix):  # pylint: disable=W0613
+        model = TableModel.ofTgroup(node)
         cols = int(node.attrib.get("cols"))
-        colspec_cols = len(node.findall("colspec"))
+        colspec_cols = len(model.tgroupColspecs)
         if cols != colspec_cols:
+            TableModel.invalidate(model.node)
             for colspec in node.iterchildren("colspec"):
                 node.remove(colspec)
             for spanspec in node.iterchildren("spanspec"):
                 node.remove(spanspec)
-            cols = len(node.find("tbody/row").findall("./entry"))
+            if model.bodyRows:
+                cols = len(model.bodyRows[0].entries)
             node.set("cols", str(cols))
             for c in range(cols):
                 colspec = node.makeelement("colspec")
@@ -1155,6 +1911,7 @@ class Entrytbl(XMLTag):
 
     def applyFilter(self, node, rstPrefix):
 
+        TableModel.invalidate()
         newEntry = node.makeelement("entry")
         for subEntry in node.findall(".//entry"):
             para = self.copyNode(subEntry, "para", moveID=True)
@@ -1173,6 +1930,8 @@ class Authorgroup(XMLTag):
     breakFlag = True
     injBlock  = True
 
+    contextType = Context.extend("authorlist")
+
     def getContext(self, node):
         # pylint: disable=R0204
         ctx = super().getContext(node)
@@ -1198,20 +1957,19 @@ class Authorgroup(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = ""
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter()
         if ctx.authorlist:
             for author in ctx.authorlist:
-                r = "\n:author:   "
-                if author.surname:      r += " %(surname)s"
-                if author.firstname:    r += " %(firstname)s"
-                if author.othername:    r += " (*%(othername)s*)"
-                if author.corpauthor:   r += " %(corpauthor)s"
-                if author.affiliation:  r += "\n:address:   %(affiliation)s"
-                if author.contrib:      r += "\n:contrib:   %(contrib)s"
-                rst += r % author
-                rst += "\n"
-        return rst % ctx
+                r = RSTEmitter("\n:author:   ")
+                if author.surname:      r.write(" %(surname)s")
+                if author.firstname:    r.write(" %(firstname)s")
+                if author.othername:    r.write(" (*%(othername)s*)")
+                if author.corpauthor:   r.write(" %(corpauthor)s")
+                if author.affiliation:  r.write("\n:address:   %(affiliation)s")
+                if author.contrib:      r.write("\n:contrib:   %(contrib)s")
+                rst.write(r.getValue(author), "\n")
+        return rst.getValue(ctx)
 
 
 
@@ -1227,6 +1985,8 @@ class Revision(XMLTag):
         super().applyFilter(node, rstPrefix)
         self.walkChilds(node, rstPrefix + self.rstBlock)
 
+    contextType = Context.extend("revnumber", "date", "authorinitials")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.revnumber      = self.getStripedText(*node.findall("revnumber"))   or ""
@@ -1235,19 +1995,19 @@ class Revision(XMLTag):
         return ctx
 
     def preText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n:revision: %(revnumber)s / %(date)s"
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n:revision: %(revnumber)s / %(date)s")
         if ctx.authorinitials:
-            rst += " (*%(authorinitials)s*)"
-        #rst += "\n:remark:   %(revremark)s"
-        rst += "\n\n\n"
+            rst.write(" (*%(authorinitials)s*)")
+        #rst.write("\n:remark:   %(revremark)s")
+        rst.write("\n\n\n")
 
         # drop no more needed child nodes!
         for p in ["revnumber", "date" ]:
             n = node.find(p)
             if n is not None:
                 self.dropNode(n)
-        return rst % ctx
+        return rst.getValue(ctx)
 
 
 # ==============================================================================
@@ -1274,6 +2034,8 @@ class Biblioentry(XMLTag):
     injBlock  = True
     rstBlock  = "    "
 
+    contextType = Context.extend("abbrev", "title", "subtitle")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.abbrev   = self.getStripedText(node.find("abbrev"))
@@ -1282,18 +2044,18 @@ class Biblioentry(XMLTag):
         return ctx
 
     def preText(self, node, rstPrefix):
-        ctx = self.getContext(node)
-        rst = "\n" if not ctx.ID else self.rstAnchor
-        if ctx.abbrev:       rst += Section().rstTitle(ctx.abbrev)
-        if ctx.title:        rst += "\n:title:     %(title)s"
-        if ctx.subtitle:     rst += "\n:subtitle:  %(subtitle)s"
+        ctx = self.getCachedContext(node)
+        rst = RSTEmitter("\n" if not ctx.ID else self.rstAnchor)
+        if ctx.abbrev:       rst.write(Section().rstTitle(ctx.abbrev))
+        if ctx.title:        rst.write("\n:title:     %(title)s")
+        if ctx.subtitle:     rst.write("\n:subtitle:  %(subtitle)s")
 
         # drop no more needed child nodes!
         for p in ["abbrev", "title", "subtitle" ]:
             n = node.find(p)
             if n is not None:
                 self.dropNode(n)
-        return rst % ctx
+        return rst.getValue(ctx)
 
 ## ==============================================================================
 #class Example(Tag):
@@ -1334,6 +2096,8 @@ class ReSTTemplate(XMLTag):
 
 """
 
+    contextType = Context.extend("op", "fname", "args", "options")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.op      = node.get("op")
@@ -1351,7 +2115,7 @@ class ReSTTemplate(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         rst = self.rstMarkup
         if ctx.op in ["C", "D"]:
             rst = "\n\n.. NOT SUPPORTED: '!%(op)s%(fname)s %(args)s'\n\n"
@@ -1402,6 +2166,8 @@ class ReSTInclude(XMLTag):
         toctree  = self.rstBlock + str(inclFile.relpath(thisFile.DIRNAME).SKIPSUFFIX)
         return toctree
 
+    contextType = Context.extend("entries")
+
     def getContext(self, node):
         ctx = super().getContext(node)
         ctx.entries = []
@@ -1419,7 +2185,7 @@ class ReSTInclude(XMLTag):
         return ctx
 
     def replaceText(self, node, rstPrefix):
-        ctx = self.getContext(node)
+        ctx = self.getCachedContext(node)
         if ctx.entries:
             return self.rstMarkup % ctx
         else:
@@ -17,47 +17,369 @@ u"""
 # imports
 # ==============================================================================
 
+import io
 import re
 import sys
+import asyncio
 import functools
+import contextvars
 import json
+import time
+import socket
+import atexit
+import subprocess
+import urllib.request
+import urllib.error
 
-from fspath import which
+from fspath import FSPath, which
 
-from .nodes import Table
-from . import helper
-from .helper import LOG
+from .helper import LOG, currentContext
 
 # ==============================================================================
 # constants
 # ==============================================================================
 
-PANDOC_EXE = None
+# The options of the pandoc conversions, the subprocess gets them as command
+# line arguments (see pandocArgs), the server as fields of the request.  The
+# option --smart is only given to pandoc < 2.0, it has been removed in pandoc
+# 2.0 (the smart quotes of the DocBook reader are an extension of the format
+# since then and the pandoc server is not available before 2.18).
+
+# options of the pandoc DocBook reader (see xml2jsonText)
+XML2JSON_OPTIONS = {
+    "from" : "docbook"
+    , "to" : "json" }
+
+# options of the pandoc reST writer (see json2rstText)
+JSON2RST_OPTIONS = {
+    "from"              : "json"
+    , "to"              : "rst"
+    , "reference-links" : True
+    # activate this for the large ASCII tables
+    #, "columns"        : 180
+    }
+
+def pandocArgs(options, version=None):
+    u"""Returns the command line arguments (tuple) of the pandoc ``options``.
+
+    The readers of pandoc < 2.0 (``version``, see :py:func:`pandocVersion`) get
+    the option ``--smart``."""
+    args = []
+    for name, value in options.items():
+        if value is True:
+            args.append("--%s" % name)
+        elif value not in (False, None):
+            args += ["--%s" % name, str(value)]
+    if version and version < (2, 0) and options.get("from") != "json":
+        args.append("--smart")
+    return tuple(args)
+
+JSON2RST_ARGS = pandocArgs(JSON2RST_OPTIONS)
+
+@functools.lru_cache(maxsize=None)
+def whichPandoc():
+    u"""Returns pandoc from the ``PATH`` (``None`` if pandoc is not installed),
+    the ``PATH`` is only searched once."""
+    return which('pandoc', False)
+
+@functools.lru_cache(maxsize=None)
+def pandocVersion(exe):
+    u"""Returns the version (tuple of int) of the pandoc ``exe``, an empty tuple
+    if the version is unknown.  Each executable is only asked once."""
+    try:
+        output = subprocess.run(
+            [str(exe), "--version"]
+            , stdout = subprocess.PIPE
+            , stderr = subprocess.DEVNULL
+            , encoding = "utf-8"
+            , timeout = 30 ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ()
+    match = re.search(r"^pandoc\S*\s+(\d+(?:\.\d+)*)", output, re.M)
+    if match is None:
+        return ()
+    return tuple([int(x) for x in match.group(1).split(".")])
+
+def xml2jsonArgs():
+    u"""Returns the command line arguments (tuple) of the pandoc DocBook reader,
+    the arguments depend on the version of the pandoc executable (see
+    :py:func:`getPandocExe`)."""
+    return pandocArgs(XML2JSON_OPTIONS, pandocVersion(getPandocExe()))
+
+def getPandocExe():
+    u"""Returns the pandoc executable of the current context (``pandocExe``, see
+    :py:func:`dbxml2rst.helper.currentContext`), by default the pandoc from the
+    ``PATH`` (see :py:func:`whichPandoc`)."""
+    exe = currentContext().pandocExe
+    if exe:
+        return FSPath(exe)
+    return whichPandoc()
+
+def getConverterExe():
+    u"""Returns the executable which converts in the current context, the
+    executable of the running ``pandocServer`` (see :py:class:`PandocServer`) or
+    the pandoc of :py:func:`getPandocExe`."""
+    server = currentContext().pandocServer
+    if server is not None and server.running:
+        return server.command[0]
+    return getPandocExe()
 
-def init():
-    global PANDOC_EXE # pylint: disable=W0603
-    PANDOC_EXE = which('pandoc', False)
+# ==============================================================================
+class PandocServer(object):
+# ==============================================================================
+
+    u"""A local pandoc server process, conversions are send over localhost HTTP.
+
+    The server is started from ``pandoc-server`` or (pandoc >= 2.18) from the
+    ``pandoc server`` sub-command.  Each conversion by the server saves the
+    launch of a pandoc process (and the startup of its Haskell runtime)::
 
+        server = PandocServer()
+        if server.start():
+            rst = server.convert(text, **JSON2RST_OPTIONS)
+        server.stop()
+
+    A server which can't be started or which has been failed is no longer
+    *running* (:py:attr:`running`), the callers fall back to the pandoc
+    subprocess.
+    """
+
+    startTimeout = 10.0
+    timeout      = 300.0
+
+    def __init__(self, exe=None):
+        self.exe     = FSPath(exe) if exe is not None else None
+        self.command = None
+        self.proc    = None
+        self.port    = None
+        self.running = False
+
+    def getCommand(self):
+        u"""Returns the command (list) to start the server or ``None``."""
+        if self.exe is not None:
+            return [self.exe]
+        exe = which('pandoc-server', False)
+        if exe:
+            return [exe]
+        if getPandocExe():
+            return [getPandocExe(), "server"]
+        return None
+
+    @classmethod
+    def getFreePort(cls):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%s" % self.port
+
+    def start(self):
+        u"""Start the server, returns ``True`` if the server is up and running."""
+        cmd = self.getCommand()
+        if cmd is None:
+            LOG.warn("pandoc server is not installed")
+            return False
+        self.command = cmd
+        self.port    = self.getFreePort()
+        try:
+            self.proc = cmd[0].Popen(
+                *(cmd[1:] + ["--port", str(self.port)])
+                , stdin = subprocess.DEVNULL
+                , stdout = subprocess.DEVNULL
+                , stderr = subprocess.DEVNULL )
+        except OSError as exc:
+            LOG.warn("can't start pandoc server %s: %s" % (cmd[0], exc))
+            return False
+
+        atexit.register(self.stop)
+        end = time.monotonic() + self.startTimeout
+        while time.monotonic() < end:
+            if self.proc.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(self.url + "/version", timeout=1):
+                    self.running = True
+                    LOG.info("pandoc server %s listen on port %s" % (cmd[0], self.port))
+                    return True
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.05)
+        LOG.warn("pandoc server %s does not respond" % cmd[0])
+        self.stop()
+        return False
+
+    def stop(self):
+        u"""Stop the server process."""
+        self.running = False
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+                try:
+                    self.proc.wait(5)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+                    self.proc.wait()
+            self.proc = None
+
+    def convert(self, text, **options):
+        u"""Convert ``text``, returns the output (str) or ``None`` on errors.
+
+        The ``options`` are the fields of the JSON request (``"from"``,
+        ``"to"``, ``"reference-links"``, ..). A server which is not responding is
+        stopped."""
+
+        request = dict(options)
+        request["text"] = text
+        request = urllib.request.Request(
+            self.url
+            , data = json.dumps(request).encode("utf-8")
+            , headers = { "Content-Type" : "application/json"
+                          , "Accept" : "application/json" } )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as exc:
+            LOG.warn("pandoc server: %s" % exc.read().decode("utf-8", "replace"))
+            return None
+        except (urllib.error.URLError, OSError, ValueError) as exc:
+            LOG.warn("pandoc server failed (%s), stop server" % exc)
+            self.stop()
+            return None
+        if isinstance(result, str):
+            # pandoc-server < 3.0 returns the bare output
+            return result
+        for message in result.get("messages", []):
+            LOG.info("pandoc server: %s" % message.get("message", message))
+        if result.get("base64"):
+            return None
+        return result.get("output")
 
 # ==============================================================================
-def xml2json(src, dst, **kwargs):
+def startServer(exe=None):
 # ==============================================================================
 
-    u"""convert xml file to json file with pandoc"""
+    u"""Start a :py:class:`PandocServer`, returns the running server or ``None``
+    if the server is not available.
+
+    The server is used by :py:func:`xml2json` and :py:func:`json2rst` when it
+    is the ``pandocServer`` of the current context, otherwise the pandoc
+    subprocess is used::
+
+        with useContext(currentContext().derive(pandocServer=startServer())):
+            ...
+    """
+
+    server = PandocServer(exe)
+    if not server.start():
+        LOG.warn("pandoc server is not available, fall back to pandoc subprocess")
+        return None
+    return server
+
+# ==============================================================================
+def serverConvert(text, **options):
+# ==============================================================================
 
-    if not PANDOC_EXE:
+    u"""Convert ``text`` by the :py:class:`PandocServer` of the current context.
+
+    Returns ``None`` if there is no running server or the conversion fails."""
+
+    server = currentContext().pandocServer
+    if server is None or not server.running:
+        return None
+    output = server.convert(text, **options)
+    if output is None:
+        LOG.warn("pandoc server can't convert, fall back to pandoc subprocess")
+    return output
+
+# ==============================================================================
+def pipePandoc(text, *args, **kwargs):
+# ==============================================================================
+
+    u"""Convert ``text`` by a pandoc subprocess (stdin --> stdout), returns the
+    output (str).  The ``kwargs`` are passed to ``subprocess.Popen``."""
+
+    kwargs.update(stdout = subprocess.PIPE, encoding = "utf-8")
+    proc = getPandocExe().Popen(*args, **kwargs)
+    output, _ = proc.communicate(text)
+    return output
+
+# ==============================================================================
+async def pipePandocAsync(text, *args, limit=None, stderr=None):
+# ==============================================================================
+
+    u"""Same as :py:func:`pipePandoc`, but the pandoc subprocess is run by
+    :py:func:`asyncio.create_subprocess_exec`, the event loop runs other tasks
+    while pandoc converts.
+
+    The semaphore ``limit`` (:py:class:`asyncio.Semaphore`) limits the number of
+    pandoc processes which run at the same time."""
+
+    if limit is not None:
+        async with limit:
+            return await pipePandocAsync(text, *args, stderr=stderr)
+    proc = await asyncio.create_subprocess_exec(
+        getPandocExe(), *args
+        , stdin = asyncio.subprocess.PIPE
+        , stdout = asyncio.subprocess.PIPE
+        , stderr = stderr )
+    output, _ = await proc.communicate(text.encode("utf-8"))
+    # universal newlines, like the text mode of pipePandoc
+    return output.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+async def serverConvertAsync(text, limit=None, **options):
+    u"""Same as :py:func:`serverConvert`, the (blocking) request to the server is
+    send from a thread of the event loop."""
+    server = currentContext().pandocServer
+    if server is None or not server.running:
+        return None
+    if limit is not None:
+        async with limit:
+            return await serverConvertAsync(text, **options)
+    return await runInThread(serverConvert, text, **options)
+
+async def runInThread(func, *args, **kwargs):
+    u"""Run the blocking ``func`` in a thread of the event loop, the thread runs
+    in the current context (see :py:func:`dbxml2rst.helper.currentContext`)."""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(
+            contextvars.copy_context().run
+            , func, *args, **kwargs))
+
+
+# ==============================================================================
+def xml2jsonText(text, **kwargs):
+# ==============================================================================
+
+    u"""convert xml (str) to json (str) with pandoc"""
+
+    output = serverConvert(text, **XML2JSON_OPTIONS)
+    if output is not None:
+        return output
+
+    if not getPandocExe():
         LOG.error("pandoc is not installed")
         sys.exit(42)
 
-    proc = PANDOC_EXE.Popen(
-        "--smart"
-        # , "-s" # standalone document
-        , "--from", "docbook"
-        , "--to", "json"
-        , "--output" , dst
-        , src
-        , **kwargs )
-    proc.communicate()
+    return pipePandoc(text, *xml2jsonArgs(), **kwargs)
+
+async def xml2jsonTextAsync(text, limit=None, stderr=None):
+    u"""convert xml (str) to json (str) with pandoc (see :py:func:`pipePandocAsync`)"""
+
+    output = await serverConvertAsync(text, limit=limit, **XML2JSON_OPTIONS)
+    if output is not None:
+        return output
+
+    if not getPandocExe():
+        LOG.error("pandoc is not installed")
+        sys.exit(42)
+
+    return await pipePandocAsync(text, *xml2jsonArgs(), limit=limit, stderr=stderr)
+
+def xml2json(src, dst, **kwargs):
+    u"""convert xml file to json file with pandoc"""
+    with dst.openTextFile("w") as outFile:
+        outFile.write(xml2jsonText(src.readFile(), **kwargs))
 
 
 # ==============================================================================
@@ -67,49 +389,78 @@ def toJSONFilters(input_stream, output_stream, *actions):
     """Modified version of pandoc filter.
 
     This version of pandoc filter is able to read from any input stream (not only
-    from stdin) and writes to any output stream (not only stdout).
+    from stdin) and writes to any output stream (not only stdout).  The JSON AST
+    of pandoc >= 1.18 (``{"pandoc-api-version": .., "meta": .., "blocks": ..}``)
+    and the older format (``[{"unMeta": ..}, [blocks]]``) are supported.
     """
     import pandocfilters
     doc = json.loads(input_stream.read())
     fmt = "json"
+    if isinstance(doc, dict):
+        meta = doc.get("meta", {})
+    else:
+        meta = doc[0]['unMeta']
     altered = functools.reduce(
-        lambda x, action: pandocfilters.walk(x, action, fmt, doc[0]['unMeta'])
+        lambda x, action: pandocfilters.walk(x, action, fmt, meta)
         , actions, doc )
     json.dump(altered, output_stream)
 
 
 # ==============================================================================
-def jsonFilter(src, dst, *filters):
+def jsonFilterText(text, *filters):
 # ==============================================================================
 
-    u"""apply ``*filters`` on a pandoc json file"""
+    u"""apply ``*filters`` on a pandoc json (str)"""
+
+    out = io.StringIO()
+    toJSONFilters(io.StringIO(text), out, *filters)
+    return out.getvalue()
 
+def jsonFilter(src, dst, *filters):
+    u"""apply ``*filters`` on a pandoc json file"""
     with src.openTextFile() as inFile, dst.openTextFile("w") as outFile:
         toJSONFilters(inFile, outFile, *filters)
 
 
 # ==============================================================================
-def json2rst(src, dst, **kwargs):
+def json2rstText(text, **kwargs):
 # ==============================================================================
 
-    u"""convert a json file with pandoc to reST markup"""
+    u"""convert a json (str) with pandoc to reST markup (str)"""
+
+    output = serverConvert(text, **JSON2RST_OPTIONS)
+    if output is not None:
+        return output
+
+    return pipePandoc(text, *JSON2RST_ARGS, **kwargs)
+
+async def json2rstTextAsync(text, limit=None, stderr=None):
+    u"""convert a json (str) with pandoc to reST markup (str), see
+    :py:func:`pipePandocAsync`"""
+
+    output = await serverConvertAsync(text, limit=limit, **JSON2RST_OPTIONS)
+    if output is not None:
+        return output
 
-    proc = PANDOC_EXE.Popen(
-        "--reference-links"
-        , "--from", "json"
-        , "--to", "rst"
-        , "--output" , dst
-        # activate this for the large ASCII tables
-        #, "--columns" , "180"
-        , src
-        , **kwargs )
-    proc.communicate()
+    return await pipePandocAsync(text, *JSON2RST_ARGS, limit=limit, stderr=stderr)
+
+def json2rst(src, dst, **kwargs):
+    u"""convert a json file with pandoc to reST markup"""
+    with dst.openTextFile("w") as outFile:
+        outFile.write(json2rstText(src.readFile(), **kwargs))
 
 # ==============================================================================
-def fixPandocRST(src, dst):
+def fixPandocRSTText(text, ctx=None):
 # ==============================================================================
 
-    u"""Fix common reST markup bugs from the pandoc reST writer.  """
+    u"""Fix common reST markup bugs from the pandoc reST writer.
+
+    The ``rstHeader`` and ``rstFooter`` of the context ``ctx`` (default: the
+    current context) are added."""
+
+    from .nodes import Table
+
+    ctx = ctx or currentContext()
 
     # fix malicious pandoc quoting
     # https://github.com/jgm/pandoc/blob/master/src/Text/Pandoc/Writers/RST.hs#L162
@@ -117,48 +468,45 @@ def fixPandocRST(src, dst):
     backslashEscapes = re.compile(r"\\[`\|\||\*|_]")
 
     indent = ""
-    with src.openTextFile() as src, dst.openTextFile("w") as dst:
-
-        dst.write(helper.rstHEADER)
-
-        for line in src:
-            line = line.replace(u"⋆", "*")
-            striped = line.strip()
-            if not striped:
-                dst.write("\n")
-                continue
-            if striped == Table.tableStartMark:
-                indent += Table.rstBlock
-                continue
-            if striped == Table.tableEndMark:
-                indent = indent[:-len(Table.rstBlock)]
-                continue
-
-            line = indent + line
-
-            if backslashEscapes.search(line):
-                spaces = ""
-                if line.strip()[0] == "|":
-                    # this is a table markup
-                    buf  = ""
-                    for c in line:
-                        if c == "\\":
-                            spaces += " "
-                        elif spaces and c in ["\t", " ", "\n"]:
-                            buf += spaces + c
-                            spaces = ""
-                        else:
-                            buf += c
-                    line = buf.rstrip() + "\n"
-                else:
-                    line = line.replace("\\", "")
-            dst.write(line)
-
-        dst.write(helper.rstFOOTER)
-
-# ==============================================================================
-# init
-# ==============================================================================
-
-init()
-
+    dst = [ctx.rstHeader]
+
+    for line in io.StringIO(text):
+        line = line.replace(u"⋆", "*")
+        striped = line.strip()
+        if not striped:
+            dst.append("\n")
+            continue
+        if striped == Table.tableStartMark:
+            indent += Table.rstBlock
+            continue
+        if striped == Table.tableEndMark:
+            indent = indent[:-len(Table.rstBlock)]
+            continue
+
+        line = indent + line
+
+        if backslashEscapes.search(line):
+            spaces = ""
+            if line.strip()[0] == "|":
+                # this is a table markup
+                buf  = ""
+                for c in line:
+                    if c == "\\":
+                        spaces += " "
+                    elif spaces and c in ["\t", " ", "\n"]:
+                        buf += spaces + c
+                        spaces = ""
+                    else:
+                        buf += c
+                line = buf.rstrip() + "\n"
+            else:
+                line = line.replace("\\", "")
+        dst.append(line)
+
+    dst.append(ctx.rstFooter)
+    return "".join(dst)
+
+def fixPandocRST(src, dst, ctx=None):
+    u"""Fix common reST markup bugs from the pandoc reST writer (files)."""
+    with dst.openTextFile("w") as outFile:
+        outFile.write(fixPandocRSTText(src.readFile(), ctx))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.plan
+    ~~~~~~~~~~~~~~
+
+    Dry-run planning of the conversions used by the dbxml2rst library
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import json
+import hashlib
+
+from lxml import etree
+from fspath import FSPath
+
+from .helper import Container, LOG
+from .nodes import XMLTag, subTemplateLine, subEntitiesLine
+from .hooks import getChunkNodes, getChunkID
+
+# ==============================================================================
+class Plan(object):
+# ==============================================================================
+
+    u"""The work a conversion run would do (dry-run).
+
+    A plan is a list of books, each book is a :py:class:`.helper.Container`
+    with:
+
+    * ``name``, ``source``, ``cache`` and ``size`` (bytes) of the source
+    * ``conversions``: the chunks which will be converted by pandoc, with the
+      ``size`` of the XML (bytes) and the flag ``current``, which is ``True``
+      if the chunk in the cache is up to date.
+    * ``includes``: the kernel-doc sources of the template markers
+    * ``resources``: the files referred by ``fileref`` attributes
+
+    The plan is build without calling pandoc and without writing any output::
+
+        plan = Plan()
+        plan.addBook(planDocBook(...))
+        LOG.msg(plan.summary())
+        plan.writeReport(FSPath("plan.json"))
+    """
+
+    def __init__(self):
+        self.books = []
+
+    @classmethod
+    def newBook(cls, name, source, cache):
+        source = FSPath(source)
+        return Container(
+            name          = str(name)
+            , source      = str(source)
+            , cache       = str(cache)
+            , size        = source.SIZE if source.EXISTS else None
+            , conversions = []
+            , includes    = []
+            , resources   = [] )
+
+    @classmethod
+    def addConversion(cls, book, fname, size, current):
+        book.conversions.append(Container(
+            fname = str(fname), size = size, current = current))
+
+    def addBook(self, book):
+        self.books.append(book)
+        return book
+
+    def summary(self):
+        u"""Returns a summary table (str) of the books."""
+
+        row = "%-30s %8s %8s %14s %8s %9s\n"
+        out  = row % ("book", "chunks", "current", "xml [bytes]", "includes", "resources")
+        out += row % ("-" * 30, "-" * 8, "-" * 8, "-" * 14, "-" * 8, "-" * 9)
+        total = Container(chunks=0, current=0, size=0)
+        for book in self.books:
+            current = len([c for c in book.conversions if c.current])
+            size    = sum([c.size for c in book.conversions])
+            out += row % (book.name, len(book.conversions), current, size
+                          , len(book.includes), len(book.resources))
+            total.chunks  += len(book.conversions)
+            total.current += current
+            total.size    += size
+        out += row % ("-" * 30, "-" * 8, "-" * 8, "-" * 14, "-" * 8, "-" * 9)
+        out += row % ("total", total.chunks, total.current, total.size, "", "")
+        return out
+
+    def details(self):
+        u"""Returns the conversions, includes and resources by book (str)."""
+        out = ""
+        for book in self.books:
+            out += "\n%s (%s)\n" % (book.name, book.source)
+            for conv in book.conversions:
+                out += "    %-8s %10s  %s\n" % (
+                    "current" if conv.current else "convert", conv.size, conv.fname)
+            for incl in book.includes:
+                out += "    include  %10s  %s\n" % (incl.size, incl.fname)
+            for res in book.resources:
+                out += "    resource %10s  %s\n" % (res.size, res.fname)
+        return out
+
+    def writeReport(self, fname):
+        u"""Write the plan as json report to file ``fname``."""
+        LOG.info("write plan: %s" % fname)
+        with fname.openTextFile(mode='w', encoding='utf-8') as jsonFile:
+            json.dump(self.books, jsonFile, indent=2)
+
+MANIFEST = "manifest.json"
+
+# ==============================================================================
+def contentHash(data):
+# ==============================================================================
+
+    u"""Returns the sha256 (hex) of ``data`` (``str`` is UTF-8 encoded)."""
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+# ==============================================================================
+def writeManifest(store, pattern=r".*\.xml_entity$", name=MANIFEST):
+# ==============================================================================
+
+    u"""Writes the hashes of the (pre-processed) XML artifacts in ``store`` to the
+    manifest ``name`` of the cache folder.
+
+    The manifest is spilled to the disk, with it :py:func:`isCurrent` can check
+    a cache whose XML artifacts were hold in memory (see
+    :py:class:`.artifacts.MemoryStore`).  Returns the path name of the
+    manifest."""
+
+    manifest = dict()
+    for xmlFile in store.names(pattern):
+        manifest[os.path.normpath(str(xmlFile))] = contentHash(store.readBytes(xmlFile))
+    store.write(name, json.dumps(manifest, indent=2, sort_keys=True))
+    return store.spill(name)
+
+# ==============================================================================
+def readManifest(cacheFolder, name=MANIFEST):
+# ==============================================================================
+
+    u"""Returns the manifest (dict) of the cache folder or ``None``, if the
+    folder has no manifest."""
+
+    fname = FSPath(cacheFolder) / name
+    if not fname.EXISTS:
+        return None
+    with fname.openTextFile() as jsonFile:
+        return json.load(jsonFile)
+
+# ==============================================================================
+def isCurrent(cacheFolder, fname, content, manifest=None):
+# ==============================================================================
+
+    u"""``True`` if the cached (pre-processed) XML ``fname`` has the same
+    ``content`` and the reST file of it exists in the cache.
+
+    The XML is compared by the hash in the ``manifest`` (see
+    :py:func:`writeManifest`), caches without a manifest are compared by the
+    XML file in the cache."""
+
+    cached = cacheFolder / fname
+    if not cached.suffix(".rst").EXISTS:
+        return False
+    if manifest is not None:
+        return manifest.get(os.path.normpath(str(fname))) == contentHash(content)
+    if not cached.EXISTS:
+        return False
+    return cached.readFile() == content
+
+# ==============================================================================
+def resourceIndex(folder):
+# ==============================================================================
+
+    u"""Returns the index of the files in ``folder`` (dict: basename --> path).
+
+    The folder is walked once, the ``fileref`` of the resources are looked up in
+    the index.  A name which exists more than once is mapped to the first path
+    (in the order of :py:meth:`fspath.FSPath.reMatchFind`)."""
+
+    index = dict()
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for name in dirnames + filenames:
+            index.setdefault(name, FSPath(dirpath) / name)
+    return index
+
+# ==============================================================================
+def planDocBook(tmplFile, cacheFolder, srcTree, resourceFolder
+                , chunkPathes=None, int_entities=None, mainFile="index.xml_entity"):
+# ==============================================================================
+
+    u"""Plan the conversion of a DocBook-XML book (``.tmpl``).
+
+    The template markers and entities are substituted in memory (see
+    :py:func:`.nodes.subTemplate`, :py:func:`.nodes.subEntities`) and the XML
+    is chunked like :py:func:`.hooks.hook_chunk_by_tag` does (if
+    ``chunkPathes`` is given).  Returns the book (see :py:class:`Plan`).
+
+    :param tmplFile:       the DocBook template
+    :param cacheFolder:    the cache folder of the book
+    :param srcTree:        root of the kernel-doc sources (template markers)
+    :param resourceFolder: folder with the resources (``fileref``)
+    """
+
+    tmplFile    = FSPath(tmplFile)
+    cacheFolder = FSPath(cacheFolder)
+    mainFile    = FSPath(mainFile)
+    book        = Plan.newBook(tmplFile.BASENAME.SKIPSUFFIX, tmplFile, cacheFolder)
+    manifest    = readManifest(cacheFolder)
+
+    with tmplFile.openTextFile() as src:
+        content = "".join([
+            subEntitiesLine(subTemplateLine(line), None, int_entities)
+            for line in src ])
+
+    if content.startswith("<?xml"):
+        rootNode = etree.fromstring(content.encode("utf-8")) # pylint: disable=E1101
+    else:
+        rootNode = etree.fromstring(u"<dummy>" + content + u"</dummy>") # pylint: disable=E1101
+
+    for tmpl in rootNode.iter(XMLTag.rstTemplate_tag):
+        fname = FSPath(srcTree) / tmpl.get("fname")
+        book.includes.append(Container(
+            op      = tmpl.get("op")
+            , fname = str(fname)
+            , args  = tmpl.get("args")
+            , size  = fname.SIZE if fname.EXISTS else None ))
+
+    resources = dict()
+    filerefs  = [FSPath(elem.get("fileref")).BASENAME
+                 for elem in rootNode.iterfind(".//*[@fileref]")]
+    index     = resourceIndex(resourceFolder) if filerefs else {}
+    for fileref in filerefs:
+        if fileref in resources:
+            continue
+        src = index.get(fileref)
+        resources[fileref] = Container(
+            fname  = str(src or fileref)
+            , size = src.SIZE if src is not None else None )
+        if src is None:
+            LOG.warn("fileref: %s could not found in %s" % (fileref, resourceFolder))
+    book.resources = list(resources.values())
+
+    Plan.addConversion(
+        book, mainFile.suffix(".xml"), len(content.encode("utf-8"))
+        , isCurrent(cacheFolder, mainFile, content, manifest))
+    if chunkPathes:
+        _planChunks(book, cacheFolder, rootNode, mainFile, chunkPathes, manifest)
+    return book
+
+def _planChunks(book, cacheFolder, rootNode, fname, chunkPathes, manifest):
+    for elem in getChunkNodes(rootNode, chunkPathes):
+        chunkFile = (fname.DIRNAME / ("%s.xml" % getChunkID(elem, fname))).suffix(fname.SUFFIX)
+        elem.set("chunkNode", "1")
+        content = etree.tostring(elem, encoding='unicode') # pylint: disable=E1101
+        Plan.addConversion(
+            book, chunkFile.suffix(".xml"), len(content.encode("utf-8"))
+            , isCurrent(cacheFolder, chunkFile, content, manifest))
+        # the chunk is parsed (and chunked) again when it is included
+        chunkRoot = etree.fromstring(u"<dummy>" + content + u"</dummy>") # pylint: disable=E1101
+        _planChunks(book, cacheFolder, chunkRoot, chunkFile, chunkPathes, manifest)
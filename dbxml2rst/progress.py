@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.progress
+    ~~~~~~~~~~~~~~~~~~
+
+    Live progress and throughput of the conversions used by the dbxml2rst library
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import time
+import threading
+import contextlib
+
+from .helper import Container, currentContext
+
+# ==============================================================================
+def humanizeBytes(size):
+# ==============================================================================
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024.0
+    return "%.1f %s" % (size, unit) if unit != "B" else "%d B" % size
+
+def humanizeSeconds(sec):
+    sec = int(sec)
+    return "%d:%02d:%02d" % (sec // 3600, (sec // 60) % 60, sec % 60)
+
+# ==============================================================================
+class Progress(object):
+# ==============================================================================
+
+    u"""Live progress of the conversion by book.
+
+    Reports the chunks done out of total, the bytes in and out per second, the
+    current stage and the ETA of each book.  On a TTY the status line is
+    refreshed in place, otherwise a plain line is written every ``interval``
+    seconds (even if nothing has been changed, so a stalled conversion can be
+    seen in a log).  All methods are thread-safe::
+
+        progress = Progress().start()
+        progress.startBook("kernel-hacking")
+        with progress.stage("filterXML", "kernel-hacking"):
+            ...
+        progress.setTotal("kernel-hacking", len(fileList))
+        for chunk in fileList:
+            with progress.stage("xml2json", "kernel-hacking", chunk):
+                ...
+            progress.chunkDone("kernel-hacking", bytesIn, bytesOut)
+        progress.finishBook("kernel-hacking")
+        progress.stop()
+    """
+
+    interval    = 30.0
+    ttyInterval = 1.0
+
+    def __init__(self, stream=None, tty=None, interval=None):
+        self.stream   = stream or currentContext().log_out
+        self.tty      = self.stream.isatty() if tty is None else tty
+        self.interval = interval or (self.ttyInterval if self.tty else self.interval)
+        self.books    = dict()
+        self.current  = None
+        self.lock     = threading.RLock()
+        self._stop    = threading.Event()
+        self._thread  = None
+        self._lastLen = 0
+
+    def start(self):
+        u"""Start the thread which reports the progress periodically."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self.lock:
+            if self.tty and self._lastLen:
+                self.stream.write("\n")
+                self._lastLen = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def getBook(self, book):
+        book = str(book)
+        with self.lock:
+            b = self.books.get(book, None)
+            if b is None:
+                b = self.books[book] = Container(
+                    name       = book
+                    , total    = None
+                    , done     = 0
+                    , bytesIn  = 0
+                    , bytesOut = 0
+                    , active   = dict()
+                    , stage    = None
+                    , started  = time.monotonic()
+                    , convertStarted = None
+                    , finished = None )
+            return b
+
+    def startBook(self, book, total=None):
+        b = self.getBook(book)
+        with self.lock:
+            b.total = total
+            self.current = b.name
+        self.report()
+
+    def setTotal(self, book, total):
+        u"""Set the number of chunks which will be converted."""
+        b = self.getBook(book)
+        with self.lock:
+            b.total = total
+            b.convertStarted = time.monotonic()
+
+    def chunkDone(self, book, bytesIn=0, bytesOut=0):
+        b = self.getBook(book)
+        with self.lock:
+            b.done     += 1
+            b.bytesIn  += bytesIn
+            b.bytesOut += bytesOut
+        if self.tty:
+            self.report()
+
+    def finishBook(self, book):
+        b = self.getBook(book)
+        with self.lock:
+            b.finished = time.monotonic()
+            b.active.clear()
+            b.stage = "done"
+            self.report(b.name)
+
+    @contextlib.contextmanager
+    def stage(self, stage, book, chunk=None):
+        b = self.getBook(book)
+        key = (stage, chunk)
+        with self.lock:
+            b.active[key] = "%s (%s)" % (stage, chunk) if chunk is not None else stage
+            b.stage = b.active[key]
+            self.current = b.name
+        if self.tty:
+            self.report()
+        try:
+            yield
+        finally:
+            with self.lock:
+                b.active.pop(key, None)
+
+    def render(self, book):
+        u"""Returns the status line (str) of a book."""
+        with self.lock:
+            b   = self.getBook(book)
+            now = b.finished or time.monotonic()
+            sec = max(now - (b.convertStarted or b.started), 1e-6)
+            line = "%s: %s/%s chunks" % (b.name, b.done, "?" if b.total is None else b.total)
+            line += ", in %s/s, out %s/s" % (
+                humanizeBytes(b.bytesIn / sec), humanizeBytes(b.bytesOut / sec))
+            active = list(b.active.values())
+            stage  = active[-1] if active else (b.stage or "-")
+            if len(active) > 1:
+                stage += " +%s" % (len(active) - 1)
+            line += ", stage %s" % stage
+            if b.finished:
+                line += ", time %s" % humanizeSeconds(b.finished - b.started)
+            elif b.total and b.done:
+                line += ", ETA %s" % humanizeSeconds(sec / b.done * (b.total - b.done))
+            else:
+                line += ", ETA ?"
+            return line
+
+    def report(self, book=None):
+        u"""Write the status line of the ``book`` (default: current book)."""
+        with self.lock:
+            if book is None:
+                book = self.current
+                if book is None or self.books[book].finished:
+                    return
+            line = self.render(book)
+            if self.tty:
+                pad = max(self._lastLen - len(line), 0)
+                self.stream.write("\r" + line + " " * pad)
+                self._lastLen = len(line)
+                if self.books[str(book)].finished:
+                    self.stream.write("\n")
+                    self._lastLen = 0
+            else:
+                self.stream.write(line + "\n")
+            self.stream.flush()
+
+# ==============================================================================
+class NullProgress(object):
+# ==============================================================================
+
+    u"""A progress which reports nothing (the default)."""
+
+    _nullContext = contextlib.nullcontext()
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def startBook(self, book, total=None):
+        pass
+
+    def setTotal(self, book, total):
+        pass
+
+    def chunkDone(self, book, bytesIn=0, bytesOut=0):
+        pass
+
+    def finishBook(self, book):
+        pass
+
+    def stage(self, stage, book, chunk=None): # pylint: disable=W0613
+        return self._nullContext
+
+NULL_PROGRESS = NullProgress()
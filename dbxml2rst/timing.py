@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.timing
+    ~~~~~~~~~~~~~~~~
+
+    Timing and profiling of the conversion steps used by the dbxml2rst library
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import json
+import time
+import contextlib
+
+from .helper import Container, LOG
+
+# ==============================================================================
+def childCPU():
+# ==============================================================================
+
+    u"""CPU time (user + system) consumed by all terminated child processes.
+
+    Child processes (e.g. pandoc) are only counted, when they have been waited
+    for (``proc.communicate()``)."""
+
+    t = os.times()
+    return t.children_user + t.children_system
+
+# ==============================================================================
+class StageTimer(object):
+# ==============================================================================
+
+    u"""Records wall- and CPU-time of the conversion stages.
+
+    Each record is taken by the context manager :py:meth:`stage` and holds the
+    *book*, the *chunk* (``None`` for stages which work on the whole book) and
+    the time consumed::
+
+        with TIMER.stage("xml2json", "kernel-hacking", "index.xml"):
+            xml2json(...)
+
+    The CPU time of the python process (``cpu``) is recorded separately from the
+    CPU time of the child processes like pandoc (``child_cpu``).  Both are
+    process wide, the records are only exact if the stages do not overlap (the
+    chunks of a timed conversion are converted one by one).
+    """
+
+    def __init__(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, stage, book, chunk=None):
+        wall0  = time.perf_counter()
+        cpu0   = time.process_time()
+        child0 = childCPU()
+        try:
+            yield
+        finally:
+            self.records.append(Container(
+                stage       = stage
+                , book      = str(book)
+                , chunk     = None if chunk is None else str(chunk)
+                , wall      = time.perf_counter() - wall0
+                , cpu       = time.process_time() - cpu0
+                , child_cpu = childCPU() - child0 ))
+
+    @classmethod
+    def _sumUp(cls, records, key):
+        total = dict()
+        for rec in records:
+            k = key(rec)
+            t = total.get(k, None)
+            if t is None:
+                t = total[k] = Container(wall=0.0, cpu=0.0, child_cpu=0.0)
+            t.wall      += rec.wall
+            t.cpu       += rec.cpu
+            t.child_cpu += rec.child_cpu
+        return total
+
+    def stages(self):
+        u"""Times summed up by stage"""
+        return self._sumUp(self.records, lambda rec: rec.stage)
+
+    def books(self):
+        u"""Times summed up by book"""
+        return self._sumUp(self.records, lambda rec: rec.book)
+
+    def chunks(self):
+        u"""Times summed up by chunk, sorted by wall time (slowest first)"""
+        total = self._sumUp(
+            [rec for rec in self.records if rec.chunk is not None]
+            , lambda rec: (rec.book, rec.chunk))
+        retVal = []
+        for (book, chunk), t in total.items():
+            t.update(book=book, chunk=chunk)
+            retVal.append(t)
+        retVal.sort(key=lambda t: t.wall, reverse=True)
+        return retVal
+
+    def summary(self, slowest=10):
+        u"""Returns a summary table (str) with the slowest chunks."""
+
+        row = "%-40s %10s %10s %10s\n"
+        num = "%-40s %10.3f %10.3f %10.3f\n"
+
+        out  = row % ("stage", "wall [s]", "cpu [s]", "child [s]")
+        out += row % ("-" * 40, "-" * 10, "-" * 10, "-" * 10)
+        for name, t in sorted(self.stages().items(), key=lambda x: -x[1].wall):
+            out += num % (name, t.wall, t.cpu, t.child_cpu)
+
+        out += "\n" + row % ("book", "wall [s]", "cpu [s]", "child [s]")
+        out += row % ("-" * 40, "-" * 10, "-" * 10, "-" * 10)
+        for name, t in sorted(self.books().items(), key=lambda x: -x[1].wall):
+            out += num % (name, t.wall, t.cpu, t.child_cpu)
+
+        out += "\n" + row % ("slowest chunks", "wall [s]", "cpu [s]", "child [s]")
+        out += row % ("-" * 40, "-" * 10, "-" * 10, "-" * 10)
+        for t in self.chunks()[:slowest]:
+            out += num % ("%s/%s" % (t.book, t.chunk), t.wall, t.cpu, t.child_cpu)
+        return out
+
+    def writeReport(self, fname):
+        u"""Write records and sums as json report to file ``fname``."""
+        report = dict(
+            stages    = self.stages()
+            , books   = self.books()
+            , chunks  = self.chunks()
+            , records = self.records )
+        LOG.info("write timing report: %s" % fname)
+        with fname.openTextFile(mode='w', encoding='utf-8') as jsonFile:
+            json.dump(report, jsonFile, indent=2)
+
+# ==============================================================================
+class NullTimer(object):
+# ==============================================================================
+
+    u"""A timer which records nothing (the default)."""
+
+    _nullContext = contextlib.nullcontext()
+
+    def stage(self, stage, book, chunk=None): # pylint: disable=W0613
+        return self._nullContext
+
+NULL_TIMER = NullTimer()
+
+# ==============================================================================
+class StageGroup(object):
+# ==============================================================================
+
+    u"""Passes the stages to several recorders (e.g. a :py:class:`StageTimer` and
+    a :py:class:`.progress.Progress`)."""
+
+    def __init__(self, *recorders):
+        self.recorders = recorders
+
+    @contextlib.contextmanager
+    def stage(self, stage, book, chunk=None):
+        with contextlib.ExitStack() as stack:
+            for recorder in self.recorders:
+                stack.enter_context(recorder.stage(stage, book, chunk))
+            yield
+
+# ==============================================================================
+class WalkStats(object):
+# ==============================================================================
+
+    u"""Profiling counters of the XML filter (:py:meth:`XMLTag.walk`).
+
+    Counts per file (``parseData.fname``):
+
+    * ``nodes``:      visited nodes by tag name
+    * ``hooks``:      hook calls and cumulative time by hook
+    * ``handlers``:   ``applyFilter`` calls and cumulative time by XMLTag class
+    * ``injections``: injected nodes (:py:meth:`XMLTag.getInjBlockTag` and
+      :py:meth:`XMLTag.getInjInlineTag`)
+
+    The instrumentation is off by default, it is switched on by the
+    ``walkStats`` of the current context (see
+    :py:func:`dbxml2rst.helper.currentContext`)::
+
+        stats = WalkStats()
+        with useContext(currentContext().derive(walkStats=stats)):
+            filterXML(...)
+        stats.writeReport(FSPath("walk-stats.json"))
+    """
+
+    def __init__(self):
+        self.files = dict()
+        self.fname = None
+
+    def getFile(self, fname):
+        fname = str(fname)
+        fstats = self.files.get(fname, None)
+        if fstats is None:
+            fstats = self.files[fname] = Container(
+                nodes        = dict()
+                , hooks      = dict()
+                , handlers   = dict()
+                , injections = dict() )
+        return fstats
+
+    @classmethod
+    def _count(cls, counter, name, sec):
+        c = counter.get(name, None)
+        if c is None:
+            c = counter[name] = Container(calls=0, time=0.0)
+        c.calls += 1
+        c.time  += sec
+
+    def countNode(self, tag):
+        counter = self.getFile(self.fname).nodes
+        counter[tag] = counter.get(tag, 0) + 1
+
+    def countHook(self, func, sec):
+        name = getattr(func, "__qualname__", None) or repr(func)
+        self._count(self.getFile(self.fname).hooks, name, sec)
+
+    def countHandler(self, xmlTag, sec):
+        self._count(self.getFile(self.fname).handlers, xmlTag.__class__.__name__, sec)
+
+    def countInjection(self, kind):
+        counter = self.getFile(self.fname).injections
+        counter[kind] = counter.get(kind, 0) + 1
+
+    def summary(self):
+        u"""Returns a summary table (str) summed up over all files."""
+        hooks    = dict()
+        handlers = dict()
+        nodes    = 0
+        injected = 0
+        for fstats in self.files.values():
+            nodes    += sum(fstats.nodes.values())
+            injected += sum(fstats.injections.values())
+            for total, counter in ((hooks, fstats.hooks), (handlers, fstats.handlers)):
+                for name, c in counter.items():
+                    t = total.setdefault(name, Container(calls=0, time=0.0))
+                    t.calls += c.calls
+                    t.time  += c.time
+
+        row = "%-60s %10s %10s\n"
+        out = "files: %s / nodes visited: %s / injected nodes: %s\n\n" % (
+            len(self.files), nodes, injected)
+        for title, total in (("hook", hooks), ("handler", handlers)):
+            out += row % (title, "calls", "time [s]")
+            out += row % ("-" * 60, "-" * 10, "-" * 10)
+            for name, t in sorted(total.items(), key=lambda x: -x[1].time):
+                out += "%-60s %10d %10.3f\n" % (name, t.calls, t.time)
+            out += "\n"
+        return out
+
+    def writeReport(self, fname):
+        u"""Write the counters (by file) as json report to file ``fname``."""
+        LOG.info("write XML filter statistics: %s" % fname)
+        with fname.openTextFile(mode='w', encoding='utf-8') as jsonFile:
+            json.dump(self.files, jsonFile, indent=2)
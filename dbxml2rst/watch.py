@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    dbxml2rst.watch
+    ~~~~~~~~~~~~~~~
+
+    Watch a folder tree for changed files (inotify or polling)
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+# ==============================================================================
+# imports
+# ==============================================================================
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from fspath import FSPath
+
+from .helper import LOG
+
+_libc = None
+if ctypes.util.find_library("c"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        pass
+
+# ==============================================================================
+class Watcher(object):
+# ==============================================================================
+
+    u"""Base class of the watchers.
+
+    :py:meth:`changes` blocks until files in the ``folder`` tree have been
+    changed and returns their path names.  A burst of changes (e.g. an editor
+    which saves some files) is collected until there is no further change for
+    ``debounce`` seconds::
+
+        watcher = newWatcher(FSPath("linux/Documentation/DocBook"))
+        while True:
+            for fname in watcher.changes():
+                print(fname)
+    """
+
+    def __init__(self, folder, debounce=0.5):
+        self.folder   = FSPath(folder)
+        self.debounce = debounce
+
+    @classmethod
+    def ignore(cls, name):
+        u"""``True`` for temporary files of editors (``.#foo``, ``foo~``, ..)"""
+        name = os.path.basename(name)
+        return (name.startswith(".") or name.endswith("~")
+                or name.endswith(".swp") or name.endswith(".tmp"))
+
+    def wait(self, timeout):
+        u"""Returns the set of changed files, waits at most ``timeout`` seconds
+        (``None``: wait for changes)."""
+        raise NotImplementedError
+
+    def changes(self):
+        changed = set()
+        while not changed:
+            changed = self.wait(None)
+        while True:
+            more = self.wait(self.debounce)
+            if not more:
+                break
+            changed.update(more)
+        return sorted(changed)
+
+    def close(self):
+        pass
+
+# ==============================================================================
+class InotifyWatcher(Watcher):
+# ==============================================================================
+
+    u"""Watcher based on the Linux inotify API (by :py:mod:`ctypes`)."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_ISDIR       = 0x40000000
+    IN_NONBLOCK    = 0o4000
+    IN_CLOEXEC     = 0o2000000
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT = struct.Struct("iIII")
+
+    @classmethod
+    def available(cls):
+        return _libc is not None and hasattr(_libc, "inotify_init1")
+
+    def __init__(self, folder, debounce=0.5):
+        super().__init__(folder, debounce)
+        self.fd = _libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.folders = dict()
+        for folder, _dirs, _files in os.walk(self.folder):
+            self.addFolder(folder)
+
+    def addFolder(self, folder):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(folder), self.MASK)
+        if wd < 0:
+            LOG.warn("can't watch %s: %s" % (folder, os.strerror(ctypes.get_errno())))
+            return
+        self.folders[wd] = FSPath(folder)
+
+    def wait(self, timeout):
+        # events of ignored files only (e.g. a backup file) do not end the wait
+        end     = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            left = None if end is None else max(0, end - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], left)
+            if not ready:
+                break
+            changed = self.readEvents()
+        return changed
+
+    def readEvents(self):
+        u"""Returns the set of changed files from the pending events."""
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as exc:
+            if exc.errno == errno.EAGAIN:
+                return changed
+            raise
+        pos = 0
+        while pos < len(data):
+            wd, mask, _cookie, size = self.EVENT.unpack_from(data, pos)
+            pos += self.EVENT.size
+            name = data[pos:pos + size].rstrip(b"\0").decode("utf-8", "replace")
+            pos += size
+            if mask & self.IN_Q_OVERFLOW:
+                LOG.warn("inotify: event queue overflow")
+                changed.add(self.folder)
+                continue
+            folder = self.folders.get(wd)
+            if folder is None or not name:
+                continue
+            fname = folder / name
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    for sub, _dirs, _files in os.walk(fname):
+                        self.addFolder(sub)
+                continue
+            if not self.ignore(fname):
+                changed.add(fname)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+# ==============================================================================
+class PollWatcher(Watcher):
+# ==============================================================================
+
+    u"""Watcher which compares the mtime and size of the files every
+    ``interval`` seconds."""
+
+    def __init__(self, folder, debounce=0.5, interval=1.0):
+        super().__init__(folder, debounce)
+        self.interval = interval
+        self.state    = self.scan()
+
+    def scan(self):
+        state = dict()
+        for folder, _dirs, files in os.walk(self.folder):
+            for name in files:
+                fname = FSPath(folder) / name
+                try:
+                    stat = os.stat(fname)
+                except OSError:
+                    continue
+                state[fname] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout):
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pause = self.interval
+            if end is not None:
+                pause = min(pause, max(0, end - time.monotonic()))
+            time.sleep(pause)
+            state = self.scan()
+            changed = set([
+                fname for fname in set(state) | set(self.state)
+                if state.get(fname) != self.state.get(fname)
+                and not self.ignore(fname) ])
+            self.state = state
+            if changed or (end is not None and time.monotonic() >= end):
+                return changed
+
+# ==============================================================================
+def newWatcher(folder, debounce=0.5, poll=False, interval=1.0):
+# ==============================================================================
+
+    u"""Returns a :py:class:`InotifyWatcher` or (if inotify is not available or
+    ``poll`` is ``True``) a :py:class:`PollWatcher` of the ``folder`` tree."""
+
+    if not poll and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(folder, debounce)
+        except OSError as exc:
+            LOG.warn("inotify is not available (%s), fall back to polling" % exc)
+    return PollWatcher(folder, debounce, interval)
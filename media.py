@@ -18,15 +18,21 @@ u"""
 # ==============================================================================
 
 import re
-from html.parser import HTMLParser
+import os
+import concurrent.futures
+import html
 
-from dbxml2rst.helper import LOG, EntityContainer, PContainer
+from dbxml2rst.helper import LOG, Container, EntityContainer, PContainer
 from dbxml2rst.nodes import (
-    XMLTag, subEntities, filterXML )
+    XMLTag, TableModel, subEntities, filterXML )
 
 from dbxml2rst.hooks import (
     hook_replaceTag,  hook_copy_file_resource, hook_drop_usless_informaltables
-    , hook_flatten_tables, RESOUCE_FORMAT )
+    , hook_flatten_tables, fuseHooks, RESOUCE_FORMAT )
+from dbxml2rst.timing import NULL_TIMER
+from dbxml2rst.plan import Plan, resourceIndex
+from dbxml2rst.install import SyncInstall, fileHash
+from dbxml2rst.entities import EntityTables, sourceKey
 
 from fspath import FSPath
 
@@ -34,19 +40,39 @@ from fspath import FSPath
 # setup
 # ==============================================================================
 
-LINUX_TV_CACHE     = FSPath("linux_tv_cache")
-LINUX_TV_BOOK      = FSPath("linux_tv")
-LINUX_DOCBOOK_ROOT = FSPath(".")
+MEDIA_ENTITY_SOURCES = ["media-entities.tmpl", "media-indices.tmpl", "media_api.tmpl"]
 
-MEDIA_EXT = None
-MEDIA_INT = None
-MEDIA_REFS = None
+# ==============================================================================
+def newContext(
+        cache = FSPath("linux_tv_cache"), book = FSPath("linux_tv")
+        , docbookRoot = FSPath("."), svgPdfCache = FSPath("svg2pdf_cache")
+        , entityTables = FSPath("entity_tables"), timer = NULL_TIMER ):
+# ==============================================================================
+
+    u"""Returns the state of a *media* conversion, it is passed to the functions
+    of this module (and by ``parseData.media`` to the hooks):
 
-def init_globals():
-    global MEDIA_EXT, MEDIA_INT, MEDIA_REFS  # pylint: disable=W0603
-    MEDIA_EXT = EntityContainer(LINUX_TV_CACHE / "media-entities-ext.container")
-    MEDIA_INT = EntityContainer(LINUX_TV_CACHE / "media-entities-int.container")
-    MEDIA_REFS = PContainer(LINUX_TV_CACHE / "media_refs.container")
+    * ``cache``: folder where the conversion takes place
+    * ``book``: folder of the installed reST book
+    * ``docbookRoot``: folder of the DocBook sources
+    * ``svgPdfCache``: PDF files of the SVG files, cached by the content hash of
+      the SVG file (see :py:func:`svg2pdf`)
+    * ``entityTables``: compiled entity tables, cached by the hash of their
+      sources (see :py:func:`loadMediaEntities`)
+    * ``timer``: timer of the stages (see :py:mod:`dbxml2rst.timing`)
+    * ``ext``, ``int``, ``refs``: the entity containers of the cache"""
+
+    cache = FSPath(cache)
+    return Container(
+        cache          = cache
+        , book         = FSPath(book)
+        , docbookRoot  = FSPath(docbookRoot)
+        , svgPdfCache  = FSPath(svgPdfCache)
+        , entityTables = FSPath(entityTables)
+        , timer        = timer
+        , ext          = EntityContainer(cache / "media-entities-ext.container")
+        , int          = EntityContainer(cache / "media-entities-int.container")
+        , refs         = PContainer(cache / "media_refs.container") )
 
 
 # <!-- Subsections -->
@@ -60,63 +86,125 @@ INT_ENTITY_RE   = re.compile(r'''<!ENTITY\s+(?P<name>\S+)\s+"(?P<replacement>.*)
 mainFile = FSPath("media_api.xml")
 
 # ==============================================================================
-def initMedia():
+def initMedia(mctx, jobs=None):
 # ==============================================================================
 
+    u"""Init the cache of the *media* book (``mctx`` see :py:func:`newContext`).
+
+    The entities of the media files are substituted by ``jobs`` worker
+    processes (see :py:func:`mediaSubEntities`)."""
+
     LOG.msg("init media ...")
 
-    if LINUX_TV_CACHE.EXISTS:
-        LINUX_TV_CACHE.rmtree()
-    LINUX_TV_CACHE.makedirs()
+    if mctx.cache.EXISTS:
+        mctx.cache.rmtree()
+    mctx.cache.makedirs()
 
-    media_init_ENTITIES()
+    media_init_ENTITIES(mctx)
 
-    fileList = getFileList()
+    fileList = getFileList(mctx.ext)
     # only for debug requiered
     fileList.add(FSPath("media-entities.tmpl"))
 
     LOG.msg("cache files ...")
     for fname in fileList:
-        outFile = LINUX_TV_CACHE/fname.suffix(".xml_orig")
+        outFile = mctx.cache/fname.suffix(".xml_orig")
         outFile.DIRNAME.makedirs()
-        (LINUX_DOCBOOK_ROOT/fname).copyfile(outFile)
+        (mctx.docbookRoot/fname).copyfile(outFile)
 
     LOG.msg("substitude entities ...")
 
-    for fname in fileList:
-        inFile  = fname.suffix(".xml_orig")
-        outFile = fname.suffix(".xml_entity")
-        subEntities( LINUX_TV_CACHE/inFile , LINUX_TV_CACHE/outFile ,
-                     MEDIA_EXT, MEDIA_INT )
+    book = mctx.book.BASENAME
+    with mctx.timer.stage("subEntities", book):
+        mediaSubEntities(mctx, sorted(fileList), jobs)
 
     inFile = mainFile.suffix(".xml_entity")
     LOG.msg("run XML filter (mainFile) : %s --> %s" % (inFile, mainFile))
-    filterXML(LINUX_TV_CACHE, inFile, mainFile
-              , xmlFilter     = getMediaFilter()
-              , parseIncludes = True )
+    with mctx.timer.stage("filterXML", book):
+        filterXML(mctx.cache, inFile, mainFile
+                  , xmlFilter     = getMediaFilter(mctx)
+                  , parseIncludes = True )
 
 
 # ==============================================================================
-def installMedia():
+def mediaSubEntities(mctx, fileList, jobs=None):
 # ==============================================================================
 
-    LOG.msg("install *Media-API* book : %s" % LINUX_TV_BOOK)
+    u"""Substitute the entities of the media files in the cache (``.xml_orig``
+    --> ``.xml_entity``, see :py:func:`dbxml2rst.nodes.subEntities`).
+
+    The files do not depend on each other, they are substituted by a pool of
+    ``jobs`` worker processes (default: number of CPUs).  Each file is written
+    atomically, the files are logged in the order of ``fileList``."""
+
+    tasks = [ (mctx.cache / fname.suffix(".xml_orig")
+               , mctx.cache / fname.suffix(".xml_entity"))
+              for fname in fileList ]
+    with concurrent.futures.ProcessPoolExecutor(
+            jobs, initializer=_initSubEntities
+            , initargs=(dict(mctx.ext), dict(mctx.int))) as pool:
+        for (inFile, _outFile), _ in zip(tasks, pool.map(_subEntities, tasks, chunksize=4)):
+            LOG.info("substitude entities: %s" % inFile)
+
+_WORKER_ENTITIES = None
+
+def _initSubEntities(ext_entities, int_entities):
+    # worker: the entity tables are passed once per worker process
+    global _WORKER_ENTITIES # pylint: disable=W0603
+    _WORKER_ENTITIES = (ext_entities, int_entities)
+
+def _subEntities(args):
+    # worker: substitute the entities of one file (atomic write)
+    inFile, outFile = args
+    tmpFile = FSPath(outFile + ".tmp")
+    subEntities(inFile, tmpFile, *_WORKER_ENTITIES)
+    os.replace(tmpFile, outFile)
+
+# ==============================================================================
+def installMedia(mctx, sync=False, jobs=None):
+# ==============================================================================
+
+    u"""Install the *media* book, with ``sync`` only the changed files are written
+    (see :py:class:`dbxml2rst.install.SyncInstall`).  The SVG files are converted
+    to PDF by ``jobs`` worker processes (see :py:func:`svg2pdf`)."""
+
+    LOG.msg("install *Media-API* book : %s" % mctx.book)
 
-    if LINUX_TV_BOOK.EXISTS:
-        for name in LINUX_TV_BOOK.reMatchFind("[^(conf.py)]"):
+    if sync:
+        installer = SyncInstall(mctx.book)
+        folders   = []
+        for xmlFile in getFileList(mctx.ext):
+            rstFile = xmlFile.suffix(".rst")
+            src     = mctx.cache / rstFile
+            dst     = rstFile
+            if rstFile == FSPath("media_api.rst"):
+                dst = FSPath("index.rst")
+            installer.addFile(src, dst)
+            folder = FSPath(RESOUCE_FORMAT % src.SKIPSUFFIX)
+            if folder.EXISTS:
+                folders.append((folder, dst.DIRNAME / folder.BASENAME))
+        svg2pdf([folder for folder, _dst in folders], mctx.svgPdfCache, jobs)
+        for folder, dstFolder in folders:
+            installer.addTree(folder, dstFolder)
+        installer.commit()
+        return
+
+    if mctx.book.EXISTS:
+        for name in mctx.book.reMatchFind("[^(conf.py)]"):
             name.delete()
     else:
-        LINUX_TV_BOOK.makedirs()
+        mctx.book.makedirs()
 
-    fileList = getFileList()
+    fileList = getFileList(mctx.ext)
+    folders  = []
 
     for xmlFile in fileList:
         rstFile = xmlFile.suffix(".rst")
 
-        src = LINUX_TV_CACHE  / rstFile
-        dst = LINUX_TV_BOOK / rstFile
+        src = mctx.cache  / rstFile
+        dst = mctx.book / rstFile
         if rstFile == FSPath("media_api.rst"):
-            dst = LINUX_TV_BOOK / FSPath("index.rst")
+            dst = mctx.book / FSPath("index.rst")
         folder = FSPath(RESOUCE_FORMAT % src.SKIPSUFFIX)
 
         dst.DIRNAME.makedirs()
@@ -127,21 +215,121 @@ def installMedia():
             dstFolder = dst.DIRNAME / folder.BASENAME
             LOG.msg("install files of folder %s" % dstFolder)
             folder.copytree(dstFolder)
-            for svgFile in dstFolder.reMatchFind(r".*\.svg$"):
-                if not svgFile.suffix(".pdf").EXISTS:
-                    try:
-                        import cairosvg
-                        LOG.msg("convert %s to PDF" % svgFile)
-                        cairosvg.svg2pdf(url=svgFile, write_to=svgFile.suffix(".pdf"))
-                    except ImportError:
-                        LOG.error("missing cairosvg, can't convert %s to PDF" % svgFile)
-
-# ==============================================================================
-def getFileList():
+            folders.append(dstFolder)
+
+    svg2pdf(folders, mctx.svgPdfCache, jobs)
+
+# ==============================================================================
+def svg2pdf(folders, pdfCache, jobs=None):
+# ==============================================================================
+
+    u"""Convert the SVG files in ``folders`` (which have no PDF sibling) to PDF.
+
+    The PDF files are cached by the content hash of the SVG file in the folder
+    ``pdfCache``, a SVG is only rendered (cairosvg), if it is not yet in the
+    cache.  The SVG files are rendered by a pool of ``jobs`` worker processes
+    (default: number of CPUs)."""
+
+    todo = dict() # content hash --> PDF files
+    for folder in folders:
+        for svgFile in folder.reMatchFind(r".*\.svg$"):
+            pdfFile = svgFile.suffix(".pdf")
+            if not pdfFile.EXISTS:
+                todo.setdefault(fileHash(svgFile), []).append((svgFile, pdfFile))
+    if not todo:
+        return
+
+    pdfCache.makedirs()
+    render = []
+    for svgHash, fileList in todo.items():
+        cached = pdfCache / (svgHash + ".pdf")
+        if not cached.EXISTS:
+            render.append((fileList[0][0], cached))
+
+    if render:
+        try:
+            import cairosvg # pylint: disable=W0611
+        except (ImportError, OSError):
+            # OSError: the cairo library is missing
+            for svgFile, _cached in render:
+                LOG.error("missing cairosvg, can't convert %s to PDF" % svgFile)
+            render = []
+
+    if render:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+            for (svgFile, _cached), error in zip(render, pool.map(_renderSVG, render)):
+                if error:
+                    LOG.error("can't convert %s to PDF: %s" % (svgFile, error))
+                else:
+                    LOG.msg("convert %s to PDF" % svgFile)
+
+    for svgHash, fileList in todo.items():
+        cached = pdfCache / (svgHash + ".pdf")
+        if cached.EXISTS:
+            for _svgFile, pdfFile in fileList:
+                cached.copyfile(pdfFile)
+
+def _renderSVG(args):
+    # worker: render a SVG file to PDF (atomic write)
+    import cairosvg
+    svgFile, pdfFile = args
+    tmpFile = FSPath("%s.%s.tmp" % (pdfFile, os.getpid()))
+    try:
+        cairosvg.svg2pdf(url=svgFile, write_to=tmpFile)
+        os.replace(tmpFile, pdfFile)
+    except Exception as exc: # pylint: disable=W0703
+        if tmpFile.EXISTS:
+            tmpFile.delete()
+        return str(exc)
+    return None
+
+# ==============================================================================
+def planMedia(mctx):
+# ==============================================================================
+
+    u"""Plan the conversion of the *media* book (dry-run, see :py:mod:`dbxml2rst.plan`).
+
+    The entities are read into memory, a file is *current* if its copy in the
+    cache is identical to the origin and the reST file exists in the cache."""
+
+    ext_entities, _int_entities = loadMediaEntities(mctx, store=False)
+
+    book = Plan.newBook(
+        mctx.book.BASENAME, mctx.docbookRoot / "media_api.tmpl", mctx.cache)
+    resources = dict()
+    index     = None
+    for fname in sorted(getFileList(ext_entities)):
+        src    = mctx.docbookRoot / fname
+        cached = mctx.cache / fname.suffix(".xml_orig")
+        if not src.EXISTS:
+            LOG.warn("missing media file %s" % src)
+            continue
+        content = src.readFile()
+        Plan.addConversion(
+            book, fname.suffix(".xml"), src.SIZE
+            , cached.EXISTS
+            and (mctx.cache / fname.suffix(".rst")).EXISTS
+            and cached.readFile() == content )
+        for fileref in FILEREF_RE.findall(content):
+            fileref = FSPath(fileref).BASENAME
+            if fileref not in resources:
+                if index is None:
+                    index = resourceIndex(mctx.docbookRoot)
+                res = index.get(fileref)
+                resources[fileref] = Container(
+                    fname  = str(res or fileref)
+                    , size = res.SIZE if res is not None else None )
+    book.resources = list(resources.values())
+    return book
+
+FILEREF_RE = re.compile(r'''fileref\s*=\s*["']([^"']+)["']''')
+
+# ==============================================================================
+def getFileList(ext_entities):
 # ==============================================================================
 
     fileList = set((mainFile, ))
-    for val in MEDIA_EXT.values():
+    for val in ext_entities.values():
         fileList.add(FSPath(val))
     fileList.remove("media-entities.tmpl")
     fileList.remove("media-indices.tmpl")
@@ -149,7 +337,7 @@ def getFileList():
 
 
 # ==============================================================================
-def getMediaFilter():
+def getMediaFilter(mctx):
 # ==============================================================================
 
     id2TagMap = {}
@@ -172,7 +360,8 @@ def getMediaFilter():
         id2TagMap[ID] = "part"
 
     xmlFilter = XMLTag()
-    for hook in [hook_replaceTag(id2TagMap)
+    for hook in fuseHooks([
+                 hook_replaceTag(id2TagMap)
                  , hook_media_table2variablelist
                  , hook_media_table2variablelist_2
                  , hook_media_fix_misc
@@ -182,13 +371,15 @@ def getMediaFilter():
                  , hook_media_insert_src_headers
                  , hook_drop_usless_informaltables
                  , hook_flatten_tables()
-                 , hook_copy_file_resource(LINUX_DOCBOOK_ROOT) ]:
+                 , hook_copy_file_resource(mctx.docbookRoot) ]):
         xmlFilter.parseData.hooks.append(hook)
+    # the media hooks need the entities of the conversion
+    xmlFilter.parseData.media = mctx
     return xmlFilter
 
 
 # ==============================================================================
-def media_init_ENTITIES():
+def media_init_ENTITIES(mctx):
 # ==============================================================================
 
     """Reads *media* entities from a SGML files (ugly hack).
@@ -197,38 +388,64 @@ def media_init_ENTITIES():
 
     LOG.info("init *media* entities")
 
-    MEDIA_EXT.clear()
-    MEDIA_INT.clear()
-    addCharEntities(MEDIA_INT)
+    ext_entities, int_entities = loadMediaEntities(mctx)
+    mctx.ext.clear()
+    mctx.int.clear()
+    mctx.ext.update(ext_entities)
+    mctx.int.update(int_entities)
+
+    LOG.info("store entity-container: \n* externel: %s\n* internal: %s"
+        % (mctx.ext.pFile, mctx.int.pFile))
+    mctx.ext.writeToFile()
+    mctx.int.writeToFile()
+
+def loadMediaEntities(mctx, store=True):
+
+    u"""Returns the *media* entity tables ``(ext, int)``.
+
+    The tables are read from the ``entityTables`` cache, they are only
+    read from the SGML files (see :py:func:`readMediaEntities`) if one of the
+    files or the files in the media folder has been changed."""
+
+    def build():
+        ext_entities = EntityContainer(None)
+        int_entities = EntityContainer(None)
+        readMediaEntities(mctx.docbookRoot, ext_entities, int_entities)
+        return ext_entities, int_entities
+
+    key = sourceKey(
+        [mctx.docbookRoot / fname for fname in MEDIA_ENTITY_SOURCES]
+        , [mctx.docbookRoot / "media"] )
+    return EntityTables(mctx.entityTables / "media.json").get(key, build, store=store)
+
+def readMediaEntities(docbookRoot, ext_entities, int_entities):
+
+    u"""Reads the *media* entities from the SGML files (in ``docbookRoot``) into
+    the containers."""
+
+    addCharEntities(int_entities)
 
     # folder where the origin xml files should be in
-    o_folder = LINUX_DOCBOOK_ROOT / "media"
+    o_folder = docbookRoot / "media"
 
-    for entity_file in [ LINUX_DOCBOOK_ROOT / "media-entities.tmpl" ,
-                         LINUX_DOCBOOK_ROOT / "media-indices.tmpl" ,
-                         LINUX_DOCBOOK_ROOT / "media_api.tmpl" ]:
+    for entity_file in [ docbookRoot / fname for fname in MEDIA_ENTITY_SOURCES ]:
 
         with entity_file.openTextFile() as f:
             for line in f:
                 line = line.strip()
                 m = EXT_SUBSECT_RE.search(line)
                 if m:
-                    MEDIA_EXT.addNew(
-                        m.group("name"), findOriginXML(o_folder, m.group("filename")))
+                    ext_entities.addNew(
+                        m.group("name"), findOriginXML(docbookRoot, o_folder, m.group("filename")))
                     continue
                 m = EXT_FUNCTION_RE.search(line)
                 if m:
-                    MEDIA_EXT.addNew(
-                        m.group("name"), findOriginXML(o_folder, m.group("filename")))
+                    ext_entities.addNew(
+                        m.group("name"), findOriginXML(docbookRoot, o_folder, m.group("filename")))
                     continue
                 m = INT_ENTITY_RE.search(line)
                 if m:
-                    MEDIA_INT.addNew(m.group("name"), m.group("replacement"))
-
-    LOG.info("store entity-container: \n* externel: %s\n* internal: %s"
-        % (MEDIA_EXT.pFile, MEDIA_INT.pFile))
-    MEDIA_EXT.writeToFile()
-    MEDIA_INT.writeToFile()
+                    int_entities.addNew(m.group("name"), m.group("replacement"))
 
 
 # ==============================================================================
@@ -246,6 +463,7 @@ def hook_media_fix_misc(node, rstPrefix, parseData):
         headrow.insert(4,node.makeelement("entry"))
         headrow.insert(6,node.makeelement("entry"))
         headrow.insert(8,node.makeelement("entry"))
+        TableModel.invalidate(table)
     return node
 
 # ==============================================================================
@@ -326,10 +544,9 @@ def table2variablelist(node, rstPrefix, parseData):
     section = node.makeelement("section")
     section.append(XMLTag.copyNode(node.find("title")))
 
-    tgroup = node.find("tgroup")
-    tbody = tgroup.find("tbody")
+    model = TableModel.get(node)
 
-    tableRows = tbody.findall("row")
+    tableRows = list(model.bodyRows)
 
     varentry = None
     varlist  = node.makeelement("variablelist")
@@ -337,11 +554,11 @@ def table2variablelist(node, rstPrefix, parseData):
 
     while tableRows:
         row = tableRows.pop(0)
-        row_id = row.get("id")
-        entry1, entry2 = (row.findall("entry") + [None, None])[:2]
+        row_id = row.ID
+        entry1, entry2 = (row.entries + [None, None])[:2]
 
         if entry1 is None:
-            entrytbl = row.find("entrytbl")
+            entrytbl = row.entrytbl
             table    = XMLTag.copyNode(entrytbl, "table")
             table.attrib.clear()
             if row_id is not None:
@@ -380,6 +597,7 @@ def table2variablelist(node, rstPrefix, parseData):
             #SDK.CONSOLE()
             raise Exception("should never happen / markup seems inconsistent")
 
+    TableModel.invalidate(node)
     parent = node.getparent()
     parent.replace(node, section)
     section.set("id", ID)
@@ -391,10 +609,9 @@ def table2variablelist_3cols(node, rstPrefix, parseData):
     section = node.makeelement("section")
     section.append(XMLTag.copyNode(node.find("title")))
 
-    tgroup = node.find("tgroup")
-    tbody = tgroup.find("tbody")
+    model = TableModel.get(node)
 
-    tableRows = tbody.findall("row")
+    tableRows = list(model.bodyRows)
 
     varentry = None
     varlist  = node.makeelement("variablelist")
@@ -402,11 +619,11 @@ def table2variablelist_3cols(node, rstPrefix, parseData):
 
     while tableRows:
         row = tableRows.pop(0)
-        row_id = row.get("id")
-        entry1, entry2, entry3 = (row.findall("entry") + [None, None, None])[:3]
+        row_id = row.ID
+        entry1, entry2, entry3 = (row.entries + [None, None, None])[:3]
 
         if entry3 is None:
-            entrytbl = row.find("entrytbl")
+            entrytbl = row.entrytbl
             table    = XMLTag.copyNode(entrytbl, "table")
             if row_id is not None:
                 table.set("id", row_id)
@@ -447,6 +664,7 @@ def table2variablelist_3cols(node, rstPrefix, parseData):
             #SDK.CONSOLE()
             raise Exception("should never happen / markup seems inconsistent")
 
+    TableModel.invalidate(node)
     parent = node.getparent()
     parent.replace(node, section)
     section.set("id", ID)
@@ -484,9 +702,8 @@ def table2variablelist_2(node, rstPrefix, parseData):
     section.append(XMLTag.copyNode(node.find("title")))
     node.addprevious(section)
 
-    tgroup = node.find("tgroup")
-    tbody = tgroup.find("tbody")
-    tableRows = tbody.findall("row")
+    model = TableModel.get(node)
+    tableRows = list(model.bodyRows)
 
     varentry = None
     varlist  = node.makeelement("variablelist")
@@ -494,7 +711,7 @@ def table2variablelist_2(node, rstPrefix, parseData):
 
     while tableRows:
         row = tableRows.pop(0)
-        entry1, entry2, entry3 = (row.findall("entry") + [None, None, None])[:3]
+        entry1, entry2, entry3 = (row.entries + [None, None, None])[:3]
 
         if entry3 is not None and XMLTag.getStripedText(entry1):
             varentry = node.makeelement("varlistentry")
@@ -525,6 +742,7 @@ def table2variablelist_2(node, rstPrefix, parseData):
             #SDK.CONSOLE()
             raise Exception("should never happen / markup seems inconsistent")
 
+    TableModel.invalidate(node)
     parent = node.getparent()
     parent.remove(node)
 
@@ -540,9 +758,7 @@ def hook_media_insert_src_headers(node, rstPrefix, parseData):
         title = "file: %s" % parseData.fname.SKIPSUFFIX
         title = ("\n" + title
                  + "\n" + ("=" * len(title)))
-        new      = XMLTag.getInjBlockTag()
-        new.text += title
-        node.insert(0, new)
+        node.insert(0, XMLTag.getInjBlockTag(title))
         return childs[0]
     return node
 
@@ -580,8 +796,8 @@ def hook_media_create_chunks(node, rstPrefix, parseData):
                 elem
                 , parseData.folder
                 , ext_entity.suffix(parseData.fname.SUFFIX))
-            MEDIA_EXT.addNew(ID, ext_entity)
-            MEDIA_EXT.writeToFile()
+            parseData.media.ext.addNew(ID, ext_entity)
+            parseData.media.ext.writeToFile()
 
     return node
 
@@ -630,8 +846,8 @@ def hook_media_handle_subsec(node, rstPrefix, parseData):
             newNode
             , parseData.folder
             , ext_entity.suffix(parseData.fname.SUFFIX))
-        MEDIA_EXT.addNew("chunk_" + ID, ext_entity)
-        MEDIA_EXT.writeToFile()
+        parseData.media.ext.addNew("chunk_" + ID, ext_entity)
+        parseData.media.ext.writeToFile()
 
     return node
 
@@ -643,23 +859,23 @@ def addCharEntities(container):
     container.addNew("nbsp", r" ")
     for x in ["frac12", "frac13", "frac14", "times", "copy", "hellip", "le", "ge"
               , "sub", "sup", "micro", "plusmn", "mdash", "alpha" ]:
-        container.addNew(x, HTMLParser().unescape("&%s;" % x))
+        container.addNew(x, html.unescape("&%s;" % x))
 
 
 # ==============================================================================
-def findOriginXML(locateFolder, fname):
+def findOriginXML(docbookRoot, locateFolder, fname):
 # ==============================================================================
 
     """Find XML file (origin) realtive to *locateFolder*
 
-    If the xml file is not found within the *locateFolder*, the basename of
-    *fname* is returned.
+    The path of the origin is relative to the *docbookRoot*. If the xml file is
+    not found within the *locateFolder*, the basename of *fname* is returned.
     """
 
     fname = FSPath(fname)
     orig = next(locateFolder.reMatchFind(fname.BASENAME), None)
     if orig:
-        orig = orig.relpath(LINUX_DOCBOOK_ROOT)
+        orig = orig.relpath(docbookRoot)
     else:
         orig = fname.BASENAME
     #LOG.info(orig)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    common
+    ~~~~~~
+
+    Helpers shared by the dbxml2rst unit tests.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import importlib.util
+import importlib.machinery
+
+from fspath import FSPath
+
+TEST_FOLDER = os.path.dirname(os.path.abspath(__file__))
+ROOT_FOLDER = os.path.dirname(TEST_FOLDER)
+FIXTURES    = os.path.join(TEST_FOLDER, "fixtures")
+FAKE_BIN    = os.path.join(FIXTURES, "bin")
+FAKE_PANDOC = os.path.join(FAKE_BIN, "pandoc")
+LINUX_TREE  = os.path.join(FIXTURES, "linux")
+DOCBOOK     = os.path.join(LINUX_TREE, "Documentation", "DocBook")
+
+# the tests convert with the stand-in of pandoc (fixtures/bin/pandoc)
+os.environ["PATH"] = FAKE_BIN + os.pathsep + os.environ.get("PATH", "")
+
+if ROOT_FOLDER not in sys.path:
+    sys.path.insert(0, ROOT_FOLDER)
+
+# ==============================================================================
+def tempFolder(prefix="dbxml2rst-"):
+# ==============================================================================
+
+    u"""Returns a new temporary folder below ``$TEST_TEMPDIR`` (if set)."""
+
+    base = os.environ.get("TEST_TEMPDIR")
+    if base:
+        os.makedirs(base, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=base)
+
+# ==============================================================================
+def removeFolder(folder):
+# ==============================================================================
+
+    shutil.rmtree(folder, ignore_errors=True)
+
+# ==============================================================================
+def loadScript(name="linux-db2rst"):
+# ==============================================================================
+
+    u"""Loads the command line script ``name`` (no ``.py`` suffix) as module."""
+
+    modName = name.replace("-", "_")
+    loader  = importlib.machinery.SourceFileLoader(
+        modName, os.path.join(ROOT_FOLDER, name))
+    spec    = importlib.util.spec_from_loader(modName, loader)
+    module  = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+# ==============================================================================
+def runScript(script, cache, *argv):
+# ==============================================================================
+
+    u"""Runs ``main()`` of the ``script`` module (see :py:func:`loadScript`) with
+    the cache folder ``cache``, returns the exit code."""
+
+    script.CACHE         = FSPath(cache)
+    script.DAEMON_SOCKET = script.CACHE / "db2rst.sock"
+    try:
+        script.main(list(argv))
+    except SystemExit as exc:
+        return exc.code
+    return 0
+
+# ==============================================================================
+def writeFile(fname, content):
+# ==============================================================================
+
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(fname, mode) as out:
+        out.write(content)
+    return fname
+
+# ==============================================================================
+def readFile(fname):
+# ==============================================================================
+
+    with open(fname) as inp:
+        return inp.read()
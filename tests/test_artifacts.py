@@ -0,0 +1,75 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_artifacts
+    ~~~~~~~~~~~~~~
+
+    The artifact stores (:py:mod:`dbxml2rst.artifacts`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from common import tempFolder, removeFolder, readFile
+
+from dbxml2rst.artifacts import DiskStore, MemoryStore
+
+def test_open_write():
+    tmp = tempFolder()
+    try:
+        for store in (DiskStore(tmp), MemoryStore(tmp)):
+            with store.openWrite("out.xml") as out:
+                out.write(u"<a>ä".encode("utf-8"))
+                out.write(b"</a>")
+            assert store.read("out.xml") == u"<a>ä</a>"
+            assert store.size("out.xml") == 9
+        # the memory store writes to the disk only on spill
+        store = MemoryStore(tmp)
+        with store.openWrite("mem.xml") as out:
+            out.write(b"<b/>")
+        assert not os.path.exists(os.path.join(tmp, "mem.xml"))
+        assert readFile(store.spill("mem.xml")) == u"<b/>"
+    finally:
+        removeFolder(tmp)
+
+def test_memory_store():
+    tmp = tempFolder()
+    try:
+        store = MemoryStore(tmp)
+        store.write("a/index.xml", u"<a/>")
+        store.write("a/./intro.xml", b"<b/>")
+        assert store.exists("a/intro.xml")
+        assert sorted(store.names(r".*\.xml$")) == ["a/index.xml", "a/intro.xml"]
+        assert not os.path.exists(os.path.join(tmp, "a"))
+        store.append("a/index.xml", u"ä")
+        assert store.read("a/index.xml") == u"<a/>ä"
+        store.discard("a/intro.xml")
+        assert not store.exists("a/intro.xml")
+
+        # artifacts which are not in the memory are read from the disk
+        os.makedirs(os.path.join(tmp, "b"))
+        DiskStore(tmp).write("b/disk.xml", u"<disk/>")
+        assert store.read("b/disk.xml") == u"<disk/>"
+        assert store.size("b/disk.xml") == 7
+
+        # debug: every artifact is written to the disk
+        MemoryStore(tmp, spill=True).write("b/spilled.xml", u"<s/>")
+        assert readFile(os.path.join(tmp, "b", "spilled.xml")) == u"<s/>"
+    finally:
+        removeFolder(tmp)
+
+def test_disk_store():
+    tmp = tempFolder()
+    try:
+        store = DiskStore(tmp)
+        store.write("index.xml", u"<a>")
+        store.append("index.xml", u"</a>")
+        assert readFile(os.path.join(tmp, "index.xml")) == u"<a></a>"
+        assert store.names(r"index\..*") == ["index.xml"]
+        assert store.spill("index.xml") == os.path.join(tmp, "index.xml")
+        store.discard("index.xml")
+        assert store.exists("index.xml")
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_astcache
+    ~~~~~~~~~~~~~
+
+    The cache of the pandoc JSON AST of the chunks (:py:mod:`dbxml2rst.astcache`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from common import (
+    tempFolder, removeFolder, writeFile, readFile, loadScript, runScript, LINUX_TREE )
+
+from dbxml2rst.astcache import ASTCache
+from dbxml2rst.nodes import XMLTag
+
+def _filter(ast):
+    return ast
+
+def test_key():
+    tmp = tempFolder()
+    try:
+        exe = os.path.join(tmp, "pandoc")
+        writeFile(exe, "v1")
+        cache = ASTCache(os.path.join(tmp, "json-ast"))
+        key   = cache.key("<para/>", exe, XMLTag.pandocFilter)
+        assert key == ASTCache(cache.folder).key("<para/>", exe, XMLTag.pandocFilter)
+        assert key != cache.key("<para>x</para>", exe, XMLTag.pandocFilter)
+        assert key != cache.key("<para/>", exe, XMLTag.pandocFilter, _filter)
+        assert key != cache.key("<para/>", None, XMLTag.pandocFilter)
+        # a new pandoc executable
+        writeFile(exe, "v2 ..")
+        assert key != ASTCache(cache.folder).key("<para/>", exe, XMLTag.pandocFilter)
+    finally:
+        removeFolder(tmp)
+
+def test_load_store():
+    tmp = tempFolder()
+    try:
+        cache = ASTCache(os.path.join(tmp, "json-ast"))
+        key   = cache.key(u"<para>ä</para>", None)
+        assert cache.load(key) is None
+        cache.store(key, u'{"blocks": ["ä"]}')
+        assert cache.load(key) == u'{"blocks": ["ä"]}'
+        assert os.listdir(os.path.join(tmp, "json-ast", key[:2])) == [key + ".json.gz"]
+        writeFile(cache.fname(key), b"broken")
+        assert cache.load(key) is None
+    finally:
+        removeFolder(tmp)
+
+def _db2rst(tmp, name, *argv):
+    out = os.path.join(tmp, name)
+    log = os.path.join(tmp, name + ".log")
+    os.environ["FAKE_PANDOC_LOG"] = log
+    try:
+        code = runScript(loadScript(), os.path.join(tmp, "cache")
+                         , "--quiet", "--out-folder", out, *(argv + ("db2rst", LINUX_TREE, "tiny.tmpl")))
+    finally:
+        del os.environ["FAKE_PANDOC_LOG"]
+    assert code == 0
+    rst = dict()
+    for folder, _dirs, files in os.walk(out):
+        for fname in files:
+            rst[os.path.relpath(os.path.join(folder, fname), out)] = readFile(
+                os.path.join(folder, fname))
+    return [l for l in readFile(log).splitlines() if "docbook" in l], rst
+
+def test_cached_conversion():
+    tmp = tempFolder()
+    try:
+        runs1, rst1 = _db2rst(tmp, "out1", "--ast-cache")
+        runs2, rst2 = _db2rst(tmp, "out2", "--ast-cache")
+        assert runs1
+        # the second run takes the AST of all chunks from the cache
+        assert runs2 == []
+        assert rst1 and rst1 == rst2
+        assert os.path.isdir(os.path.join(tmp, "cache", "json-ast"))
+    finally:
+        removeFolder(tmp)
+
+def test_opt_in():
+    tmp = tempFolder()
+    try:
+        runs1, rst1 = _db2rst(tmp, "out1")
+        runs2, rst2 = _db2rst(tmp, "out2")
+        assert runs1 and runs1 == runs2
+        assert rst1 == rst2
+        assert not os.path.exists(os.path.join(tmp, "cache", "json-ast"))
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_cli
+    ~~~~~~~~
+
+    The command line options of ``linux-db2rst``.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import io
+import os
+import argparse
+
+from common import tempFolder, removeFolder, loadScript, runScript, LINUX_TREE
+
+from dbxml2rst.helper import currentContext, useContext
+
+def test_job_count():
+    script = loadScript()
+    assert script.jobCount("3") == 3
+    assert script.jobCount("0") == (os.cpu_count() or 1)
+    for value in ("-1", "x", "1.5"):
+        try:
+            script.jobCount(value)
+        except argparse.ArgumentTypeError:
+            continue
+        raise AssertionError("jobCount(%r) has to fail" % value)
+
+def test_invalid_jobs():
+    tmp = tempFolder()
+    err = io.StringIO()
+    try:
+        with useContext(currentContext().derive(appl_out=io.StringIO(), log_out=err)):
+            for opt in ("--jobs", "--pandoc-jobs"):
+                code = runScript(loadScript(), os.path.join(tmp, "cache")
+                                 , opt, "-2", "db2rst", LINUX_TREE, "tiny.tmpl")
+                assert code == 2
+                assert "argument %s: -2 is negative" % opt in err.getvalue()
+        assert not os.path.exists(os.path.join(tmp, "cache"))
+    finally:
+        removeFolder(tmp)
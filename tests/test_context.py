@@ -0,0 +1,139 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_context
+    ~~~~~~~~~~~~
+
+    The conversion context (:py:class:`dbxml2rst.helper.ConversionContext`), the
+    state of a conversion is hold by the context, not by module globals.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import io
+import os
+import threading
+
+from common import tempFolder, removeFolder, writeFile
+
+from dbxml2rst.helper import (
+    CLI, LOG, ProfileCapture, DEFAULT_CONTEXT, currentContext, useContext )
+from dbxml2rst.nodes import XMLTag, TableModel, filterXML
+from dbxml2rst.timing import WalkStats
+
+DOC = u"""<article>
+<para>one <emphasis>two</emphasis></para>
+<informaltable><tgroup cols="2"><tbody>
+<row><entry>a</entry><entry>b</entry></row>
+</tbody></tgroup></informaltable>
+</article>
+"""
+
+class _TableHook(object):
+    u"""Root hook which records the models of the tables it sees."""
+
+    def __init__(self):
+        self.models = []
+
+    def __call__(self, node, rstPrefix, parseData):   # pylint: disable=W0613
+        if node.tag == "informaltable":
+            self.models.append((TableModel.get(node), TableModel.get(node)
+                                , currentContext().tableModels))
+        return node
+
+def _filter(folder, name):
+    writeFile(os.path.join(folder, name + ".xml_entity"), DOC)
+    xmlFilter = XMLTag()
+    hook = _TableHook()
+    xmlFilter.parseData.hooks.append(hook)
+    filterXML(folder, name + ".xml_entity", name + ".xml", xmlFilter)
+    return hook
+
+def test_derive():
+    ctx = DEFAULT_CONTEXT.derive(quiet=True)
+    assert ctx.quiet and not DEFAULT_CONTEXT.quiet
+    assert currentContext() is DEFAULT_CONTEXT
+    with useContext(ctx):
+        assert currentContext() is ctx
+        with useContext(ctx.derive(verbose=True)) as inner:
+            assert currentContext() is inner and inner.quiet
+        assert currentContext() is ctx
+    assert currentContext() is DEFAULT_CONTEXT
+
+def test_log_streams():
+    out = io.StringIO()
+    err = io.StringIO()
+    with useContext(currentContext().derive(appl_out=out, log_out=err, verbose=True)):
+        LOG.msg("message")
+        LOG.info("info")
+    assert out.getvalue() == "message\n"
+    assert err.getvalue() == "INFO: info\n"
+
+def test_table_models_per_document():
+    tmp = tempFolder()
+    try:
+        hook = _filter(tmp, "a")
+        (model, again, models), = hook.models
+        assert model is again and models is not None
+        hook2 = _filter(tmp, "b")
+        assert hook2.models[0][2] is not models
+        # the models are dropped with the document
+        assert currentContext().tableModels is None
+        assert not models
+    finally:
+        removeFolder(tmp)
+
+def test_walk_stats_of_the_context():
+    tmp   = tempFolder()
+    stats = dict()
+    def run(name):
+        stats[name] = WalkStats()
+        with useContext(currentContext().derive(walkStats=stats[name])):
+            for _i in range(5):
+                _filter(tmp, name)
+    try:
+        threads = [threading.Thread(target=run, args=(n,)) for n in ("x", "y")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # a thread without walk statistics
+        _filter(tmp, "z")
+        for name in ("x", "y"):
+            assert list(stats[name].files) == ["%s.xml_entity" % name]
+            assert stats[name].files["%s.xml_entity" % name].nodes["informaltable"] == 5
+    finally:
+        removeFolder(tmp)
+
+def test_profile_out_of_the_context():
+    tmp = tempFolder()
+    try:
+        with ProfileCapture("none"):
+            pass
+        with useContext(currentContext().derive(profileOut=tmp)):
+            with ProfileCapture("outer"):
+                with ProfileCapture("inner"):
+                    sum(range(1000))
+        assert sorted(os.listdir(tmp)) == ["inner.pstats", "outer.pstats"]
+    finally:
+        removeFolder(tmp)
+
+def test_cli_streams():
+    out = io.StringIO()
+    err = io.StringIO()
+
+    def cmd(cliArgs):                                   # pylint: disable=W0613
+        u"""test command"""
+        raise ValueError("cmd failed")
+
+    cli = CLI(cmdFunc=cmd)
+    with useContext(currentContext().derive(appl_out=out, log_out=err)):
+        for argv, code in ((["--help"], 0), (["--unknown"], 2), ([], 42)):
+            try:
+                cli(argv)
+            except SystemExit as exc:
+                assert exc.code == code
+    assert "test command" in out.getvalue()
+    assert "unrecognized arguments: --unknown" in err.getvalue()
+    assert "FATAL ERROR: cmd failed" in err.getvalue()
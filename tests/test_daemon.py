@@ -0,0 +1,115 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_daemon
+    ~~~~~~~~~~~
+
+    The conversion daemon and its client, :py:mod:`dbxml2rst.daemon`
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import sys
+import json
+import threading
+import contextlib
+import subprocess
+
+from common import tempFolder, removeFolder, loadScript, LINUX_TREE, ROOT_FOLDER
+
+from fspath import FSPath
+from dbxml2rst.helper import currentContext
+from dbxml2rst.daemon import DaemonServer
+
+@contextlib.contextmanager
+def _daemon(runCommand):
+    tmp    = tempFolder()
+    sock   = os.path.join(tmp, "d.sock")
+    server = DaemonServer(sock, runCommand)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield sock
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        removeFolder(tmp)
+
+CLIENT = """
+import sys, json
+sys.path.insert(0, %r)
+from dbxml2rst.daemon import request
+sys.exit(request(sys.argv[1], json.loads(sys.argv[2]), sys.argv[3] or None))
+""" % ROOT_FOLDER
+
+def _request(sock, argv, cwd=None):
+    u"""Runs the client :py:func:`request` in its own process."""
+    proc = subprocess.run(
+        [sys.executable, "-c", CLIENT, sock, json.dumps(argv), cwd or ""]
+        , stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        , universal_newlines=True, check=False)
+    return proc.returncode, proc.stdout, proc.stderr
+
+def _echo(argv):
+    ctx = currentContext()
+    ctx.appl_out.write("out: %s\n" % " ".join(argv))
+    ctx.log_out.write("err: %s\n" % os.getcwd())
+    if argv and argv[0] == "fail":
+        raise ValueError("failed")
+    sys.exit(int(argv[0]) if argv else 0)
+
+def test_protocol():
+    with _daemon(_echo) as sock:
+        cwd = os.path.dirname(sock)
+        code, out, err = _request(sock, ["3", "a b"], cwd)
+        assert code == 3
+        assert out == "out: 3 a b\n"
+        assert err == "err: %s\n" % cwd
+        # the daemon keeps its working directory
+        assert os.getcwd() != cwd
+
+        code, out, err = _request(sock, ["fail"])
+        assert code == 42
+        assert "ValueError: failed" in err
+        # the daemon still serves
+        assert _request(sock, [])[0] == 0
+
+def test_streams_of_the_daemon():
+    streams = []
+    def runCommand(argv):
+        streams.append((sys.stdout, sys.stderr))
+        _echo(argv)
+    prev = sys.stdout, sys.stderr
+    with _daemon(runCommand) as sock:
+        assert _request(sock, ["0"])[1] == "out: 0\n"
+    # the output is send by the context, sys.stdout and sys.stderr are not changed
+    assert streams == [prev]
+
+def test_help_to_the_client():
+    script = loadScript()
+    with _daemon(script.main) as sock:
+        code, out, _err = _request(sock, ["db2rst", "--help"])
+        assert code == 0
+        assert "usage:" in out and "db2rst" in out
+        code, _out, err = _request(sock, ["--jobs", "x", "db2rst"])
+        assert code == 2
+        assert "invalid" in err
+
+def test_failed_request_closes_context():
+    script = loadScript()
+    tmp    = tempFolder()
+    script.CACHE = FSPath(tmp)
+    try:
+        with _daemon(script.main) as sock:
+            code, _out, err = _request(sock, [
+                "--progress", "--walk-stats", os.path.join(tmp, "walk.json")
+                , "--out-folder", os.path.join(tmp, "out")
+                , "db2rst", LINUX_TREE, "missing.tmpl"])
+        assert code == 42
+        assert "FATAL ERROR" in err
+        assert not [t for t in threading.enumerate() if t.name == "progress"]
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_emitter
+    ~~~~~~~~~~~~
+
+    The buffer which builds the injected reST markup
+    (:py:class:`dbxml2rst.nodes.RSTEmitter`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+from lxml import etree
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.nodes import XMLTag, RSTEmitter, Context
+
+def test_write():
+    rst = RSTEmitter("\n.. _%(ID)s:\n")
+    assert rst.write("a", "b").write("c") is rst
+    assert rst.getValue() == "\n.. _%(ID)s:\nabc"
+    assert rst.getValue(Context(ID="x")) == "\n.. _x:\nabc"
+
+def test_write_block():
+    text = "\n\nint a;   \n\n  if (a)\n\treturn;\n\n"
+    rst  = RSTEmitter().writeBlock("    ", text).getValue()
+    assert rst == "\n    int a;\n\n      if (a)\n    \treturn;\n\n\n"
+    assert XMLTag.blockText("    ", text) == rst
+
+def test_literal_block():
+    root = etree.fromstring(
+        u'<article><programlisting id="l1">int main(void)\n{\n  return 0;  \n}\n'
+        u'</programlisting></article>')
+    XMLTag().walk(root)
+    # same markup as the string concatenation gave
+    assert "".join(root.itertext()) == (
+        "!ri!\n.. _l1:\n.. code-block:: c\n"
+        "\n    int main(void)\n    {\n      return 0;\n    }\n\n\n")
@@ -0,0 +1,75 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_entities
+    ~~~~~~~~~~~~~
+
+    The persisted entity tables (:py:mod:`dbxml2rst.entities`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from fspath import FSPath
+from common import tempFolder, removeFolder, writeFile
+
+from dbxml2rst.entities import EntityTables, sourceKey
+
+def _sources(tmp):
+    src = os.path.join(tmp, "entities.tmpl")
+    writeFile(src, '<!ENTITY foo SYSTEM "foo.xml">')
+    writeFile(os.path.join(tmp, "media", "foo.xml"), "<para/>")
+    return [src], [os.path.join(tmp, "media")]
+
+def test_source_key():
+    tmp = tempFolder()
+    try:
+        sources, folders = _sources(tmp)
+        key = sourceKey(sources, folders)
+        assert key == sourceKey(sources, folders)
+        # the content of the file in the folder does not matter ..
+        writeFile(os.path.join(folders[0], "foo.xml"), "<para>changed</para>")
+        assert key == sourceKey(sources, folders)
+        # .. a new file name does
+        writeFile(os.path.join(folders[0], "sub", "bar.xml"), "<para/>")
+        key2 = sourceKey(sources, folders)
+        assert key2 != key
+        writeFile(sources[0], '<!ENTITY foo SYSTEM "bar.xml">')
+        assert sourceKey(sources, folders) not in (key, key2)
+        assert sourceKey([os.path.join(tmp, "missing")]) != sourceKey()
+    finally:
+        removeFolder(tmp)
+
+def test_entity_tables():
+    tmp    = tempFolder()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"foo" : "foo.xml"}, {"nbsp" : u" "}
+
+    try:
+        fname  = FSPath(os.path.join(tmp, "entities", "media.json"))
+        tables = EntityTables(fname)
+        assert tables.get("k1", build) == ({"foo" : "foo.xml"}, {"nbsp" : u" "})
+        assert tables.get("k1", build) == ({"foo" : "foo.xml"}, {"nbsp" : u" "})
+        assert len(builds) == 1
+        # shared by other instances (runs)
+        assert EntityTables(fname).load("k1") is not None
+        # other key: build again
+        tables.get("k2", build)
+        assert len(builds) == 2
+        assert tables.load("k1") is None
+
+        tables.get("k3", build, store=False)
+        assert len(builds) == 3 and tables.load("k3") is None
+
+        writeFile(fname, "{broken")
+        assert tables.load("k2") is None
+        tables.get("k2", build)
+        assert len(builds) == 4 and tables.load("k2") is not None
+        assert os.listdir(os.path.dirname(fname)) == ["media.json"]
+    finally:
+        removeFolder(tmp)
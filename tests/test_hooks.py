@@ -0,0 +1,69 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_hooks
+    ~~~~~~~~~~
+
+    The root hooks and the fused root hooks (:py:mod:`dbxml2rst.hooks`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+from lxml import etree
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.helper import currentContext, useContext
+from dbxml2rst.nodes import XMLTag
+from dbxml2rst.hooks import RootHook, FusedRootHooks, rootHook, fuseHooks
+from dbxml2rst.timing import WalkStats
+
+DOC = u"""<doc><a id="1"/><b/><a/><c id="2"/></doc>"""
+
+def _hooks(calls):
+
+    @rootHook(tags=("a",))
+    def hookA(node, index, parseData):  # pylint: disable=W0613
+        calls.append(("A", len(index.select("a"))))
+
+    @rootHook(attrs=("id",))
+    def hookB(node, index, parseData):  # pylint: disable=W0613
+        calls.append(("B", len(index.selectAttr("id"))))
+
+    return hookA, hookB
+
+def _plain(node, rstPrefix, parseData):  # pylint: disable=W0613
+    return node
+
+def test_fuse_hooks():
+    hookA, hookB = _hooks([])
+    fused = fuseHooks([hookA, hookB, _plain, hookA])
+    assert len(fused) == 3
+    assert isinstance(fused[0], FusedRootHooks)
+    assert fused[0].hooks == [hookA, hookB]
+    assert fused[1] is _plain
+    assert isinstance(fused[2], RootHook)
+
+def test_fused_hooks_run_on_the_root():
+    calls     = []
+    xmlFilter = XMLTag()
+    xmlFilter.parseData.hooks.extend(fuseHooks(_hooks(calls)))
+    xmlFilter.walk(etree.fromstring(DOC))
+    assert calls == [("A", 2), ("B", 2)]
+
+def test_fused_hooks_in_the_walk_stats():
+    calls     = []
+    stats     = WalkStats()
+    hookA, hookB = _hooks(calls)
+    fused     = FusedRootHooks([hookA, hookB])
+    xmlFilter = XMLTag()
+    xmlFilter.parseData.hooks.append(fused)
+    with useContext(currentContext().derive(walkStats=stats)):
+        xmlFilter.walk(etree.fromstring(DOC))
+    hooks = stats.getFile(None).hooks
+    # the fused hook is called on every node, the inner hooks once
+    assert hooks[fused.__qualname__].calls == 5
+    assert hooks[hookA.__qualname__].calls == 1
+    assert hooks[hookB.__qualname__].calls == 1
+    assert hooks[hookA.__qualname__].time <= hooks[fused.__qualname__].time
@@ -0,0 +1,31 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_import_budget
+    ~~~~~~~~~~~~~~~~~~
+
+    The import-time budget of ``linux-db2rst --help`` (utils/import_budget.py).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import sys
+
+from common import ROOT_FOLDER
+
+sys.path.insert(0, os.path.join(ROOT_FOLDER, "utils"))
+import import_budget  # pylint: disable=C0413
+
+def test_help_imports_no_heavy_modules():
+    times = import_budget.importTimes(["--help"])
+    assert times
+    heavy = [m for (m, _t, _l) in times
+             if m in import_budget.HEAVY or m.split(".")[0] in import_budget.HEAVY]
+    assert heavy == [], heavy
+
+def test_help_within_budget():
+    times = import_budget.importTimes(["--help"])
+    total = sum([t for (_m, t, level) in times if level == 0]) / 1000.0
+    assert total <= import_budget.BUDGET, "%.1f ms > %s ms" % (total, import_budget.BUDGET)
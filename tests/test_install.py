@@ -0,0 +1,76 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_install
+    ~~~~~~~~~~~~
+
+    The diff-based install of the converted books
+    (:py:class:`dbxml2rst.install.SyncInstall`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from common import tempFolder, removeFolder, writeFile, readFile
+
+from dbxml2rst.install import SyncInstall, exchangeFolders, sameContent
+
+def _install(src, dst, files):
+    installer = SyncInstall(dst)
+    for name, content in files.items():
+        writeFile(os.path.join(src, name), content)
+        installer.addFile(os.path.join(src, name), name)
+    return installer.commit()
+
+def _mtime(folder, name):
+    return os.stat(os.path.join(folder, name)).st_mtime_ns
+
+def test_sync_install():
+    tmp = tempFolder()
+    src = os.path.join(tmp, "src")
+    dst = os.path.join(tmp, "out", "book")
+    try:
+        stats = _install(src, dst, {"index.rst" : "a", "sub/b.rst" : "b", "c.rst" : "c"})
+        assert (stats.new, stats.changed, stats.unchanged, stats.removed) == (3, 0, 0, 0)
+        writeFile(os.path.join(dst, "conf.py"), "# conf")
+        os.utime(os.path.join(dst, "index.rst"), ns=(0, 0))
+        os.utime(os.path.join(dst, "sub", "b.rst"), ns=(0, 0))
+
+        stats = _install(src, dst, {"index.rst" : "a", "sub/b.rst" : "B", "d.rst" : "d"})
+        assert (stats.new, stats.changed, stats.unchanged, stats.removed) == (1, 1, 1, 1)
+        assert sorted(os.listdir(dst)) == ["conf.py", "d.rst", "index.rst", "sub"]
+        # unchanged files keep their mtime, the conf.py is kept
+        assert _mtime(dst, "index.rst") == 0
+        assert _mtime(dst, "sub/b.rst") != 0
+        assert readFile(os.path.join(dst, "sub", "b.rst")) == "B"
+        assert readFile(os.path.join(dst, "conf.py")) == "# conf"
+        assert not os.path.exists(dst + ".install-new")
+    finally:
+        removeFolder(tmp)
+
+def test_exchange_folders():
+    tmp = tempFolder()
+    try:
+        a, b = os.path.join(tmp, "a"), os.path.join(tmp, "b")
+        writeFile(os.path.join(a, "x"), "a")
+        writeFile(os.path.join(b, "x"), "b")
+        exchangeFolders(a, b)
+        assert readFile(os.path.join(a, "x")) == "b"
+        assert readFile(os.path.join(b, "x")) == "a"
+        assert sorted(os.listdir(tmp)) == ["a", "b"]
+    finally:
+        removeFolder(tmp)
+
+def test_same_content():
+    tmp = tempFolder()
+    try:
+        for name, content in (("a", "xy"), ("b", "xy"), ("c", "xz"), ("d", "xyz")):
+            writeFile(os.path.join(tmp, name), content)
+        assert sameContent(os.path.join(tmp, "a"), os.path.join(tmp, "b"))
+        assert not sameContent(os.path.join(tmp, "a"), os.path.join(tmp, "c"))
+        assert not sameContent(os.path.join(tmp, "a"), os.path.join(tmp, "d"))
+        assert not sameContent(os.path.join(tmp, "a"), os.path.join(tmp, "missing"))
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_media
+    ~~~~~~~~~~
+
+    The entity substitution of the *media* book by a pool of worker processes
+    (``media.mediaSubEntities``).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from fspath import FSPath
+from common import tempFolder, removeFolder, writeFile, readFile
+
+import media
+from dbxml2rst.helper import Container
+from dbxml2rst.nodes import subEntities
+
+EXT = {"sub" : "v4l/sub.xml_entity"}
+INT = {"version" : "4.10", "nbsp" : u" "}
+
+def _mctx(tmp, files):
+    cache = FSPath(os.path.join(tmp, "cache"))
+    for i, fname in enumerate(files):
+        writeFile(cache / fname.suffix(".xml_orig")
+                  , u"<para id='%d'>&version;&nbsp;* &sub;\n&unknown;</para>\n" % i)
+    return Container(cache=cache, ext=EXT, int=INT)
+
+def test_parallel_sub_entities():
+    tmp   = tempFolder()
+    files = [FSPath("v4l/f%02d.xml" % i) for i in range(12)]
+    try:
+        mctx = _mctx(tmp, files)
+        media.mediaSubEntities(mctx, files, jobs=3)
+        for fname in files:
+            orig     = mctx.cache / fname.suffix(".xml_orig")
+            expected = FSPath(os.path.join(tmp, "expected.xml"))
+            subEntities(orig, expected, EXT, INT)
+            assert readFile(mctx.cache / fname.suffix(".xml_entity")) == readFile(expected)
+        assert "<rstInclude fname='v4l/sub.xml_entity'/>" in readFile(
+            mctx.cache / "v4l/f00.xml_entity")
+        assert not [name for name in os.listdir(mctx.cache / "v4l") if name.endswith(".tmp")]
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_pandoc
+    ~~~~~~~~~~~
+
+    The pandoc backends (subprocess and server) and the JSON filters,
+    :py:mod:`dbxml2rst.pandoc`
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import json
+import asyncio
+import threading
+
+from common import tempFolder, removeFolder, readFile, FAKE_BIN
+
+from fspath import FSPath
+from dbxml2rst import pandoc
+from dbxml2rst.helper import currentContext, useContext
+from dbxml2rst.nodes import XMLTag
+
+XML = u"<article><para>hello pandoc</para></article>"
+
+def _injected(new):
+    block = {"t": "CodeBlock", "c": [["", [], []], XMLTag.rstInjection_sig + ".. injected"]}
+    if new:
+        return {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [block]}
+    return [{"unMeta": {}}, [block]]
+
+def test_filter_new_ast():
+    doc = json.loads(pandoc.jsonFilterText(json.dumps(_injected(True)), XMLTag.pandocFilter))
+    assert doc["pandoc-api-version"] == [1, 23]
+    assert doc["blocks"] == [{"t": "Plain", "c": [{"t": "Str", "c": ".. injected"}]}]
+
+def test_filter_old_ast():
+    doc = json.loads(pandoc.jsonFilterText(json.dumps(_injected(False)), XMLTag.pandocFilter))
+    assert doc[1] == [{"t": "Plain", "c": [{"t": "Str", "c": ".. injected"}]}]
+
+def test_pandoc_args():
+    assert pandoc.pandocArgs({"from": "json", "to": "rst", "reference-links": True
+                              , "columns": 180, "standalone": False}) == (
+                                  "--from", "json", "--to", "rst", "--reference-links"
+                                  , "--columns", "180")
+    # --smart: only the readers of pandoc < 2.0
+    assert pandoc.pandocArgs(pandoc.XML2JSON_OPTIONS, (1, 19, 2)) == (
+        "--from", "docbook", "--to", "json", "--smart")
+    assert "--smart" not in pandoc.pandocArgs(pandoc.XML2JSON_OPTIONS, (2, 0))
+    assert "--smart" not in pandoc.pandocArgs(pandoc.XML2JSON_OPTIONS, ())
+    assert "--smart" not in pandoc.pandocArgs(pandoc.JSON2RST_OPTIONS, (1, 19, 2))
+
+def test_smart():
+    tmp = tempFolder()
+    os.environ["FAKE_PANDOC_LOG"] = os.path.join(tmp, "pandoc.log")
+    try:
+        for version, smart in (("1.19.2.1", True), ("2.0", False)):
+            os.environ["FAKE_PANDOC_VERSION"] = version
+            pandoc.pandocVersion.cache_clear()
+            assert pandoc.pandocVersion(pandoc.getPandocExe()) == tuple(
+                [int(x) for x in version.split(".")])
+            ast = json.loads(pandoc.xml2jsonText(XML))
+            assert ast["blocks"][0]["c"][0] == {"t": "Str", "c": "hello"}
+            calls = readFile(os.environ["FAKE_PANDOC_LOG"]).splitlines()
+            assert calls[-1].endswith("--smart") == smart
+        assert pandoc.pandocVersion(os.path.join(tmp, "no-pandoc")) == ()
+    finally:
+        del os.environ["FAKE_PANDOC_LOG"]
+        del os.environ["FAKE_PANDOC_VERSION"]
+        pandoc.pandocVersion.cache_clear()
+        removeFolder(tmp)
+
+def test_subprocess():
+    ast = json.loads(pandoc.xml2jsonText(XML))
+    assert ast["blocks"][0]["c"][0] == {"t": "Str", "c": "hello"}
+    rst = pandoc.json2rstText(pandoc.jsonFilterText(json.dumps(ast), XMLTag.pandocFilter))
+    assert rst == "hello pandoc\n"
+
+def test_server():
+    tmp = tempFolder()
+    os.environ["FAKE_SERVER_LOG"] = os.path.join(tmp, "server.log")
+    os.environ["FAKE_PANDOC_LOG"] = os.path.join(tmp, "pandoc.log")
+    server = pandoc.PandocServer(os.path.join(FAKE_BIN, "pandoc-server"))
+    try:
+        assert server.start()
+        assert pandoc.getConverterExe() == pandoc.getPandocExe()
+        with useContext(currentContext().derive(pandocServer=server)):
+            # the AST cache is keyed by the executable of the server
+            assert pandoc.getConverterExe() == os.path.join(FAKE_BIN, "pandoc-server")
+            ast = pandoc.xml2jsonText(XML)
+            rst = pandoc.json2rstText(pandoc.jsonFilterText(ast, XMLTag.pandocFilter))
+        assert rst == "hello pandoc\n"
+        # the server did the conversions, not the subprocess
+        assert not os.path.exists(os.environ["FAKE_PANDOC_LOG"])
+        requests = [json.loads(l) for l in readFile(os.environ["FAKE_SERVER_LOG"]).splitlines()]
+        assert requests == [pandoc.XML2JSON_OPTIONS, pandoc.JSON2RST_OPTIONS]
+    finally:
+        server.stop()
+        del os.environ["FAKE_SERVER_LOG"]
+        del os.environ["FAKE_PANDOC_LOG"]
+        removeFolder(tmp)
+
+def test_server_fallback():
+    tmp = tempFolder()
+    try:
+        # a server which can't be started: fall back to the subprocess
+        assert pandoc.startServer(os.path.join(tmp, "pandoc-server")) is None
+        assert pandoc.startServer(FSPath(tmp) / "pandoc-server") is None
+    finally:
+        removeFolder(tmp)
+
+def test_backends_same_options():
+    tmp = tempFolder()
+    os.environ["FAKE_PANDOC_LOG"] = os.path.join(tmp, "pandoc.log")
+    try:
+        pandoc.json2rstText(pandoc.xml2jsonText(XML))
+        calls = readFile(os.environ["FAKE_PANDOC_LOG"]).splitlines()
+        assert calls == [" ".join(pandoc.xml2jsonArgs())
+                         , " ".join(pandoc.pandocArgs(pandoc.JSON2RST_OPTIONS))]
+    finally:
+        del os.environ["FAKE_PANDOC_LOG"]
+        removeFolder(tmp)
+
+def test_run_in_thread():
+    async def convert():
+        with useContext(currentContext().derive(pandocJobs=3)):
+            return await pandoc.runInThread(
+                lambda: (threading.get_ident(), currentContext().pandocJobs))
+    ident, jobs = asyncio.run(convert())
+    # the blocking function runs in a thread, in the context of the caller
+    assert ident != threading.get_ident()
+    assert jobs == 3
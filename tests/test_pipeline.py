@@ -0,0 +1,73 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_pipeline
+    ~~~~~~~~~~~~~
+
+    The asyncio pipeline of the chunk conversions (``convert_chunks``)
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import json
+
+from common import tempFolder, removeFolder, loadScript, runScript, readFile, LINUX_TREE
+
+def _convert(tmp, name, *opts):
+    times = os.path.join(tmp, name + ".times")
+    out   = os.path.join(tmp, name)
+    os.environ["FAKE_PANDOC_TIMES"] = times
+    os.environ["FAKE_PANDOC_SLEEP"] = "0.2"
+    try:
+        code = runScript(loadScript(), os.path.join(tmp, "cache-" + name)
+                         , "--quiet", "--out-folder", out
+                         , *(opts + ("db2rst", LINUX_TREE, "tiny.tmpl")))
+    finally:
+        del os.environ["FAKE_PANDOC_TIMES"]
+        del os.environ["FAKE_PANDOC_SLEEP"]
+    assert code == 0
+    runs = [tuple(map(float, l.split())) for l in readFile(times).splitlines()]
+    rst  = dict()
+    for folder, _dirs, files in os.walk(out):
+        for fname in files:
+            rst[os.path.relpath(os.path.join(folder, fname), out)] = readFile(
+                os.path.join(folder, fname))
+    return runs, rst
+
+def _maxParallel(runs):
+    events = sorted([(start, 1) for start, _ in runs] + [(end, -1) for _, end in runs])
+    level = top = 0
+    for _t, step in events:
+        level += step
+        top = max(top, level)
+    return top
+
+def test_concurrent_pandoc_runs():
+    tmp = tempFolder()
+    try:
+        runs1, rst1 = _convert(tmp, "jobs1", "--pandoc-jobs", "1")
+        runs4, rst4 = _convert(tmp, "jobs4", "--pandoc-jobs", "4")
+        assert len(runs1) == len(runs4) > 2
+        assert _maxParallel(runs1) == 1
+        assert 1 < _maxParallel(runs4) <= 4
+        assert rst1 and rst1 == rst4
+    finally:
+        removeFolder(tmp)
+
+def test_timings_sequential():
+    tmp = tempFolder()
+    try:
+        report = os.path.join(tmp, "timings.json")
+        runs, _rst = _convert(tmp, "timed", "--pandoc-jobs", "4", "--timings", report)
+        assert _maxParallel(runs) == 1
+        with open(report) as f:
+            records = json.load(f)["records"]
+        stages = [r for r in records if r["stage"] in ("xml2json", "json2rst")]
+        assert len(stages) == len(runs)
+        # the wall time of a pandoc stage is the time of its own pandoc run
+        for rec in stages:
+            assert 0.2 <= rec["wall"] < 0.2 * len(runs)
+    finally:
+        removeFolder(tmp)
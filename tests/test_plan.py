@@ -0,0 +1,119 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_plan
+    ~~~~~~~~~
+
+    The dry-run plan (``--plan``) of the conversions, :py:mod:`dbxml2rst.plan`
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import json
+
+from common import (
+    tempFolder, removeFolder, loadScript, runScript, writeFile, LINUX_TREE, DOCBOOK )
+
+from fspath import FSPath
+from dbxml2rst.plan import isCurrent, contentHash, resourceIndex, planDocBook
+
+def _plan(script, cache, out, *opts):
+    planFile = os.path.join(os.path.dirname(out), "plan.json")
+    code = runScript(script, cache, "--quiet", "--out-folder", out
+                     , "--plan-json", planFile, *(opts + ("db2rst", LINUX_TREE, "tiny.tmpl")))
+    assert code == 0
+    with open(planFile) as f:
+        return json.load(f)[0]
+
+def _convert(script, cache, out, *opts):
+    code = runScript(script, cache, "--quiet", "--out-folder", out
+                     , *(opts + ("db2rst", LINUX_TREE, "tiny.tmpl")))
+    assert code == 0
+
+def _checkPlanAfterConversion(*opts):
+    tmp    = tempFolder()
+    cache  = os.path.join(tmp, "cache")
+    out    = os.path.join(tmp, "out")
+    script = loadScript()
+    try:
+        book = _plan(script, cache, out, *opts)
+        assert len(book["conversions"]) > 1
+        assert not [c for c in book["conversions"] if c["current"]]
+
+        _convert(script, cache, out, *opts)
+        book = _plan(script, cache, out, *opts)
+        assert [c for c in book["conversions"] if not c["current"]] == []
+    finally:
+        removeFolder(tmp)
+
+def test_plan_after_conversion_memory_store():
+    _checkPlanAfterConversion()
+
+def test_plan_after_conversion_disk_store():
+    _checkPlanAfterConversion("--disk-cache")
+
+def test_plan_after_change():
+    tmp     = tempFolder()
+    cache   = os.path.join(tmp, "cache")
+    out     = os.path.join(tmp, "out")
+    linux   = os.path.join(tmp, "linux")
+    docbook = os.path.join(linux, "Documentation", "DocBook")
+    script  = loadScript()
+    try:
+        with open(os.path.join(DOCBOOK, "tiny.tmpl")) as f:
+            tmpl = f.read()
+        writeFile(os.path.join(docbook, "tiny.tmpl"), tmpl)
+        runScript(script, cache, "--quiet", "--out-folder", out, "db2rst", linux, "tiny.tmpl")
+        writeFile(os.path.join(docbook, "tiny.tmpl")
+                  , tmpl.replace("<para>Text", "<para>Changed text"))
+
+        planFile = os.path.join(tmp, "plan.json")
+        runScript(script, cache, "--quiet", "--out-folder", out
+                  , "--plan-json", planFile, "db2rst", linux, "tiny.tmpl")
+        with open(planFile) as f:
+            book = json.load(f)[0]
+        outdated = [os.path.basename(c["fname"]) for c in book["conversions"] if not c["current"]]
+        # the changed chunk and the main file (it includes the chunk)
+        assert "basics.xml" in outdated or "usage.xml" in outdated, outdated
+        assert len(outdated) < len(book["conversions"])
+    finally:
+        removeFolder(tmp)
+
+def test_isCurrent_manifest():
+    tmp = tempFolder()
+    try:
+        cache = FSPath(tmp)
+        fname = FSPath("index.xml_entity")
+        manifest = {"index.xml_entity": contentHash(u"<book/>")}
+        assert not isCurrent(cache, fname, u"<book/>", manifest)
+        writeFile(os.path.join(tmp, "index.rst"), u"book\n")
+        assert isCurrent(cache, fname, u"<book/>", manifest)
+        assert not isCurrent(cache, fname, u"<book>x</book>", manifest)
+        # without a manifest the XML file of the cache is compared
+        assert not isCurrent(cache, fname, u"<book/>")
+        writeFile(os.path.join(tmp, "index.xml_entity"), u"<book/>")
+        assert isCurrent(cache, fname, u"<book/>")
+    finally:
+        removeFolder(tmp)
+
+def test_resources():
+    tmp = tempFolder()
+    try:
+        root = FSPath(tmp)
+        writeFile(root / "book.tmpl"
+                  , u'<book><graphic fileref="pics/a.svg"/><graphic fileref="a.svg"/>'
+                  u'<graphic fileref="b.png"/><graphic fileref="missing.png"/></book>')
+        writeFile(root / "pics" / "a.svg", u"<svg/>")
+        writeFile(root / "other" / "b.png", u"png")
+        writeFile(root / "other" / "b.png.orig", u"orig")
+        index = resourceIndex(root)
+        assert index["a.svg"] == root / "pics" / "a.svg"
+        assert index["b.png"] == root / "other" / "b.png"
+        book = planDocBook(root / "book.tmpl", root / "cache", root, root)
+        assert sorted([(r["fname"], r["size"]) for r in book.resources]) == sorted([
+            (root / "other" / "b.png", 3), ("missing.png", None)
+            , (root / "pics" / "a.svg", 6)])
+    finally:
+        removeFolder(tmp)
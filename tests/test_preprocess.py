@@ -0,0 +1,97 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_preprocess
+    ~~~~~~~~~~~~~~~
+
+    The preprocessing of the docbook.tmpl files, the memory-mapped fast path
+    (:py:func:`dbxml2rst.nodes.mappedUTF8`) and the text path.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import io
+import os
+
+from fspath import FSPath
+from common import tempFolder, removeFolder
+
+from dbxml2rst.nodes import (
+    isUTF8, mappedUTF8, preprocessTemplate, subTemplate, subEntities
+    , subTemplateLine, subEntitiesLine )
+
+TMPL = u"""<?xml version="1.0" encoding="UTF-8"?>
+<book>
+<para>Grüße &version; * &amp; &nbsp;</para>
+!Iinclude/linux/foo.h
+&chapter;
+<para>nothing to do</para>
+!Finclude/linux/bar.h bar_init
+</book>
+"""
+
+EXT_ENTITIES = {"chapter" : "chapter.xml_entity"}
+INT_ENTITIES = {"version" : "4.10", "nbsp" : " "}
+
+def _write(folder, name, data):
+    fname = FSPath(os.path.join(folder, name))
+    with open(fname, "wb") as out:
+        out.write(data)
+    return fname
+
+def _textPath(text):
+    content = "".join([subTemplateLine(line) for line in io.StringIO(text, newline="\n")])
+    return "".join([subEntitiesLine(line, EXT_ENTITIES, INT_ENTITIES)
+                    for line in io.StringIO(content, newline="\n")]).encode("utf-8")
+
+def test_utf8_slices():
+    data = u"aäöü€𝄞".encode("utf-8") * 20
+    # slices which split the multi byte sequences
+    for chunkSize in (1, 2, 3, 5, 7, len(data), len(data) + 1):
+        assert isUTF8(data, chunkSize)
+    assert isUTF8(b"")
+    assert not isUTF8(b"abc\xff", 2)
+    assert not isUTF8(data + b"\xc3", 7)
+    assert not isUTF8(b"\xe2\x82" + data, 3)
+
+def test_mapped_utf8():
+    tmp = tempFolder()
+    try:
+        valid = TMPL.encode("utf-8")
+        with mappedUTF8(_write(tmp, "valid", valid)) as buf:
+            assert buf is not None and buf[:] == valid
+        with mappedUTF8(_write(tmp, "empty", b"")) as buf:
+            assert buf == b""
+        with mappedUTF8(_write(tmp, "latin1", TMPL.encode("latin-1"))) as buf:
+            assert buf is None
+        with mappedUTF8(_write(tmp, "crlf", valid.replace(b"\n", b"\r\n"))) as buf:
+            assert buf is None
+    finally:
+        removeFolder(tmp)
+
+def test_preprocess_template():
+    tmp = tempFolder()
+    try:
+        inFile  = _write(tmp, "book.tmpl", TMPL.encode("utf-8"))
+        content = preprocessTemplate(inFile, EXT_ENTITIES, INT_ENTITIES)
+        assert content == _textPath(TMPL)
+        assert b"<rstTemplate op=\"I\" fname=\"include/linux/foo.h\"" in content
+        assert b"<rstInclude fname='chapter.xml_entity'/>" in content
+        assert u"Grüße 4.10 &#x22C6; &amp;".encode("utf-8") in content
+    finally:
+        removeFolder(tmp)
+
+def test_one_pass():
+    tmp = tempFolder()
+    try:
+        for name, text in (("utf8", TMPL), ("crlf", TMPL.replace("\n", "\r\n"))):
+            inFile = _write(tmp, name + ".tmpl", text.encode("utf-8"))
+            # same as the two passes (with an intermediate file)
+            subTemplate(inFile, FSPath(inFile + ".xml_orig"))
+            subEntities(FSPath(inFile + ".xml_orig"), FSPath(inFile + ".xml_entity")
+                        , EXT_ENTITIES, INT_ENTITIES)
+            with open(inFile + ".xml_entity", "rb") as f:
+                assert preprocessTemplate(inFile, EXT_ENTITIES, INT_ENTITIES) == f.read()
+    finally:
+        removeFolder(tmp)
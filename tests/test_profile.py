@@ -0,0 +1,74 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_profile
+    ~~~~~~~~~~~~
+
+    The cProfile and tracemalloc capture of the CLI commands
+    (:py:class:`dbxml2rst.helper.ProfileCapture`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import io
+import os
+import pstats
+import tracemalloc
+
+from common import tempFolder, removeFolder, readFile
+
+from dbxml2rst.helper import CLI, ProfileCapture, currentContext, useContext
+
+def _innerWork():
+    return [str(i) for i in range(20000)]
+
+def _cmd(cliArgs):                                      # pylint: disable=W0613
+    u"""command with a book section"""
+    with ProfileCapture("book"):
+        _innerWork()
+
+def _run(*argv):
+    with useContext(currentContext().derive(appl_out=io.StringIO(), log_out=io.StringIO())):
+        try:
+            CLI(cmdFunc=_cmd)(list(argv))
+        except SystemExit as exc:
+            return exc.code
+    return None
+
+def _functions(fname):
+    return [func for _file, _line, func in pstats.Stats(fname).stats]
+
+def test_profile_out():
+    tmp = tempFolder()
+    try:
+        assert _run("--profile-out", tmp) == 0
+        assert sorted(os.listdir(tmp)) == ["_cmd.pstats", "book.pstats"]
+        # the data of the inner section is added to the outer section
+        assert "_innerWork" in _functions(os.path.join(tmp, "book.pstats"))
+        assert "_innerWork" in _functions(os.path.join(tmp, "_cmd.pstats"))
+    finally:
+        removeFolder(tmp)
+
+def test_trace_memory():
+    tmp = tempFolder()
+    try:
+        assert _run("--profile-out", tmp, "--trace-memory") == 0
+        assert sorted(os.listdir(tmp)) == [
+            "_cmd.pstats", "_cmd.tracemalloc", "_cmd.tracemalloc.txt"
+            , "book.pstats", "book.tracemalloc", "book.tracemalloc.txt" ]
+        assert readFile(os.path.join(tmp, "book.tracemalloc.txt"))
+        assert not tracemalloc.is_tracing()
+    finally:
+        removeFolder(tmp)
+
+def test_no_capture():
+    tmp = tempFolder()
+    cwd = os.getcwd()
+    try:
+        os.chdir(tmp)
+        assert _run() == 0
+        assert os.listdir(tmp) == []
+    finally:
+        os.chdir(cwd)
+        removeFolder(tmp)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_progress
+    ~~~~~~~~~~~~~
+
+    The live progress of the conversions (:py:class:`dbxml2rst.progress.Progress`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import io
+import time
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.progress import Progress, humanizeBytes, humanizeSeconds
+
+def test_humanize():
+    assert humanizeBytes(10) == "10 B"
+    assert humanizeBytes(2048) == "2.0 KB"
+    assert humanizeBytes(3 * 1024 ** 3) == "3.0 GB"
+    assert humanizeSeconds(3725.9) == "1:02:05"
+
+def test_book_progress():
+    out      = io.StringIO()
+    progress = Progress(stream=out, tty=False)
+    progress.startBook("book")
+    assert out.getvalue() == "book: 0/? chunks, in 0 B/s, out 0 B/s, stage -, ETA ?\n"
+
+    progress.setTotal("book", 4)
+    with progress.stage("xml2json", "book", "a.xml"):
+        with progress.stage("pandoc", "book", "b.xml"):
+            assert "stage pandoc (b.xml) +1" in progress.render("book")
+        assert "stage xml2json (a.xml)," in progress.render("book")
+    progress.chunkDone("book", 2048, 1024)
+    line = progress.render("book")
+    assert "book: 1/4 chunks" in line
+    assert "ETA 0:00:" in line
+
+    progress.finishBook("book")
+    line = out.getvalue().splitlines()[-1]
+    assert line.startswith("book: 1/4 chunks")
+    assert "stage done, time 0:00:00" in line
+    # a finished book is not reported again
+    progress.report()
+    assert out.getvalue().splitlines()[-1] == line
+
+def test_tty_line():
+    out      = io.StringIO()
+    progress = Progress(stream=out, tty=True)
+    progress.startBook("a-long-book-name")
+    progress.startBook("b")
+    progress.finishBook("b")
+    progress.stop()
+    lines = out.getvalue().split("\r")
+    # the status line is refreshed in place, a shorter line pads the old one
+    assert lines[2].startswith("b: 0/? chunks")
+    assert len(lines[2].rstrip("\n")) == len(lines[1])
+    assert out.getvalue().endswith("\n")
+
+def test_periodic_report():
+    out      = io.StringIO()
+    progress = Progress(stream=out, tty=False, interval=0.01).start()
+    progress.startBook("book")
+    time.sleep(0.1)
+    progress.stop()
+    assert progress._thread is None  # pylint: disable=W0212
+    # the line is written even if nothing has been changed
+    assert out.getvalue().count("book: 0/? chunks") > 2
@@ -0,0 +1,92 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_rendercontext
+    ~~~~~~~~~~~~~~~~~~
+
+    The render context of the tag handlers (:py:class:`dbxml2rst.nodes.Context`)
+    and its memo (:py:meth:`dbxml2rst.nodes.XMLTag.getCachedContext`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+from lxml import etree
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.nodes import XMLTag, Context, Function, Table, Figure, Mediaobject
+
+TABLE = u"""<article><table id="t1"><title>A table</title>
+<tgroup cols="2"><tbody><row><entry>a</entry><entry>b</entry></row></tbody></tgroup>
+</table></article>"""
+
+def test_context():
+    ctxType = Context.extend("title", "text")
+    ctx = ctxType(ID="intro")
+    ctx.title = "Introduction"
+    assert "%(ID)s: %(title)s" % ctx == "intro: Introduction"
+    assert sorted(ctx.keys()) == ["ID", "title"]
+    assert not hasattr(ctx, "__dict__")
+    try:
+        ctx["text"]
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("unset value has to raise a KeyError")
+    for obj in (ctx, Context()):
+        try:
+            obj.unknown = 1
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("context has only the slots")
+    other = ctxType(text="x")
+    other.update(ctx)
+    assert sorted(other.keys()) == ["ID", "text", "title"]
+    assert repr(Context(ID="a")) == "Context(ID='a')"
+
+def test_context_types():
+    # each tag has the slots of its own context
+    assert Function().getContext(etree.fromstring("<function>f()</function>")).keys() == [
+        "func_call", "ID"]
+    figure = Figure().getContext(etree.fromstring(
+        '<figure id="f1"><title>Fig</title><mediaobject><imageobject>'
+        '<imagedata fileref="a.svg"/></imageobject></mediaobject></figure>'))
+    assert figure.ID == "f1" and figure.alt == "a.svg" and figure.glob == "a.*"
+    assert isinstance(figure, Mediaobject.contextType)
+    try:
+        Table().getContext(etree.fromstring(TABLE)[0]).func_call = "x"
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("a table context has no func_call")
+
+def test_cached_context():
+    node  = etree.fromstring("<function>foo()</function>")
+    other = etree.fromstring("<function>bar()</function>")
+    tag   = Function()
+    ctx   = tag.getCachedContext(node)
+    assert tag.getCachedContext(node) is ctx
+    assert tag.getCachedContext(other) is not ctx
+    # the memo is dropped when applyFilter returns
+    tag.applyFilter(etree.fromstring("<p><function>x()</function></p>")[0], "")
+    assert tag._ctxMemo is None  # pylint: disable=W0212
+
+def test_context_once_per_node():
+    calls      = []
+    getContext = Table.getContext
+
+    def counted(self, node):
+        calls.append(node.get("id"))
+        return getContext(self, node)
+
+    Table.getContext = counted
+    try:
+        root = etree.fromstring(TABLE)
+        XMLTag().walk(root)
+    finally:
+        Table.getContext = getContext
+    # pre- and post-text of the table share one context
+    assert calls == ["t1"]
+    assert "A table" in "".join(root.itertext())
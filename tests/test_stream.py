@@ -0,0 +1,54 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_stream
+    ~~~~~~~~~~~
+
+    The streaming mode of the XML filter (:py:func:`dbxml2rst.nodes.streamFilterXML`)
+    gives the same output as :py:func:`dbxml2rst.nodes.filterXML`.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+
+from common import tempFolder, removeFolder, writeFile
+
+from dbxml2rst.artifacts import DiskStore, MemoryStore
+from dbxml2rst.nodes import XMLTag, filterXML
+
+CHAPTER = u"""<chapter id="ch%(i)d"><title>Chapter %(i)d</title>
+<para>Call <function>foo_%(i)d()</function> with <constant>FOO</constant>.</para>
+<sect1 id="s%(i)d"><title>Grüße %(i)d</title>
+<programlisting>int main(void) { return %(i)d; }</programlisting>
+<informaltable><tgroup cols="2"><tbody>
+<row><entry>a</entry><entry>b</entry></row>
+</tbody></tgroup></informaltable>
+</sect1>
+</chapter>
+"""
+
+DOC = (u"""<?xml version="1.0" encoding="UTF-8"?>\n<book><title>Book</title>\n"""
+       + "".join([CHAPTER % dict(i=i) for i in range(5)]) + u"</book>\n")
+
+def _filter(store, streamTags):
+    xmlFilter = XMLTag()
+    xmlFilter.parseData.update(store=store, streamTags=streamTags)
+    filterXML(store.folder, "book.xml_entity", "book.xml", xmlFilter)
+    return store.readBytes("book.xml")
+
+def test_stream_output():
+    tmp       = tempFolder()
+    blockSize = XMLTag.streamBlockSize
+    try:
+        writeFile(os.path.join(tmp, "book.xml_entity"), DOC)
+        expected = _filter(DiskStore(tmp), None)
+        assert b"foo_4()" in expected
+        # small blocks, the spooled chunks are copied in pieces
+        XMLTag.streamBlockSize = 7
+        assert _filter(DiskStore(tmp), ("chapter",)) == expected
+        assert _filter(MemoryStore(tmp), ("chapter", "sect1")) == expected
+    finally:
+        XMLTag.streamBlockSize = blockSize
+        removeFolder(tmp)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_svg2pdf
+    ~~~~~~~~~~~~
+
+    The SVG to PDF conversion of the media book, the PDF files are cached by the
+    content hash of the SVG file (``media.svg2pdf``).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import unittest
+
+from fspath import FSPath
+from common import tempFolder, removeFolder, writeFile, readFile
+
+import media
+from dbxml2rst.install import fileHash
+
+SVG = u"""<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10">
+<rect width="%d" height="10"/></svg>
+"""
+
+def _folders(tmp):
+    writeFile(os.path.join(tmp, "f1", "a.svg"), SVG % 1)
+    writeFile(os.path.join(tmp, "f2", "b.svg"), SVG % 1)
+    writeFile(os.path.join(tmp, "f1", "c.svg"), SVG % 2)
+    writeFile(os.path.join(tmp, "f1", "c.pdf"), "origin PDF")
+    return [FSPath(os.path.join(tmp, "f1")), FSPath(os.path.join(tmp, "f2"))]
+
+def test_cached_pdf():
+    tmp = tempFolder()
+    try:
+        folders = _folders(tmp)
+        cache   = FSPath(os.path.join(tmp, "cache"))
+        svgHash = fileHash(os.path.join(tmp, "f1", "a.svg"))
+        writeFile(cache / (svgHash + ".pdf"), "cached PDF")
+
+        # no rendering needed, all PDF files are taken from the cache
+        media.svg2pdf(folders, cache, jobs=1)
+        assert readFile(os.path.join(tmp, "f1", "a.pdf")) == "cached PDF"
+        assert readFile(os.path.join(tmp, "f2", "b.pdf")) == "cached PDF"
+        assert readFile(os.path.join(tmp, "f1", "c.pdf")) == "origin PDF"
+        assert os.listdir(cache) == [svgHash + ".pdf"]
+    finally:
+        removeFolder(tmp)
+
+def test_render_pdf():
+    try:
+        import cairosvg # pylint: disable=W0611
+    except (ImportError, OSError):
+        raise unittest.SkipTest("cairosvg (or cairo) is not installed")
+    tmp = tempFolder()
+    try:
+        folders = _folders(tmp)
+        cache   = FSPath(os.path.join(tmp, "cache"))
+        media.svg2pdf(folders, cache, jobs=2)
+        # same SVG content is rendered once
+        assert len(os.listdir(cache)) == 1
+        for fname in (("f1", "a.pdf"), ("f2", "b.pdf")):
+            with open(os.path.join(tmp, *fname), "rb") as f:
+                assert f.read(5) == b"%PDF-"
+        assert readFile(os.path.join(tmp, "f1", "c.pdf")) == "origin PDF"
+    finally:
+        removeFolder(tmp)
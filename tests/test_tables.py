@@ -0,0 +1,121 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_tables
+    ~~~~~~~~~~~
+
+    The model of the DocBook (CALS) tables (:py:class:`dbxml2rst.nodes.TableModel`)
+    and the table hooks.
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+from lxml import etree
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.helper import Container, currentContext, useContext
+from dbxml2rst.nodes import XMLTag, TableModel
+from dbxml2rst.hooks import hook_drop_usless_informaltables
+
+TABLE = u"""<table id="t1"><title>A table</title>
+ <tgroup cols="3">
+  <colspec colname="c1" colwidth="1*"/>
+  <colspec colname="c2" colwidth="2*"/>
+  <colspec colname="c3" colwidth="3*"/>
+  <spanspec spanname="hspan" namest="c1" nameend="c3"/>
+  <spanspec spanname="broken" namest="c1" nameend="cX"/>
+  <thead><row><entry>a</entry><entry>b</entry><entry>c</entry></row></thead>
+  <tbody>
+   <row><entry>1</entry><entry>2</entry><entry>3</entry></row>
+   <row><entry spanname="hspan">span</entry></row>
+   <row><entry>x</entry>
+     <entrytbl cols="1"><tbody><row><entry>inner</entry></row></tbody></entrytbl>
+     <entry>w</entry></row>
+  </tbody>
+ </tgroup>
+</table>"""
+
+def _text(elements):
+    return [elem.text for elem in elements]
+
+def test_model():
+    table = etree.fromstring(TABLE)
+    model = TableModel(table)
+    assert model.tgroup is table.find("tgroup")
+    assert [c.colname for c in model.colspecs] == ["c1", "c2", "c3"]
+    assert model.colspecByName["c2"].number == 1
+    assert len(model.tgroupColspecs) == 3
+    assert model.getSpan("hspan") == 2
+    assert model.getSpan("broken") == 0
+    assert model.getSpan("unknown") == 0
+    assert [_text(r.entries) for r in model.headRows] == [["a", "b", "c"]]
+    assert [_text(r.entries)[0] for r in model.bodyRows] == ["1", "span", "x"]
+    # the rows of the entrytbl are rows of the model, but not body rows
+    assert len(model.rows) == 5
+    assert len(model.tbodies) == 2
+    assert model.bodyRows[2].entrytbl is not None
+    assert "inner" in _text(model.bodyRows[2].allEntries)
+    assert "inner" not in _text(model.bodyRows[2].entries)
+
+def test_model_without_tgroup():
+    table = etree.fromstring(u"<informaltable><row><entry>a</entry></row></informaltable>")
+    model = TableModel(table)
+    assert model.tgroup is None
+    assert model.tbodies == [] and model.bodyRows == []
+    assert len(model.rows) == 1
+
+def test_shared_models():
+    table = etree.fromstring(TABLE)
+    # without tableModels in the context the models are not shared
+    assert TableModel.get(table) is not TableModel.get(table)
+    with useContext(currentContext().derive(tableModels=dict())):
+        model = TableModel.get(table)
+        assert TableModel.get(table) is model
+        assert TableModel.ofTgroup(table.find("tgroup")) is model
+        TableModel.invalidate(table)
+        assert TableModel.get(table) is not model
+        TableModel.invalidate()
+        assert currentContext().tableModels == {}
+
+def _dropTables(xml):
+    root = etree.fromstring(xml)
+    with useContext(currentContext().derive(tableModels=dict())):
+        hook_drop_usless_informaltables(root, "", Container())
+    return etree.tostring(root, encoding="unicode")
+
+def test_drop_usless_informaltables():
+    out = _dropTables(
+        u"<doc><informaltable><tgroup cols='1'><tbody>"
+        u"<row><entry><para>only</para></entry></row>"
+        u"</tbody></tgroup></informaltable></doc>")
+    assert out == u"<doc><section><para>only</para></section></doc>"
+
+def test_keep_informaltables():
+    for xml in (
+            # two columns
+            u"<doc><informaltable><tgroup cols='2'><tbody><row>"
+            u"<entry>a</entry><entry>b</entry></row></tbody></tgroup></informaltable></doc>"
+            # no tbody
+            , u"<doc><informaltable><tgroup cols='1'><thead><row>"
+            u"<entry>a</entry></row></thead></tgroup></informaltable></doc>"
+            , u"<doc><informaltable/></doc>"
+            # empty rows
+            , u"<doc><informaltable><tgroup cols='1'><tbody><row/></tbody>"
+            u"</tgroup></informaltable></doc>" ):
+        assert _dropTables(xml) == etree.tostring(etree.fromstring(xml), encoding="unicode")
+
+def test_tables_without_body_rows():
+    root = etree.fromstring(
+        u"<doc><table id='t2'><title>head only</title><tgroup cols='2'>"
+        u"<colspec colname='c1'/>"
+        u"<thead><row><entry>a</entry><entry>b</entry></row></thead><tbody/>"
+        u"</tgroup></table>"
+        u"<table><thead><row><entry>a</entry></row></thead><tbody/></table></doc>")
+    with useContext(currentContext().derive(tableModels=dict())):
+        XMLTag().walk(root)
+    tgroups = root.findall(".//tgroup")
+    # the columns of the tgroup attribute and of the thead
+    assert [t.get("cols") for t in tgroups] == ["2", "1"]
+    assert [len(t.findall("colspec")) for t in tgroups] == [2, 1]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_textcache
+    ~~~~~~~~~~~~~~
+
+    The text cache of the XML filter (:py:meth:`dbxml2rst.nodes.XMLTag.getText`),
+    the text of a node is flattened once within a text scope
+    (:py:meth:`dbxml2rst.nodes.XMLTag.textScope`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+from lxml import etree
+
+import common  # pylint: disable=W0611
+
+from dbxml2rst.nodes import XMLTag
+
+NODES = 50
+
+def _doc():
+    # tags without a tag filter
+    return etree.fromstring(
+        "<doc>" + "".join("<x>t%d</x>" % i for i in range(NODES)) + "</doc>")
+
+class _Flatten(object):
+    u"""Counts the calls of :py:meth:`XMLTag.flattenText` by node."""
+
+    def __init__(self):
+        self.calls = dict()
+        self.orig  = XMLTag.__dict__["flattenText"]
+
+    def __call__(self, cls, node):
+        self.calls[node.tag] = self.calls.get(node.tag, 0) + 1
+        return self.orig.__func__(cls, node)
+
+    def __enter__(self):
+        XMLTag.flattenText = classmethod(self)
+        return self
+
+    def __exit__(self, *exc):
+        XMLTag.flattenText = self.orig
+
+def test_flatten_once_in_scope():
+    root = _doc()
+    with _Flatten() as flatten:
+        with XMLTag.textScope():
+            for _x in range(3):
+                assert XMLTag.getText(root).startswith("t0t1")
+                assert XMLTag.getStripedText(root[0]) == "t0"
+            # a nested scope shares the cache
+            with XMLTag.textScope():
+                XMLTag.getText(root)
+    assert flatten.calls == {"doc" : 1, "x" : 1}
+    # the caches are dropped at the end of the scope
+    assert XMLTag.state.textCache is None
+    assert XMLTag.state.stripedTextCache is None
+
+def test_no_stale_text():
+    root = _doc()
+    assert XMLTag.getText(root).startswith("t0t1")
+    # changes by lxml (without the node helpers)
+    root[0].text = "new"
+    root.remove(root[1])
+    assert XMLTag.getText(root).startswith("newt2")
+    assert XMLTag.getStripedText(root[0]) == "new"
+
+def test_walk_after_changes():
+    root  = _doc()
+    texts = []
+
+    def replace(node, rstPrefix, parseData):  # pylint: disable=W0613
+        if node.tag == "x" and node.text == "t0":
+            new = node.makeelement("x")
+            new.text = "new"
+            XMLTag.replaceNode(node, new)
+            return new
+        return node
+
+    def reader(node, rstPrefix, parseData):  # pylint: disable=W0613
+        texts.append(XMLTag.getText(root))
+        return node
+
+    xmlFilter = XMLTag()
+    xmlFilter.parseData.hooks.extend([replace, reader])
+    xmlFilter.walk(root)
+    assert texts[0].startswith("t0t1")
+    assert texts[-1].startswith("newt1")
+
+def test_injection():
+    root = etree.fromstring("<para>call <function>foo()</function></para>")
+    assert XMLTag.getText(root) == "call foo()"
+    XMLTag().walk(root)
+    assert XMLTag.getText(root) == "".join(root.itertext())
+    assert XMLTag.getText(root).endswith(":c:func:`foo()`")
+
+def test_context_in_scope():
+    root = etree.fromstring(
+        "<para><ulink url='http://x'>a <emphasis>link</emphasis></ulink></para>")
+    with _Flatten() as flatten:
+        XMLTag().walk(root)
+    # the pre- and post-text share the context, build in one text scope
+    assert flatten.calls == {"ulink" : 1}
+    assert XMLTag.state.textCache is None
@@ -0,0 +1,117 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_timing
+    ~~~~~~~~~~~
+
+    The timing of the conversion stages (:py:mod:`dbxml2rst.timing`).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import json
+import time
+
+from fspath import FSPath
+from common import tempFolder, removeFolder
+
+from dbxml2rst.helper import currentContext, useContext
+from dbxml2rst.nodes import XMLTag, filterXML
+from dbxml2rst.timing import StageTimer, StageGroup, WalkStats, NULL_TIMER
+
+DOC = u"""<article>
+<para>Call <function>foo()</function> or <function>bar()</function>.</para>
+<programlisting>int x;</programlisting>
+</article>
+"""
+
+def _timer():
+    timer = StageTimer()
+    with timer.stage("xml2json", "book-a", "index.xml"):
+        time.sleep(0.02)
+    with timer.stage("xml2json", "book-a", "intro.xml"):
+        pass
+    with timer.stage("xml2json", "book-a", "index.xml"):
+        pass
+    with timer.stage("install", "book-b"):
+        pass
+    return timer
+
+def test_stage_timer():
+    timer = _timer()
+    assert len(timer.records) == 4
+    assert sorted(timer.stages()) == ["install", "xml2json"]
+    assert sorted(timer.books()) == ["book-a", "book-b"]
+    # chunks are summed up by book and chunk, the slowest first
+    chunks = timer.chunks()
+    assert [(t.book, t.chunk) for t in chunks] == [
+        ("book-a", "index.xml"), ("book-a", "intro.xml")]
+    assert chunks[0].wall >= 0.02
+    assert timer.stages()["xml2json"].wall >= chunks[0].wall
+
+def test_stage_timer_exception():
+    timer = StageTimer()
+    try:
+        with timer.stage("pandoc", "book"):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert [rec.stage for rec in timer.records] == ["pandoc"]
+
+def test_summary_and_report():
+    timer   = _timer()
+    summary = timer.summary(slowest=1)
+    assert "xml2json" in summary
+    assert "book-a/index.xml" in summary
+    assert "book-a/intro.xml" not in summary
+    tmp = tempFolder()
+    try:
+        fname = FSPath(os.path.join(tmp, "timings.json"))
+        timer.writeReport(fname)
+        with open(fname) as f:
+            report = json.load(f)
+        assert sorted(report) == ["books", "chunks", "records", "stages"]
+        assert len(report["records"]) == 4
+    finally:
+        removeFolder(tmp)
+
+def test_stage_group():
+    t1, t2 = StageTimer(), StageTimer()
+    with StageGroup(t1, t2, NULL_TIMER).stage("filter", "book", "x.xml"):
+        pass
+    assert len(t1.records) == len(t2.records) == 1
+    assert t1.records[0].chunk == "x.xml"
+
+def _hook(node, rstPrefix, parseData):  # pylint: disable=W0613
+    return node
+
+def test_walk_stats():
+    tmp   = tempFolder()
+    stats = WalkStats()
+    try:
+        for name in ("a", "b"):
+            with open(os.path.join(tmp, name + ".xml_entity"), "w") as f:
+                f.write(DOC)
+            xmlFilter = XMLTag()
+            xmlFilter.parseData.hooks.append(_hook)
+            with useContext(currentContext().derive(walkStats=stats)):
+                filterXML(tmp, name + ".xml_entity", name + ".xml", xmlFilter)
+        # counted by file
+        assert sorted(stats.files) == ["a.xml_entity", "b.xml_entity"]
+        fstats = stats.files["a.xml_entity"]
+        assert fstats.nodes["function"] == 2
+        assert fstats.nodes["para"] == 1
+        assert fstats.hooks[_hook.__qualname__].calls == sum(fstats.nodes.values())
+        assert fstats.handlers["Function"].calls == 2
+        assert fstats.injections["inline"] >= 2
+        assert "files: 2 / nodes visited: %s" % (
+            2 * sum(fstats.nodes.values())) in stats.summary()
+
+        fname = FSPath(os.path.join(tmp, "walk-stats.json"))
+        stats.writeReport(fname)
+        with open(fname) as f:
+            assert json.load(f)["a.xml_entity"]["nodes"]["function"] == 2
+    finally:
+        removeFolder(tmp)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+u"""
+    test_watch
+    ~~~~~~~~~~
+
+    The watchers of the DocBook tree (:py:mod:`dbxml2rst.watch`) and the books
+    affected by changed files (``affectedBooks`` of ``linux-db2rst``).
+
+    :copyright:  Copyright (C) 2017 Markus Heiser
+    :license:    GPL Version 2, June 1991 see linux/COPYING for details.
+"""
+
+import os
+import time
+import threading
+import unittest
+
+from fspath import FSPath
+from common import tempFolder, removeFolder, writeFile, loadScript
+
+from dbxml2rst.helper import Container
+from dbxml2rst.watch import Watcher, InotifyWatcher, PollWatcher
+
+def test_ignore():
+    for name in (".#foo.tmpl", "foo.tmpl~", ".foo.tmpl.swp", "foo.xml.tmp"):
+        assert Watcher.ignore(os.path.join("a", name))
+    assert not Watcher.ignore(os.path.join(".a", "foo.tmpl"))
+
+def _changes(watcher, tmp):
+    writeFile(os.path.join(tmp, "sub", "old.xml"), "old")
+    writeFile(os.path.join(tmp, "gone.xml"), "gone")
+    watcher = watcher(tmp)
+    try:
+        def edit():
+            time.sleep(0.1)
+            writeFile(os.path.join(tmp, "book.tmpl"), "new")
+            writeFile(os.path.join(tmp, "book.tmpl~"), "backup")
+            time.sleep(0.1)
+            writeFile(os.path.join(tmp, "sub", "old.xml"), "changed")
+            os.remove(os.path.join(tmp, "gone.xml"))
+            writeFile(os.path.join(tmp, "new", "new.xml"), "new")
+        thread = threading.Thread(target=edit)
+        thread.start()
+        changed = watcher.changes()
+        thread.join()
+    finally:
+        watcher.close()
+    return [os.path.relpath(fname, tmp) for fname in changed]
+
+def test_poll_watcher():
+    tmp = tempFolder()
+    try:
+        changed = _changes(
+            lambda folder: PollWatcher(folder, debounce=0.3, interval=0.05), tmp)
+        # the burst of changes is collected (debounce)
+        assert changed == sorted([
+            "book.tmpl", "gone.xml", os.path.join("new", "new.xml")
+            , os.path.join("sub", "old.xml")])
+    finally:
+        removeFolder(tmp)
+
+def test_inotify_watcher():
+    if not InotifyWatcher.available():
+        raise unittest.SkipTest("inotify is not available")
+    tmp = tempFolder()
+    try:
+        changed = _changes(lambda folder: InotifyWatcher(folder, debounce=0.3), tmp)
+        assert "book.tmpl" in changed
+        assert "gone.xml" in changed
+        assert os.path.join("sub", "old.xml") in changed
+        assert "book.tmpl~" not in changed
+    finally:
+        removeFolder(tmp)
+
+def test_affected_books():
+    script = loadScript()
+    tmp    = tempFolder()
+    try:
+        root = FSPath(tmp)
+        writeFile(root / "kernel-hacking.tmpl", "<book>&locking;</book>")
+        writeFile(root / "device-drivers.tmpl", '<graphic fileref="dvb.svg"/>')
+        writeFile(root / "media_api.tmpl", "<book/>")
+        ctx = Container(media=Container(book=FSPath("out/media")), docbookRoot=root)
+
+        assert script.affectedBooks(ctx, [root / "kernel-hacking.tmpl"]) == ["kernel-hacking"]
+        assert script.affectedBooks(ctx, [root / "media" / "v4l" / "dev.xml"]) == ["media"]
+        assert script.affectedBooks(ctx, [root / "media-entities.tmpl"]) == ["media"]
+        assert script.affectedBooks(ctx, [root / "pics" / "dvb.svg"]) == ["device-drivers"]
+        assert script.affectedBooks(ctx, [root / "unknown.png"]) == []
+        # e.g. inotify queue overflow: all books
+        assert script.affectedBooks(ctx, [root]) == [
+            "device-drivers", "kernel-hacking", "media"]
+    finally:
+        removeFolder(tmp)
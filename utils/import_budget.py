@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8; mode: python -*-
+# pylint: disable=C0103
+
+u"""
+    import_budget
+    ~~~~~~~~~~~~~
+
+    Check the import-time budget of the ``linux-db2rst`` command line.
+
+    The commands ``--help`` and the argument parsing have to start fast, the
+    heavy modules (lxml, pandoc, media, ..) are imported by the commands which
+    need them.  The check runs ``linux-db2rst --help`` with ``python -X
+    importtime`` and fails if one of the ``HEAVY`` modules is imported or the
+    cumulated import time exceeds the budget::
+
+        $ python3 utils/import_budget.py [--budget MS]
+
+    :copyright:  Copyright (C) 2017  Markus Heiser
+    :license:    GPL V3.0, see LICENSE for details.
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ROOT    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT  = os.path.join(ROOT, "linux-db2rst")
+HEAVY   = ("lxml", "media", "dbxml2rst.nodes", "dbxml2rst.hooks", "dbxml2rst.pandoc"
+           , "dbxml2rst.plan", "pandocfilters", "cProfile", "tracemalloc")
+BUDGET  = 250  # ms, cumulated import time of the top-level modules
+
+IMPORT_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+def importTimes(args):
+    u"""Returns list of (module, cumulated [us], level) of ``python -X importtime``"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", SCRIPT] + args
+        , cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        , universal_newlines=True, check=True)
+    times = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_RE.match(line)
+        if match:
+            times.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return times
+
+def main():
+    cli = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    cli.add_argument("--budget", type=int, default=BUDGET
+                     , help="import budget in ms (default: %(default)s)")
+    cliArgs = cli.parse_args()
+
+    times = importTimes(["--help"])
+    total = sum([t for (_m, t, level) in times if level == 0]) / 1000.0
+    heavy = sorted(set([m for (m, _t, _l) in times
+                        if m in HEAVY or m.split(".")[0] in HEAVY]))
+
+    print("linux-db2rst --help: %.1f ms import time (budget %s ms)" % (total, cliArgs.budget))
+    failed = False
+    if heavy:
+        print("ERROR: heavy modules imported: %s" % ", ".join(heavy))
+        failed = True
+    if total > cliArgs.budget:
+        print("ERROR: import budget exceeded")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())